@@ -0,0 +1,385 @@
+"""
+Benchmark suite for the remediation service.
+
+Usage:
+    PYTHONPATH=src python -m benchmarks.run [--suite micro,inprocess,http] \
+        [--requests 5000] [--cardinality 100] [--skew 1.1] [--concurrency 32] \
+        [--repeat 5] [--output results.json] [--baseline baseline.json]
+
+Suites:
+    micro      LogProcessor.process_log, generate_remediation and
+               SQLiteService.store_error/get_remediation, called directly
+    inprocess  the FastAPI app driven through an in-memory ASGI transport
+    http       a uvicorn server started on a free port (or --url) driven
+               over real HTTP
+
+Everything runs in a temporary directory, so the app gets a fresh SQLite
+database. Each benchmark is warmed up first (one discarded round of the
+microbenchmarks; every distinct error requested once from the app), then
+run --repeat times. Results report the median over the rounds of p50/p95/
+p99 latency and throughput and are saved as JSON; with --baseline, each
+benchmark is compared against the stored results and the run exits with
+status 1 if any regressed by more than --tolerance, by more than
+--min-delta-ms per request and beyond the spread of the baseline's rounds.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from benchmarks.workload import generate_workload
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+SUITES = ("micro", "inprocess", "http")
+
+# Metrics compared against the baseline: (key, True if higher is better)
+COMPARED_METRICS = (("p50_ms", False), ("p95_ms", False), ("throughput", True))
+
+# Metrics reported as the median over repeated rounds
+MEDIAN_METRICS = ("throughput", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, **extra) -> Dict[str, Any]:
+    """Latency percentiles in milliseconds and throughput per second."""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "throughput": round(len(ordered) / elapsed, 1) if elapsed > 0 else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 4) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 4),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4) if ordered else 0.0,
+        **extra
+    }
+
+
+def median_rounds(rounds: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Combine repeated rounds of benchmarks.
+
+    Each metric in MEDIAN_METRICS becomes its median over the rounds, and
+    "ranges" holds its [min, max]; other fields come from the last round.
+    """
+    combined = {}
+    for name, result in rounds[-1].items():
+        samples = [round_results[name] for round_results in rounds]
+        values = {metric: [sample[metric] for sample in samples] for metric in MEDIAN_METRICS}
+        combined[name] = dict(
+            result,
+            rounds=len(samples),
+            ranges={metric: [min(found), max(found)] for metric, found in values.items()},
+            **{metric: round(statistics.median(found), 4) for metric, found in values.items()}
+        )
+    return combined
+
+
+def _outside_range(previous: Dict[str, Any], current: Dict[str, Any], metric: str, higher_is_better: bool) -> bool:
+    """Whether every current round is worse than every baseline round (True if either has no ranges)."""
+    old_range = previous.get("ranges", {}).get(metric)
+    new_range = current.get("ranges", {}).get(metric)
+    if not old_range or not new_range:
+        return True
+    if higher_is_better:
+        return new_range[1] < old_range[0]
+    return new_range[0] > old_range[1]
+
+
+def time_calls(func: Callable, arguments: Iterable) -> Dict[str, Any]:
+    """Call func once per argument tuple and summarize the per-call latency."""
+    latencies = []
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    for args in arguments:
+        call_started = perf_counter()
+        func(*args)
+        latencies.append(perf_counter() - call_started)
+    return summarize(latencies, perf_counter() - started)
+
+
+def run_micro(events: List[Dict[str, Any]], workdir: str, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """Microbenchmark the hot-path building blocks individually.
+
+    One warm-up round is discarded, then the median of repeat rounds is
+    returned. Every round stores into a fresh database.
+    """
+    from api.app import ErrorLog, generate_remediation
+    from database.sqlite_service import SQLiteService
+    from processor.log_processor import LogProcessor
+
+    processor = LogProcessor()
+    error_logs = [ErrorLog.model_validate(event) for event in events]
+    essential_data = [
+        {"message": event["logEntry"]["message"], "level": event["logEntry"]["level"]}
+        for event in events
+    ]
+    distinct = list({data["message"]: (data, error_log) for data, error_log in zip(essential_data, error_logs)}.values())
+
+    def run_round(number: int) -> Dict[str, Dict[str, Any]]:
+        results = {
+            "micro.process_log": time_calls(processor.process_log, ((event,) for event in events)),
+            "micro.generate_remediation": time_calls(generate_remediation, ((error_log,) for error_log in error_logs)),
+        }
+        db = SQLiteService(os.path.join(workdir, f"micro-{number}.db"))
+        try:
+            results["micro.sqlite_store_error"] = time_calls(
+                db.store_error, ((data, generate_remediation(error_log)) for data, error_log in distinct)
+            )
+            results["micro.sqlite_get_remediation"] = time_calls(db.get_remediation, ((data,) for data in essential_data))
+        finally:
+            db.close()
+        return results
+
+    run_round(0)
+    return median_rounds([run_round(number) for number in range(1, repeat + 1)])
+
+
+async def drive(client, events: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """POST every event to /remediate from concurrency workers; summarize the latencies."""
+    latencies = []
+    sources = Counter()
+    errors = 0
+    pending = iter(events)
+
+    async def worker():
+        nonlocal errors
+        for event in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.post("/remediate", json=event)
+            except Exception:
+                response = None
+            latencies.append(time.perf_counter() - started)
+            if response is not None and response.status_code == 200:
+                sources[response.json().get("source", "unknown")] += 1
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(
+        latencies,
+        time.perf_counter() - started,
+        concurrency=concurrency,
+        errors=errors,
+        sources=dict(sources)
+    )
+
+
+async def drive_repeated(client, events: List[Dict[str, Any]], concurrency: int, repeat: int) -> Dict[str, Any]:
+    """Request every distinct error once to warm the app up, then drive it repeat times; the median round."""
+    distinct = list({event["logEntry"]["message"]: event for event in events}.values())
+    await drive(client, distinct, concurrency)
+    rounds = [{"remediate": await drive(client, events, concurrency)} for _ in range(repeat)]
+    return median_rounds(rounds)["remediate"]
+
+
+async def run_inprocess(events: List[Dict[str, Any]], concurrency: int, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """Drive the FastAPI app in this process through httpx's ASGI transport."""
+    import httpx
+    from api.app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            return {"inprocess.remediate": await drive_repeated(client, events, concurrency, repeat)}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_healthy(client, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("Server did not become healthy in time")
+        await asyncio.sleep(0.1)
+
+
+async def run_http(events: List[Dict[str, Any]], concurrency: int, workdir: str,
+                   url: Optional[str] = None, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """Drive a uvicorn server over HTTP; one is started in workdir unless url is given."""
+    import httpx
+
+    server = None
+    if url is None:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, PYTHONPATH=SRC_DIR)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api.app:app", "--port", str(port), "--log-level", "warning"],
+            cwd=workdir,
+            env=env
+        )
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+            await _wait_until_healthy(client)
+            return {"http.remediate": await drive_repeated(client, events, concurrency, repeat)}
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            min_delta_ms: float = 0.05) -> List[str]:
+    """Print a comparison with the baseline and return the regressions found.
+
+    A change is treated as noise, whatever its relative size, when it is
+    smaller than min_delta_ms per request (microbenchmarks run in
+    microseconds; throughput is converted to time per request for this
+    check) or when the current and baseline rounds overlap.
+    """
+    regressions = []
+    print(f"\n{'benchmark':32} {'metric':12} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if higher_is_better:
+                regressed = change < -tolerance and (not new or 1000 / new - 1000 / old >= min_delta_ms)
+            else:
+                regressed = change > tolerance and new - old >= min_delta_ms
+            regressed = regressed and _outside_range(previous, current, metric, higher_is_better)
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:32} {metric:12} {old:>12} {new:>12} {change:>+8.1%}{flag}")
+            if regressed:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(SRC_DIR), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the remediation service.")
+    parser.add_argument("--suite", default="micro,inprocess", help=f"Comma-separated suites: {', '.join(SUITES)}")
+    parser.add_argument("--requests", type=int, default=5000, help="Events per benchmark")
+    parser.add_argument("--cardinality", type=int, default=100, help="Distinct error messages in the workload")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of message repetition (0 = uniform)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients for inprocess/http")
+    parser.add_argument("--seed", type=int, default=42, help="Workload random seed")
+    parser.add_argument("--url", default=None, help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare against results saved by an earlier run")
+    parser.add_argument("--repeat", type=int, default=5, help="Measured rounds per benchmark; medians are reported")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before flagging")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="Ignore changes smaller than this many milliseconds per request")
+    args = parser.parse_args(argv)
+
+    suites = [suite.strip() for suite in args.suite.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+
+    # Keep per-request log output from dominating the measurements
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, SRC_DIR)
+    events = generate_workload(args.requests, args.cardinality, args.skew, args.seed)
+
+    output = os.path.abspath(args.output) if args.output else None
+    original_cwd = os.getcwd()
+    benchmarks = {}
+    with tempfile.TemporaryDirectory(prefix="remediation-bench-") as workdir:
+        # The app opens remediation.db in the working directory
+        os.chdir(workdir)
+        try:
+            if "micro" in suites:
+                benchmarks.update(run_micro(events, workdir, args.repeat))
+            if "inprocess" in suites:
+                benchmarks.update(asyncio.run(run_inprocess(events, args.concurrency, args.repeat)))
+            if "http" in suites:
+                http_dir = os.path.join(workdir, "http")
+                os.mkdir(http_dir)
+                benchmarks.update(asyncio.run(run_http(events, args.concurrency, http_dir, args.url, args.repeat)))
+        finally:
+            os.chdir(original_cwd)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workload": {
+                "requests": args.requests,
+                "cardinality": args.cardinality,
+                "skew": args.skew,
+                "concurrency": args.concurrency,
+                "seed": args.seed
+            },
+            "repeat": args.repeat
+        },
+        "benchmarks": benchmarks
+    }
+
+    print(f"{'benchmark':32} {'count':>7} {'per sec':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in benchmarks.items():
+        print(
+            f"{name:32} {result['count']:>7} {result['throughput']:>10} "
+            f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}"
+        )
+        if result.get("sources"):
+            print(f"{'':32} sources: {result['sources']}, errors: {result['errors']}")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("workload") != results["meta"]["workload"]:
+            print("\nWarning: baseline was recorded with a different workload")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions beyond tolerance.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Throughput of the remediation service as the number of worker processes grows.
+
+Usage:
+    PYTHONPATH=src python -m benchmarks.scaling [--workers 1,2,4] [--requests 20000] \
+        [--cardinality 100] [--skew 1.1] [--clients 4] [--concurrency 32] [--output scaling.json]
+
+For each worker count a server is started in a fresh temporary directory,
+with gunicorn and gunicorn.conf.py when gunicorn is installed and with
+uvicorn --workers otherwise. All workers share one SQLite database and one
+shared cache file. Every distinct error is requested once to warm the
+caches, then --clients load generator processes, each with --concurrency
+connections, replay the workload over HTTP.
+
+Reported per worker count: throughput, p50/p95 latency, speedup over the
+first worker count and scaling efficiency (speedup divided by the worker
+ratio). Workers only scale up to the number of CPUs not taken by the load
+generators; on a machine with fewer cores than workers the extra processes
+just take turns and the speedup stays close to 1.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.run import SRC_DIR, _free_port, _wait_until_healthy, drive
+from benchmarks.workload import generate_workload
+
+CONFIG_PATH = os.path.join(os.path.dirname(SRC_DIR), "gunicorn.conf.py")
+
+
+def start_server(workers: int, port: int, workdir: str) -> subprocess.Popen:
+    """Start the app with workers processes in workdir."""
+    env = dict(
+        os.environ,
+        PYTHONPATH=SRC_DIR,
+        REMEDIATION_DB_PATH=os.path.join(workdir, "remediation.db"),
+        REMEDIATION_SHARED_CACHE=os.path.join(workdir, "shared-cache.db"),
+        WEB_CONCURRENCY=str(workers),
+        BIND=f"127.0.0.1:{port}"
+    )
+    env.setdefault("LOG_LEVEL", "WARNING")
+    if importlib.util.find_spec("gunicorn") is not None:
+        command = [sys.executable, "-m", "gunicorn", "-c", CONFIG_PATH, "--log-level", "warning", "api.app:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "api.app:app", "--port", str(port),
+                   "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=workdir, env=env)
+
+
+async def _drive_url(url: str, events: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        await _wait_until_healthy(client)
+        return await drive(client, events, concurrency)
+
+
+def _client_process(url: str, events: List[Dict[str, Any]], concurrency: int, start_at: float, results):
+    """Load generator: wait for the common start time, then replay events."""
+    time.sleep(max(0.0, start_at - time.time()))
+    started = time.perf_counter()
+    summary = asyncio.run(_drive_url(url, events, concurrency))
+    results.put((summary, time.perf_counter() - started))
+
+
+def measure(workers: int, events: List[Dict[str, Any]], clients: int, concurrency: int) -> Dict[str, Any]:
+    """Start a server with workers processes, warm it and drive it from clients processes."""
+    distinct = list({event["logEntry"]["message"]: event for event in events}.values())
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="remediation-scaling-") as workdir:
+        server = start_server(workers, port, workdir)
+        try:
+            asyncio.run(_drive_url(url, distinct, concurrency))
+
+            context = multiprocessing.get_context("spawn")
+            results = context.Queue()
+            start_at = time.time() + 1.0
+            processes = [
+                context.Process(target=_client_process,
+                                args=(url, events[i::clients], concurrency, start_at, results))
+                for i in range(clients)
+            ]
+            for process in processes:
+                process.start()
+            outcomes = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    elapsed = max(seconds for _, seconds in outcomes)
+    count = sum(summary["count"] for summary, _ in outcomes)
+    return {
+        "workers": workers,
+        "count": count,
+        "throughput": round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        # Medians of the per-client percentiles: close enough for equal-sized clients
+        "p50_ms": round(sorted(summary["p50_ms"] for summary, _ in outcomes)[len(outcomes) // 2], 4),
+        "p95_ms": round(sorted(summary["p95_ms"] for summary, _ in outcomes)[len(outcomes) // 2], 4),
+        "errors": sum(summary["errors"] for summary, _ in outcomes)
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure throughput scaling with the number of workers.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per worker count")
+    parser.add_argument("--cardinality", type=int, default=100, help="Distinct error messages")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of message popularity")
+    parser.add_argument("--clients", type=int, default=4, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Connections per load generator")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    worker_counts = [int(count) for count in args.workers.split(",") if count.strip()]
+    events = generate_workload(args.requests, args.cardinality, args.skew)
+    print(f"{os.cpu_count()} CPU(s); {args.clients} load generator(s) x {args.concurrency} connections")
+
+    rows = []
+    for workers in worker_counts:
+        row = measure(workers, events, args.clients, args.concurrency)
+        base = rows[0] if rows else row
+        row["speedup"] = round(row["throughput"] / base["throughput"], 2) if base["throughput"] else 0.0
+        row["efficiency"] = round(row["speedup"] / (workers / base["workers"]), 2)
+        rows.append(row)
+
+    print(f"\n{'workers':>8} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'speedup':>8} {'efficiency':>11} {'errors':>7}")
+    for row in rows:
+        print(f"{row['workers']:>8} {row['throughput']:>10.1f} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f} "
+              f"{row['speedup']:>8.2f} {row['efficiency']:>11.2f} {row['errors']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpus": os.cpu_count(), "clients": args.clients, "concurrency": args.concurrency,
+                       "requests": args.requests, "results": rows}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
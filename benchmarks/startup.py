@@ -0,0 +1,157 @@
+"""
+Per-worker startup cost of the remediation service.
+
+Usage:
+    PYTHONPATH=src python -m benchmarks.startup [--repeat 5] [--env STORAGE_BACKEND=tiered] \
+        [--top 15] [--src path/to/src] [--output startup.json]
+
+Each sample starts a fresh interpreter, as a new uvicorn worker or replica
+would, and measures:
+
+    import_ms         time to import api.app
+    startup_ms        time to run the lifespan startup (storage, agents, warm-up)
+    first_request_ms  latency of the first POST /remediate
+    rss_*_mb          resident memory at interpreter start, after the import
+                      and after startup
+
+Medians over --repeat samples are reported. --top lists the modules
+api.app imports directly, by cumulative import time (python -X importtime).
+--src measures another checkout, e.g. a git worktree of an older commit,
+to compare before and after a change.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.run import SRC_DIR
+from benchmarks.workload import generate_workload
+
+# Runs in the child interpreter; keep its own imports minimal so they do not
+# show up in the memory figures
+PROBE = r"""
+import json, os, sys, time
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+result = {"rss_start_mb": rss_mb()}
+started = time.perf_counter()
+import api.app as module
+result["import_ms"] = (time.perf_counter() - started) * 1000
+result["rss_import_mb"] = rss_mb()
+
+async def main():
+    app = module.app
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        result["startup_ms"] = (time.perf_counter() - started) * 1000
+        result["rss_ready_mb"] = rss_mb()
+        import httpx
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://startup") as client:
+            started = time.perf_counter()
+            response = await client.post("/remediate", json=json.loads(os.environ["STARTUP_PROBE_EVENT"]))
+            result["first_request_ms"] = (time.perf_counter() - started) * 1000
+            response.raise_for_status()
+
+import asyncio
+asyncio.run(main())
+print(json.dumps(result))
+"""
+
+MEASURES = ("import_ms", "startup_ms", "first_request_ms", "rss_start_mb", "rss_import_mb", "rss_ready_mb")
+
+
+def _child_env(src: str, overrides: Dict[str, str], event: Dict[str, Any]) -> Dict[str, str]:
+    env = dict(os.environ, PYTHONPATH=src, STARTUP_PROBE_EVENT=json.dumps(event))
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.update(overrides)
+    return env
+
+
+def sample(src: str, overrides: Dict[str, str], event: Dict[str, Any]) -> Dict[str, float]:
+    """Start one interpreter in a fresh directory and return its measurements."""
+    with tempfile.TemporaryDirectory(prefix="remediation-startup-") as workdir:
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=workdir, env=_child_env(src, overrides, event), capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def import_profile(src: str, overrides: Dict[str, str], top: int) -> List[Tuple[str, float]]:
+    """Modules imported directly by api.app, slowest first, as (name, cumulative ms)."""
+    with tempfile.TemporaryDirectory(prefix="remediation-startup-") as workdir:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import api.app"],
+            cwd=workdir, env=_child_env(src, overrides, {}), capture_output=True, text=True
+        )
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        # api.app itself is not indented; its direct imports are one level in
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            modules.append((name.strip(), int(cumulative) / 1000))
+    return sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure per-worker startup time and memory.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to sample")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Environment override for the app (repeatable)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest direct imports to list (0 to skip)")
+    parser.add_argument("--src", default=SRC_DIR, help="Source tree to measure")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    for item in args.env:
+        key, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"--env expects KEY=VALUE, got {item!r}")
+        overrides[key] = value
+
+    event = generate_workload(1)[0]
+    src = os.path.abspath(args.src)
+    samples = [sample(src, overrides, event) for _ in range(args.repeat)]
+    summary = {measure: round(statistics.median(s[measure] for s in samples), 1) for measure in MEASURES}
+
+    print(f"{'measure':<20} {'median':>10}")
+    for measure in MEASURES:
+        print(f"{measure:<20} {summary[measure]:>10.1f}")
+
+    profile = import_profile(src, overrides, args.top) if args.top > 0 else []
+    if profile:
+        print(f"\n{'direct import of api.app':<40} {'cumulative ms':>14}")
+        for name, cumulative in profile:
+            print(f"{name:<40} {cumulative:>14.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "src": src,
+                "env": overrides,
+                "repeat": args.repeat,
+                "median": summary,
+                "samples": samples,
+                "imports": [{"module": name, "cumulative_ms": cumulative} for name, cumulative in profile]
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Synthetic ErrorLog workloads.
+
+A workload is a fixed pool of `cardinality` distinct error messages, drawn
+from with a Zipf distribution: message k (1-based) is picked with weight
+1 / k**skew, so skew=0 is uniform and skew≈1.1 resembles production logs
+where a few errors dominate. The same seed always yields the same events.
+"""
+import itertools
+import random
+from typing import Any, Dict, List
+
+# Message shapes covering every remediation rule plus the default, with
+# variable parts so distinct messages also differ in their fingerprints
+MESSAGE_SHAPES = [
+    ("CRITICAL", "Security breach detected from {ip}"),
+    ("ERROR", "Database connection failed to {ip}:{port}"),
+    ("CRITICAL", "Database crash detected on shard {n}"),
+    ("ERROR", "Memory overflow in worker {n} ({mb} MB used)"),
+    ("ERROR", "Request {uuid} failed with status {status}"),
+    ("WARNING", "Disk usage at {pct}% on volume {word}"),
+    ("ERROR", "Timeout calling {word}-service after {ms} ms"),
+    ("ERROR", "Unhandled {word} exception in job {n}"),
+]
+
+WORDS = ["billing", "orders", "search", "auth", "inventory", "payments", "profile", "reports",
+         "gateway", "catalog", "mailer", "scheduler", "ledger", "notifier", "ingest", "cache"]
+
+
+def _message(rng: random.Random, index: int) -> Dict[str, str]:
+    level, shape = MESSAGE_SHAPES[index % len(MESSAGE_SHAPES)]
+    # Vary the static words too so distinct messages are distinct templates
+    slot = index // len(MESSAGE_SHAPES)
+    word = f"{WORDS[slot % len(WORDS)]}{slot // len(WORDS)}"
+    message = shape.format(
+        ip=f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+        port=rng.randrange(1024, 65535),
+        n=rng.randrange(1000, 99999),
+        mb=rng.randrange(1000, 64000),
+        uuid=f"{rng.getrandbits(128):032x}",
+        status=rng.choice([500, 502, 503, 504]),
+        pct=rng.randrange(80, 100),
+        word=word,
+        ms=rng.randrange(1000, 30000),
+    )
+    if "{word}" not in shape:
+        message = f"{message} in {word}"
+    return {"level": level, "message": message}
+
+
+def make_event(event_id: str, level: str, message: str, host: str = "bench-01",
+               application: str = "BenchApp") -> Dict[str, Any]:
+    """Build one ErrorLog payload."""
+    return {
+        "eventId": event_id,
+        "eventTimestamp": "2025-05-29T05:45:24.644650+00:00",
+        "sourceAgent": {"name": "AnomalyDetectionAgent", "version": "1.0.0"},
+        "logEntry": {
+            "originalLine": f"2025-05-28 22:45:24 {level}: {message}",
+            "timestamp": "2025-05-28T22:45:24Z",
+            "level": level,
+            "message": message
+        },
+        "anomalyDetectionResults": {
+            "reason": "Contains known anomaly pattern (keyword match)",
+            "score": -1.0,
+            "notes": "Synthetic benchmark event",
+            "matchedPatterns": []
+        },
+        "contextualMetadata": {
+            "applicationName": application,
+            "environment": "benchmark",
+            "affectedHost": host
+        }
+    }
+
+
+def generate_workload(count: int, cardinality: int = 100, skew: float = 1.1, seed: int = 42) -> List[Dict[str, Any]]:
+    """Return count ErrorLog payloads over cardinality distinct messages, Zipf-distributed."""
+    rng = random.Random(seed)
+    pool = [_message(rng, index) for index in range(cardinality)]
+    cum_weights = list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, cardinality + 1)))
+    picks = rng.choices(range(cardinality), cum_weights=cum_weights, k=count)
+    return [
+        make_event(f"bench-{i}", pool[pick]["level"], pool[pick]["message"], host=f"bench-{pick % 8:02d}")
+        for i, pick in enumerate(picks)
+    ]
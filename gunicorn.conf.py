@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration for running the remediation service with several workers.
+
+Usage:
+    PYTHONPATH=src gunicorn -c gunicorn.conf.py api.app:app
+
+Every worker is a uvicorn worker with its own event loop and in-process
+cache. Workers share the SQLite database (REMEDIATION_DB_PATH) and a
+shared cache file (REMEDIATION_SHARED_CACHE), through which they publish
+stored remediations and invalidate each other's cached copies.
+
+The app is imported once in the master and forked (preload_app). Storage,
+caches and the GenAI agent are created in each worker's lifespan startup,
+after the fork, so no connection or thread is shared between processes.
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Every worker must open the same files whatever directory it runs from
+os.environ.setdefault("REMEDIATION_DB_PATH", os.path.abspath("remediation.db"))
+os.environ.setdefault(
+    "REMEDIATION_SHARED_CACHE",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "remediation-cache.db")
+)
+
+
+def on_starting(server):
+    """Start from an empty shared cache: entries left by a previous run may be stale."""
+    path = os.environ["REMEDIATION_SHARED_CACHE"]
+    for leftover in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
@@ -1,17 +1,25 @@
-import sqlite3
+"""
+Query the remediation database.
+
+Usage:
+    PYTHONPATH=src python query_sqlite.py [--level ERROR] [--action restart_database] \
+        [--since 2025-05-01] [--until 2025-06-01] [--search "connection failed"] \
+        [--limit 20 | --all] [--format text|ndjson|csv] [--db remediation.db]
+    PYTHONPATH=src python query_sqlite.py --compact [--db remediation.db]
+
+Rows are read newest first, one page at a time, so even --all on a table
+with millions of errors streams with constant memory.
+"""
+import argparse
 import json
+import sys
 from datetime import datetime
+from itertools import islice
 
-DB_PATH = "remediation.db"
+from database.export import EXPORT_FORMATS, iter_export
+from database.sqlite_service import SQLiteService
 
-
-def fetch_all_errors():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, error_hash, timestamp, message, level, remediation FROM errors ORDER BY timestamp DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+DB_PATH = "remediation.db"
 
 
 def format_timestamp(timestamp):
@@ -19,34 +27,83 @@ def format_timestamp(timestamp):
     try:
         dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
         return dt.strftime("%Y-%m-%d %H:%M:%S")
-    except:
+    except (TypeError, ValueError):
         return timestamp
 
 
-def main():
-    rows = fetch_all_errors()
-    if not rows:
-        print("No records found in the errors table.")
+def print_record(record):
+    print("\n" + "-" * 100)
+    print(f"Record ID: {record['id']}")
+    print(f"Timestamp: {format_timestamp(record['timestamp'])}")
+    print(f"Error Hash: {record['error_hash']}")
+    print(f"Message: {record['message']}")
+    print(f"Level: {record['level']}")
+    print(f"Action: {record['action']}")
+    print("\nREMEDIATION:")
+    print(json.dumps(record["remediation"], indent=2))
+    print("-" * 100)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query stored errors and remediations.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database path")
+    parser.add_argument("--level", help="Only errors with this level (e.g. ERROR)")
+    parser.add_argument("--action", help="Only remediations with this action (e.g. restart_database)")
+    parser.add_argument("--since", help="Only errors stored at or after this ISO date/time")
+    parser.add_argument("--until", help="Only errors stored before this ISO date/time")
+    parser.add_argument("--search", help="Only messages containing this text")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of records (default 20)")
+    parser.add_argument("--all", action="store_true", help="Return every matching record")
+    parser.add_argument("--format", default="text", choices=("text",) + EXPORT_FORMATS, help="Output format")
+    parser.add_argument("--compact", action="store_true",
+                        help="Convert legacy rows to template references and vacuum the database, "
+                             "enabling incremental vacuum")
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        db = SQLiteService(args.db)
+        try:
+            print(f"Compacted {db.compact()} rows.")
+        finally:
+            db.close()
         return
 
-    print("\n" + "=" * 100)
-    print("REMEDIATION DATABASE CONTENTS")
-    print("=" * 100)
+    filters = {
+        "level": args.level.upper() if args.level else None,
+        "action": args.action,
+        "since": args.since,
+        "until": args.until,
+        "search": args.search
+    }
+    db = SQLiteService(args.db)
+    try:
+        records = db.iter_errors(filters, batch_size=min(args.limit, 1000) if not args.all else 1000)
+        if not args.all:
+            records = islice(records, args.limit)
 
-    for row in rows:
-        id, error_hash, timestamp, message, level, remediation = row
-        remediation_data = json.loads(remediation)
+        if args.format != "text":
+            for chunk in iter_export(records, args.format):
+                sys.stdout.write(chunk)
+            return
 
-        print("\n" + "-" * 100)
-        print(f"Record ID: {id}")
-        print(f"Timestamp: {format_timestamp(timestamp)}")
-        print(f"Error Hash: {error_hash}")
-        print(f"Message: {message}")
-        print(f"Level: {level}")
-        print("\nREMEDIATION:")
-        print(json.dumps(remediation_data, indent=2))
-        print("-" * 100)
+        count = 0
+        for record in records:
+            if count == 0:
+                print("\n" + "=" * 100)
+                print("REMEDIATION DATABASE CONTENTS")
+                print("=" * 100)
+            print_record(record)
+            count += 1
+        if count == 0:
+            print("No matching records found in the errors table.")
+    except ValueError as e:
+        parser.error(str(e))
+    except BrokenPipeError:
+        # Output piped into head and friends
+        sys.stderr.close()
+    finally:
+        db.close()
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,31 +1,63 @@
-from typing import Dict, Any
-import os
-from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel
+from typing import AsyncIterator, Dict, Any, Optional
+import logging
+from agent.generation_pipeline import GenerationPipeline
+from agent.model_clients import create_model_client
 
 class GenAIAgent:
-    def __init__(self):
-        # Load the Vertex AI API key from the JSON file
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/home/anish/RemediationAgent/orbit-460719-c8e358a7f170.json"
-        # Initialize Vertex AI with the correct project ID and location
-        aiplatform.init(project="orbit-460719", location="us-central1")
-        # Use the Gemini model
-        self.model = GenerativeModel("gemini-2.0-flash-lite-001")
+    def __init__(self, model_client=None, timeout: float = 10.0, max_concurrency: int = 4,
+                 rate_limit: float = 5.0, burst: int = 10, queue_size: int = 100,
+                 max_batch_size: int = 8, batch_window: float = 0.01):
+        """
+        Set up the generation pipeline around a model client.
+
+        Defaults to Gemini on Vertex AI; pass StubModelClient (or any object
+        with an async generate(prompt) method) to run without the cloud.
+        """
+        if model_client is None:
+            model_client = create_model_client("vertex")
+        self.model_client = model_client
+        self.timeout = timeout
+        self.pipeline = GenerationPipeline(
+            model_client,
+            max_concurrency=max_concurrency,
+            rate_limit=rate_limit,
+            burst=burst,
+            queue_size=queue_size,
+            max_batch_size=max_batch_size,
+            batch_window=batch_window
+        )
+
+    def start(self):
+        """Start the pipeline workers; must be called from a running event loop."""
+        self.pipeline.start()
+
+    async def stop(self):
+        """Stop the pipeline workers."""
+        await self.pipeline.stop()
 
-    def get_remediation(self, processed_log: Dict[str, Any]) -> str:
+    async def get_remediation(self, processed_log: Dict[str, Any], timeout: Optional[float] = None) -> str:
         """
         Generate remediation steps based on the processed error log.
+
+        Raises GenerationError when the model fails, the queue is full or the
+        deadline passes, so callers can fall back to rule-based remediation.
+        """
+        prompt = self._construct_prompt(processed_log)
+        remediation = await self.pipeline.submit(prompt, timeout if timeout is not None else self.timeout)
+        logging.debug(f"Generated Remediation:\n{remediation}")
+        return remediation
+
+    async def stream_remediation(self, processed_log: Dict[str, Any],
+                                 timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield remediation steps for the processed error log as the model writes them.
+
+        timeout applies to each wait for the next chunk. Raises GenerationError
+        like get_remediation.
         """
-        try:
-            prompt = self._construct_prompt(processed_log)
-            response = self.model.generate_content(prompt)
-            remediation = response.text.strip()
-            print(f"Generated Remediation:\n{remediation}")
-            return remediation
-        except Exception as e:
-            error_msg = str(e)
-            print(f"Full error: {error_msg}")  # Print full error for debugging
-            raise Exception(f"Error generating remediation: {error_msg}")
+        prompt = self._construct_prompt(processed_log)
+        async for chunk in self.pipeline.stream(prompt, timeout if timeout is not None else self.timeout):
+            yield chunk
 
     def _construct_prompt(self, processed_log: Dict[str, Any]) -> str:
         """
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+class GenerationError(Exception):
+    """Raised when a prompt cannot be answered by the model in time."""
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter: rate tokens per second, up to capacity."""
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int = 1):
+        """Wait until tokens are available, then take them."""
+        tokens = min(tokens, self.capacity)
+        # The lock keeps waiters first-come, first-served
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class _Job:
+    __slots__ = ("prompt", "future", "deadline")
+
+    def __init__(self, prompt: str, future: asyncio.Future, deadline: Optional[float]):
+        self.prompt = prompt
+        self.future = future
+        # Event loop time after which the caller no longer waits; None for never
+        self.deadline = deadline
+
+
+class GenerationPipeline:
+    """Bounded, rate-limited and micro-batched queue in front of a model client.
+
+    Prompts wait in a queue of at most queue_size entries. max_concurrency
+    workers each take a prompt, gather whatever else arrives within
+    batch_window seconds (up to max_batch_size prompts), wait for the rate
+    limiter and send the batch to the model. Callers that hit their deadline
+    get a GenerationError and their prompt is dropped if not yet sent. A
+    model call still running at the latest deadline in its batch is
+    cancelled and fails that batch only, so a hung call never holds a
+    worker for longer than its callers wait.
+
+    stream() sends a single prompt outside the queue and yields the model's
+    output as it arrives. Streams share the rate limiter but have their own
+    max_concurrency slots, so they never hold up queued prompts.
+    """
+
+    def __init__(self, model_client, max_concurrency: int = 4, rate_limit: float = 5.0,
+                 burst: int = 10, queue_size: int = 100, max_batch_size: int = 8,
+                 batch_window: float = 0.01):
+        self.model_client = model_client
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.max_batch_size = max(1, min(max_batch_size, burst))
+        self.batch_window = batch_window
+        self._bucket = TokenBucket(rate_limit, burst)
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._stream_slots: Optional[asyncio.Semaphore] = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.batches = 0
+        self.streams = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stream_slots = asyncio.Semaphore(self.max_concurrency)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"genai-worker-{i}")
+            for i in range(self.max_concurrency)
+        ]
+
+    async def stop(self):
+        """Cancel the workers and fail any prompt still queued."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.set_exception(GenerationError("Generation pipeline stopped"))
+
+    async def submit(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Queue a prompt and wait for its completion, at most timeout seconds."""
+        if not self._workers:
+            raise GenerationError("Generation pipeline is not running")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        deadline = loop.time() + timeout if timeout is not None else None
+        try:
+            self._queue.put_nowait(_Job(prompt, future, deadline))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise GenerationError("Generation queue is full")
+        self.submitted += 1
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise GenerationError(f"Generation timed out after {timeout}s")
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield the model's output for a prompt in chunks.
+
+        timeout bounds the wait for a slot and a rate limiter token, and then
+        each wait for the next chunk, rather than the whole generation. Model
+        clients without generate_stream produce a single chunk.
+        """
+        if not self._workers:
+            raise GenerationError("Generation pipeline is not running")
+        self.submitted += 1
+        try:
+            await asyncio.wait_for(self._stream_slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise GenerationError(f"No generation slot free after {timeout}s")
+        try:
+            try:
+                await asyncio.wait_for(self._bucket.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise GenerationError(f"Generation rate limited for {timeout}s")
+            self.streams += 1
+            if hasattr(self.model_client, "generate_stream"):
+                chunks = self.model_client.generate_stream(prompt)
+            else:
+                chunks = _single_chunk(self.model_client.generate(prompt))
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    yield chunk
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise GenerationError(f"Generation stalled for {timeout}s")
+            except Exception as e:
+                self.failed += 1
+                raise GenerationError(f"Error generating remediation: {str(e)}")
+            finally:
+                await chunks.aclose()
+            self.completed += 1
+        finally:
+            self._stream_slots.release()
+
+    async def _collect_batch(self) -> List[_Job]:
+        """Take one job, then whatever else arrives within the batch window."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        window_end = loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = window_end - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._collect_batch()
+            batch = [job for job in batch if not job.future.done()]
+            if not batch:
+                continue
+            await self._bucket.acquire(len(batch))
+            # Drop prompts whose callers gave up while we waited for tokens
+            batch = [job for job in batch if not job.future.done()]
+            if not batch:
+                continue
+
+            self.batches += 1
+            prompts = [job.prompt for job in batch]
+            if len(batch) > 1 and hasattr(self.model_client, "generate_batch"):
+                call = self.model_client.generate_batch(prompts)
+            else:
+                call = asyncio.gather(*(self.model_client.generate(prompt) for prompt in prompts), return_exceptions=True)
+            deadlines = [job.deadline for job in batch]
+            timeout = None if None in deadlines else max(0.0, max(deadlines) - asyncio.get_running_loop().time())
+            try:
+                results = await asyncio.wait_for(call, timeout)
+            except asyncio.TimeoutError:
+                logging.error(f"Model call for a batch of {len(batch)} prompt(s) timed out after {timeout:.1f}s")
+                results = [GenerationError(f"Generation timed out after {timeout:.1f}s")] * len(batch)
+            except Exception as e:
+                logging.error(f"Model call failed for a batch of {len(batch)} prompt(s): {str(e)}")
+                results = [e] * len(batch)
+
+            for job, result in zip(batch, results):
+                if job.future.done():
+                    continue
+                if isinstance(result, Exception):
+                    self.failed += 1
+                    job.future.set_exception(GenerationError(f"Error generating remediation: {str(result)}"))
+                else:
+                    self.completed += 1
+                    job.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the pipeline counters."""
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "streams": self.streams
+        }
+
+
+async def _single_chunk(completion) -> AsyncIterator[str]:
+    yield await completion
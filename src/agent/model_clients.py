@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import os
+from typing import AsyncIterator, List, Union
+
+
+class VertexModelClient:
+    """Gemini on Vertex AI.
+
+    The Google SDKs are imported when the client is created, so modules that
+    only reference this class do not pay their import cost.
+    """
+
+    def __init__(self, project: str = "orbit-460719", location: str = "us-central1",
+                 model_name: str = "gemini-2.0-flash-lite-001", credentials_path: str = None):
+        if credentials_path:
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
+        from google.cloud import aiplatform
+        from vertexai.generative_models import GenerativeModel
+
+        aiplatform.init(project=project, location=location)
+        self.model = GenerativeModel(model_name)
+
+    async def generate(self, prompt: str) -> str:
+        """Generate a completion for a single prompt."""
+        response = await self.model.generate_content_async(prompt)
+        return response.text.strip()
+
+    async def generate_batch(self, prompts: List[str]) -> List[Union[str, Exception]]:
+        """Generate completions for several prompts concurrently.
+
+        A prompt that fails gets its exception in place of a completion, so
+        it does not fail the rest of the batch.
+        """
+        return await asyncio.gather(*(self.generate(prompt) for prompt in prompts), return_exceptions=True)
+
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the completion for a prompt in chunks, as the model produces them."""
+        responses = await self.model.generate_content_async(prompt, stream=True)
+        async for response in responses:
+            if response.text:
+                yield response.text
+
+
+class StubModelClient:
+    """Deterministic local model for tests and benchmarks.
+
+    Every call sleeps for latency seconds (once per batch for generate_batch,
+    spread over the lines for generate_stream) and returns canned
+    remediation text derived from the prompt.
+    """
+
+    def __init__(self, latency: float = 0.0, fail: bool = False):
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+        self.batches = 0
+
+    def _respond(self, prompt: str) -> str:
+        if self.fail:
+            raise RuntimeError("Stub model failure")
+        digest = hashlib.md5(prompt.encode()).hexdigest()[:8]
+        return (
+            f"1. Investigate the reported error (ref {digest}).\n"
+            "2. Restart the affected service if it is unhealthy.\n"
+            "3. Confirm the error no longer appears in the logs."
+        )
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def generate_batch(self, prompts: List[str]) -> List[str]:
+        self.calls += len(prompts)
+        self.batches += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._respond(prompt) for prompt in prompts]
+
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        lines = self._respond(prompt).splitlines(keepends=True)
+        for line in lines:
+            if self.latency:
+                await asyncio.sleep(self.latency / len(lines))
+            yield line
+
+
+def create_model_client(name: str):
+    """Build a model client by name: "vertex" or "stub"."""
+    if name == "vertex":
+        # Credentials come from the environment (GOOGLE_APPLICATION_CREDENTIALS
+        # or the attached service account)
+        return VertexModelClient()
+    if name == "stub":
+        return StubModelClient(latency=float(os.getenv("GENAI_STUB_LATENCY", "0")))
+    raise ValueError(f"Unknown model client: {name}")
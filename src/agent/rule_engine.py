@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+
+TEMPLATE_VARIABLE_REGEX = re.compile(r"\{(\w+)\}")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton finding every keyword occurring in a text.
+
+    Matching walks the text once, so its cost depends on the text length and
+    not on how many keywords are loaded.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] += (index,)
+
+        # Breadth-first pass wiring failure links and merging outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> set:
+        """Return the indexes of all keywords occurring in text."""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+def _compile_template(value: Any):
+    """Pre-split template strings so rendering is a join, not a parse."""
+    if isinstance(value, str):
+        match = TEMPLATE_VARIABLE_REGEX.fullmatch(value)
+        if match:
+            return ("var", match.group(1))
+        parts = TEMPLATE_VARIABLE_REGEX.split(value)
+        if len(parts) == 1:
+            return ("const", value)
+        # split() alternates literal text and variable names
+        return ("format", tuple(parts))
+    if isinstance(value, dict):
+        return ("dict", tuple((key, _compile_template(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return ("list", tuple(_compile_template(item) for item in value))
+    return ("const", value)
+
+
+def _render_template(compiled, variables: Dict[str, Any]) -> Any:
+    """Render a compiled template with the given variables."""
+    kind, value = compiled
+    if kind == "const":
+        return value
+    if kind == "var":
+        return variables.get(value, "{" + value + "}")
+    if kind == "format":
+        return "".join(
+            part if i % 2 == 0 else str(variables.get(part, "{" + part + "}"))
+            for i, part in enumerate(value)
+        )
+    if kind == "dict":
+        return {key: _render_template(item, variables) for key, item in value}
+    return [_render_template(item, variables) for item in value]
+
+
+class Rule:
+    """A single remediation rule compiled from its rule file definition."""
+
+    def __init__(self, definition: Dict[str, Any], order: int):
+        self.id = definition.get("id", f"rule_{order}")
+        self.priority = definition.get("priority", 0)
+        self.order = order
+        self.match = [keyword.lower() for keyword in definition.get("match", [])]
+        self.exclude = [keyword.lower() for keyword in definition.get("exclude", [])]
+        # Keywords match the lowercased message, but values are extracted
+        # from the original so they keep their case; patterns ignore case
+        self.extract = [
+            (name, re.compile(spec["pattern"], re.IGNORECASE), spec.get("default", ""))
+            for name, spec in definition.get("extract", {}).items()
+        ]
+        if "remediation" not in definition:
+            raise ValueError(f"Rule {self.id} has no remediation")
+        self.remediation = _compile_template(definition["remediation"])
+
+    def render(self, message: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the remediation for a message matched by this rule."""
+        if self.extract:
+            variables = dict(variables)
+            for name, pattern, default in self.extract:
+                match = pattern.search(message)
+                if match is None:
+                    variables[name] = default
+                else:
+                    variables[name] = (match.group(1) if pattern.groups else match.group()).strip()
+        return _render_template(self.remediation, variables)
+
+
+class CompiledRuleSet:
+    """Immutable rule set with a single automaton over all rule keywords."""
+
+    def __init__(self, definitions: Dict[str, Any]):
+        self.rules = [Rule(definition, order) for order, definition in enumerate(definitions.get("rules", []))]
+        if "default" not in definitions:
+            raise ValueError("Rule file must define a default remediation")
+        self.default = Rule(definitions["default"], len(self.rules))
+
+        keywords = []
+        keyword_index = {}
+        self._required = []
+        self._excluded = []
+        for rule in self.rules:
+            if not rule.match:
+                raise ValueError(f"Rule {rule.id} needs at least one match keyword")
+            required = set()
+            excluded = set()
+            for keyword, target in [(k, required) for k in rule.match] + [(k, excluded) for k in rule.exclude]:
+                if keyword not in keyword_index:
+                    keyword_index[keyword] = len(keywords)
+                    keywords.append(keyword)
+                target.add(keyword_index[keyword])
+            self._required.append(frozenset(required))
+            self._excluded.append(frozenset(excluded))
+
+        # Rules are only considered when one of their keywords occurred
+        self._rules_by_keyword = [[] for _ in keywords]
+        for index, required in enumerate(self._required):
+            for keyword_id in required:
+                self._rules_by_keyword[keyword_id].append(index)
+
+        self._automaton = KeywordAutomaton(keywords)
+
+    def select(self, message: str) -> Rule:
+        """Return the highest-priority rule whose keywords all occur in message."""
+        found = self._automaton.find(message)
+        best = None
+        for keyword_id in found:
+            for index in self._rules_by_keyword[keyword_id]:
+                rule = self.rules[index]
+                if best is not None and (rule.priority, -rule.order) <= (best.priority, -best.order):
+                    continue
+                if self._required[index] <= found and not (self._excluded[index] & found):
+                    best = rule
+        return best or self.default
+
+
+def load_rule_definitions(path: str) -> Dict[str, Any]:
+    """Load a rule file; JSON by default, YAML when the extension says so."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to load YAML rule files")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+class RuleEngine:
+    """Data-driven remediation generator with hot-reloadable rules.
+
+    The rule file is re-read when its modification time changes, checked at
+    most once every reload_interval seconds. A rule file that fails to load
+    is logged and the previous rule set stays active.
+    """
+
+    def __init__(self, path: str = DEFAULT_RULES_PATH, reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        self._rules = None
+        self.reload()
+
+    def reload(self) -> bool:
+        """Reload the rule file if it changed. Returns True when rules were swapped."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime and self._rules is not None:
+                    return False
+                rules = CompiledRuleSet(load_rule_definitions(self.path))
+            except Exception as e:
+                if self._rules is None:
+                    raise
+                logging.error(f"Failed to reload remediation rules from {self.path}: {str(e)}")
+                return False
+            self._rules = rules
+            self._mtime = mtime
+            logging.info(f"Loaded {len(rules.rules)} remediation rules from {self.path}")
+            return True
+
+    def _maybe_reload(self):
+        """Check the rule file for changes, rate-limited by reload_interval."""
+        now = time.monotonic()
+        if self.reload_interval is not None and now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.reload()
+
+    @property
+    def rule_count(self) -> int:
+        return len(self._rules.rules)
+
+    def evaluate(self, message: str, level: str = "", app_name: str = "unknown",
+                 host: str = "unknown") -> Dict[str, Any]:
+        """Generate the remediation for an error from the best matching rule."""
+        self._maybe_reload()
+        rules = self._rules
+        message = message or ""
+        variables = {
+            "message": message,
+            "level": (level or "").upper(),
+            "app_name": app_name,
+            "host": host
+        }
+        # Only keyword matching is case-insensitive: extracted values and
+        # {message} keep the original case, so templatize_remediation finds
+        # them again (e.g. 0xDEADBEEF or /Var/Log)
+        return rules.select(message.lower()).render(message, variables)
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Call:
+    """A shared execution and the number of callers still waiting for it."""
+
+    __slots__ = ("task", "callers")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.callers = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent async calls that share a key into one execution.
+
+    The first caller for a key starts the function in its own task; every
+    caller, including that first one, waits for and shares its result or
+    exception. A caller being cancelled only stops its own wait; the
+    execution is cancelled once no caller is left waiting. Once the call
+    completes the key is forgotten, so later calls run again.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def _forget(self, key: str, call: _Call):
+        if self._in_flight.get(key) is call:
+            del self._in_flight[key]
+
+    def _finished(self, key: str, call: _Call, task: asyncio.Task):
+        self._forget(key, call)
+        # Also marks the exception as retrieved in case nobody was waiting
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+
+    async def do(self, key: str, func: Callable[..., Awaitable[Any]], *args) -> Tuple[Any, bool]:
+        """Run func(*args) once per key at a time.
+
+        Returns (result, shared) where shared is True when the result came
+        from another caller's execution.
+        """
+        self.calls += 1
+        call = self._in_flight.get(key)
+        shared = call is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            call = _Call(asyncio.ensure_future(func(*args)))
+            self._in_flight[key] = call
+            self.executions += 1
+            call.task.add_done_callback(lambda task: self._finished(key, call, task))
+        call.callers += 1
+        try:
+            # shield() so a caller being cancelled does not cancel the shared call
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.callers -= 1
+            if call.task.done():
+                self._forget(key, call)
+            elif not call.callers:
+                # Nobody is left to use the result
+                self._forget(key, call)
+                call.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the coalescing counters."""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "in_flight": len(self._in_flight)
+        }
@@ -1,173 +1,348 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Dict, Any, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, BackgroundTasks
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, ValidationError
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import logging
-from database.sqlite_service import SQLiteService
-import json
+import os
+import time
+from agent.rule_engine import RuleEngine, DEFAULT_RULES_PATH
+from agent.single_flight import SingleFlight
+from database.backend import QueryableBackend, RetentionBackend, create_backend
+from database.async_storage import AsyncStorage
+from database.remediation_cache import RemediationCache
+from database.similarity_index import SimilarityIndex
+from processor.log_processor import LogProcessor, fingerprint_message, render_remediation, templatize_remediation
+from api.structured_logging import RequestLogger, configure_logging, logging_stats
+from api.metrics import MetricsMiddleware, MetricsRegistry, StageRecorder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from api.responses import JSONBytesResponse, dumps, envelope, loads
+from api.jobs import Job, JobManager, JobQueueFull, job_events, sse_event
+from database.export import EXPORT_FORMATS, aiter_export
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Compact JSON log lines, written by a background thread
+configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
-db = SQLiteService()
+# Fraction of successful requests that get a log line; failures are always logged
+request_logger = RequestLogger(logger, sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1")))
+
+# Prometheus metrics at /metrics; per-stage Server-Timing headers are opt-in
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+metrics = MetricsRegistry()
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by method, route and status.", ("method", "route", "status")
+)
+http_duration = metrics.histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request.", ("method", "route")
+)
+remediations_served = metrics.counter(
+    "remediations_total", "Remediations returned, by source and action.", ("source", "action")
+)
+generation_duration = metrics.histogram(
+    "remediation_generation_duration_seconds", "Time to generate a new remediation.", ("generator", "action")
+)
+backend_duration = metrics.histogram(
+    "storage_backend_duration_seconds", "Duration of storage backend calls.", ("operation",)
+)
+stages = StageRecorder(metrics.histogram(
+    "remediation_stage_duration_seconds", "Time spent in each stage of request handling.", ("stage",)
+))
+
+# Persist newly generated remediations after the response has been sent
+WRITE_BEHIND = os.getenv("REMEDIATION_WRITE_BEHIND", "1") == "1"
+
+CACHE_SIZE = int(os.getenv("REMEDIATION_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("REMEDIATION_CACHE_TTL", "300"))
+
+# Cache shared by the worker processes of a host (a SQLite file, ideally on
+# tmpfs); unset for a single worker
+SHARED_CACHE_PATH = os.getenv("REMEDIATION_SHARED_CACHE")
+SHARED_CACHE_SIZE = int(os.getenv("REMEDIATION_SHARED_CACHE_SIZE", "100000"))
+SHARED_CACHE_SYNC_INTERVAL = float(os.getenv("REMEDIATION_SHARED_CACHE_SYNC_MS", "500")) / 1000
+
+# Background aging of stored errors (sqlite and tiered backends); an
+# interval of 0 disables it, a limit of 0 removes that limit
+RETENTION_INTERVAL = float(os.getenv("REMEDIATION_RETENTION_INTERVAL", "60"))
+RETENTION_MAX_ROWS = int(os.getenv("REMEDIATION_RETENTION_MAX_ROWS", "100000"))
+RETENTION_MAX_AGE = float(os.getenv("REMEDIATION_RETENTION_MAX_AGE_DAYS", "30")) * 86400
+RETENTION_EVICTION = os.getenv("REMEDIATION_RETENTION_EVICTION", "lfu")
+RETENTION_VACUUM_PAGES = int(os.getenv("REMEDIATION_RETENTION_VACUUM_PAGES", "1000"))
+RETENTION_HIT_HALF_LIFE = float(os.getenv("REMEDIATION_RETENTION_HIT_HALF_LIFE_HOURS", "24")) * 3600
+
+# Remediation rules, re-read automatically when the file changes
+rule_engine = RuleEngine(
+    os.getenv("REMEDIATION_RULES_PATH", DEFAULT_RULES_PATH),
+    reload_interval=float(os.getenv("REMEDIATION_RULES_RELOAD_INTERVAL", "2"))
+)
+
+# Concurrent misses for the same message template share one generation
+generation_flight = SingleFlight()
+
+# "rules" generates remediations from the rule file only; "genai" adds model
+# guidance on top, falling back to the rule-based result on failure or timeout
+GENERATOR = os.getenv("REMEDIATION_GENERATOR", "rules")
+
+def create_genai_agent():
+    """Build the GenAI agent; its module and the model SDKs are only imported here."""
+    from agent.genai_agent import GenAIAgent
+    from agent.model_clients import create_model_client
+
+    return GenAIAgent(
+        model_client=create_model_client(os.getenv("GENAI_MODEL_CLIENT", "vertex")),
+        timeout=float(os.getenv("GENAI_TIMEOUT", "10")),
+        max_concurrency=int(os.getenv("GENAI_MAX_CONCURRENCY", "4")),
+        rate_limit=float(os.getenv("GENAI_RATE_LIMIT", "5")),
+        burst=int(os.getenv("GENAI_BURST", "10")),
+        queue_size=int(os.getenv("GENAI_QUEUE_SIZE", "100")),
+        max_batch_size=int(os.getenv("GENAI_BATCH_SIZE", "8")),
+        batch_window=float(os.getenv("GENAI_BATCH_WINDOW_MS", "10")) / 1000
+    )
+
+log_processor = LogProcessor()
+generation_stats = {"fallbacks": 0}
+
+# Second lookup tier: reuse the remediation of the most similar stored error
+SIMILARITY_INDEX = os.getenv("REMEDIATION_SIMILARITY_INDEX", "0") == "1"
+SIMILARITY_THRESHOLD = float(os.getenv("REMEDIATION_SIMILARITY_THRESHOLD", "0.9"))
+
+# sqlite (local file), firestore (shared) or tiered (local SQLite cache in front of Firestore)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+
+# Run one synthetic request through every stage at startup, so the first
+# real request does not pay for connections and lazy initialization
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+
+cache = RemediationCache(max_entries=CACHE_SIZE, ttl=CACHE_TTL) if CACHE_SIZE > 0 else None
+similarity_index = SimilarityIndex(threshold=SIMILARITY_THRESHOLD) if SIMILARITY_INDEX else None
+
+# Created in the lifespan hook: importing the app (in a worker before it
+# serves, or for the OpenAPI schema) opens no databases or cloud clients
+storage: Optional[AsyncStorage] = None
+genai_agent = None
+
+if cache is not None:
+    metrics.collector(
+        "remediation_cache_events_total", "Remediation cache events by outcome.", "counter", ("outcome",),
+        lambda: {
+            (outcome,): value for outcome, value in cache.stats().items()
+            if outcome in ("hits", "misses", "evictions", "expirations", "invalidations")
+        }
+    )
+    metrics.collector("remediation_cache_entries", "Remediations held in the cache.", "gauge", (), lambda: {(): len(cache)})
+metrics.collector(
+    "remediation_generation_calls_total", "Generation requests, split into executed and coalesced.", "counter", ("outcome",),
+    lambda: {(outcome,): generation_flight.stats()[outcome] for outcome in ("executions", "coalesced", "failures")}
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create storage and the GenAI agent at startup and release them at shutdown."""
+    global storage, genai_agent
+    started = time.perf_counter()
+    shared_cache = None
+    if SHARED_CACHE_PATH:
+        from database.shared_cache import SharedCache
+        shared_cache = SharedCache(SHARED_CACHE_PATH, ttl=CACHE_TTL, max_entries=SHARED_CACHE_SIZE)
+    backend = create_backend(STORAGE_BACKEND)
+    retention = None
+    if RETENTION_INTERVAL > 0 and isinstance(backend, RetentionBackend):
+        from database.retention import RetentionManager
+        retention = RetentionManager(
+            backend,
+            max_rows=RETENTION_MAX_ROWS,
+            max_age=RETENTION_MAX_AGE,
+            eviction=RETENTION_EVICTION,
+            vacuum_pages=RETENTION_VACUUM_PAGES,
+            hit_half_life=RETENTION_HIT_HALF_LIFE
+        )
+    storage = AsyncStorage(
+        backend,
+        max_workers=int(os.getenv("REMEDIATION_STORAGE_WORKERS", "4")),
+        cache=cache,
+        similarity_index=similarity_index,
+        observer=(lambda operation, seconds: backend_duration.observe(seconds, operation)) if METRICS_ENABLED else None,
+        shared_cache=shared_cache,
+        retention=retention
+    )
+    if GENERATOR == "genai":
+        genai_agent = create_genai_agent()
+        genai_agent.start()
+    job_manager.start()
+    if STARTUP_WARMUP:
+        await warm_up()
+    index_loader = asyncio.create_task(storage.load_similarity_index())
+    cache_sync = asyncio.create_task(storage.sync_shared_cache(SHARED_CACHE_SYNC_INTERVAL))
+    retention_task = asyncio.create_task(storage.run_retention(RETENTION_INTERVAL))
+    logger.info(
+        f"Started with the {STORAGE_BACKEND} storage backend in {(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+    yield
+    index_loader.cancel()
+    cache_sync.cancel()
+    retention_task.cancel()
+    await job_manager.stop()
+    if genai_agent is not None:
+        await genai_agent.stop()
+        genai_agent = None
+    storage.close()
+
+app = FastAPI(lifespan=lifespan)
+if METRICS_ENABLED:
+    app.add_middleware(
+        MetricsMiddleware,
+        requests=http_requests,
+        duration=http_duration,
+        stages=stages,
+        server_timing=SERVER_TIMING
+    )
+
+# Upper bound on events accepted by a single /remediate/batch call
+MAX_BATCH_SIZE = 10000
+
+SOURCE_MESSAGES = {
+    "database": "Retrieved stored remediation",
+    "similar": "Retrieved remediation of a similar error",
+    "agent": "Generated new remediation"
+}
 
 class ErrorLog(BaseModel):
+    # Only the subtrees remediation reads are validated; sourceAgent and
+    # anomalyDetectionResults are kept exactly as parsed
     event_id: str = Field(alias="eventId")
     timestamp: str = Field(alias="eventTimestamp")
-    source_agent: Dict[str, Any] = Field(alias="sourceAgent")
+    source_agent: Any = Field(alias="sourceAgent")
     log_entry: Dict[str, Any] = Field(alias="logEntry")
-    anomaly_detection: Dict[str, Any] = Field(alias="anomalyDetectionResults")
+    anomaly_detection: Any = Field(alias="anomalyDetectionResults")
     contextual_metadata: Dict[str, Any] = Field(alias="contextualMetadata")
 
     model_config = ConfigDict(populate_by_name=True)
 
+error_log_list_adapter = TypeAdapter(List[ErrorLog])
+
 def generate_remediation(error_log: ErrorLog) -> Dict[str, Any]:
     """Generate comprehensive, context-aware remediation based on error type."""
-    message = error_log.log_entry.get("message", "").lower()
-    level = error_log.log_entry.get("level", "").upper()
-    app_name = error_log.contextual_metadata.get("applicationName", "unknown")
-    host = error_log.contextual_metadata.get("affectedHost", "unknown")
-
-    # Security breach remediation
-    if "security breach" in message:
-        ip = message.split("from")[-1].strip()
-        return {
-            "action": "block_ip",
-            "parameters": {
-                "ip_address": ip,
-                "duration": 3600
-            },
-            "description": f"Block IP address {ip} due to security breach detection on {host}.",
-            "steps": [
-                f"1. Use your firewall to block the IP address {ip}.",
-                "2. Review system and application logs for any other suspicious activity from this IP.",
-                "3. Notify the security team and document the incident.",
-                "4. Update firewall rules to prevent future access from this IP."
-            ],
-            "preventive_measures": [
-                "Enable and regularly update intrusion detection systems.",
-                "Regularly review and update firewall rules.",
-                "Educate users about phishing and social engineering attacks."
-            ],
-            "verification": [
-                f"Run 'sudo iptables -L' or equivalent to verify {ip} is blocked.",
-                "Monitor logs for any further attempts from the blocked IP."
-            ]
-        }
+    return rule_engine.evaluate(
+        message=error_log.log_entry.get("message", ""),
+        level=error_log.log_entry.get("level", ""),
+        app_name=error_log.contextual_metadata.get("applicationName", "unknown"),
+        host=error_log.contextual_metadata.get("affectedHost", "unknown")
+    )
 
-    # Database issues
-    elif "database" in message:
-        if "connection failed" in message:
-            return {
-                "action": "restart_database",
-                "parameters": {
-                    "service_name": "database",
-                    "wait_time": 60
-                },
-                "description": f"Restart the database service on {host} due to connection failure.",
-                "steps": [
-                    "1. Check the database service status using 'systemctl status <service>' or equivalent.",
-                    "2. Restart the database service using 'systemctl restart <service>' or equivalent.",
-                    "3. Wait 60 seconds and verify the service is running.",
-                    "4. Check application connectivity to the database."
-                ],
-                "preventive_measures": [
-                    "Monitor database resource usage and set up alerts for failures.",
-                    "Ensure regular database backups are scheduled.",
-                    "Test failover and recovery procedures periodically."
-                ],
-                "verification": [
-                    "Verify the database service is active and running.",
-                    "Check application logs to confirm successful reconnection."
-                ]
-            }
-        elif "crash" in message:
-            return {
-                "action": "restore_database",
-                "parameters": {
-                    "backup_id": "latest",
-                    "verify_after_restore": True
-                },
-                "description": f"Restore the database on {host} from the latest backup due to crash.",
-                "steps": [
-                    "1. Identify the latest valid backup.",
-                    "2. Stop the database service.",
-                    "3. Restore the database from the backup.",
-                    "4. Start the database service.",
-                    "5. Verify data integrity and application connectivity."
-                ],
-                "preventive_measures": [
-                    "Schedule regular automated backups.",
-                    "Test backup restoration procedures regularly.",
-                    "Monitor for early signs of database corruption or instability."
-                ],
-                "verification": [
-                    "Check that the database service is running.",
-                    "Run integrity checks and verify application access."
-                ]
-            }
+async def add_genai_guidance(error_log: ErrorLog, remediation: Dict[str, Any],
+                             on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Add model-generated guidance to a rule-based remediation.
 
-    # Memory issues
-    elif "memory overflow" in message:
-        service = "webserver" if "webserver" in message else "mailserver"
-        return {
-            "action": "scale_resources",
-            "parameters": {
-                "service_name": service,
-                "memory_increase": "2x",
-                "restart_after_scale": True
-            },
-            "description": f"Increase memory allocation for {service} on {host} due to overflow.",
-            "steps": [
-                f"1. Check current memory usage on {host} using 'free -m' or 'top'.",
-                f"2. Increase memory allocation for {service} (e.g., update container or VM settings).",
-                f"3. Restart the {service} service to apply changes.",
-                "4. Monitor the service for stability after restart."
-            ],
-            "preventive_measures": [
-                "Set up memory usage alerts for critical services.",
-                "Optimize application code to reduce memory leaks.",
-                "Regularly review and adjust resource allocations."
-            ],
-            "verification": [
-                f"Monitor memory usage on {host} to ensure it remains within limits.",
-                f"Check {service} logs for any further memory-related errors."
-            ]
-        }
+    With on_token, the guidance is streamed from the model and on_token is
+    called with each chunk. Any model failure, full queue or missed deadline
+    returns the rule-based remediation unchanged.
+    """
+    try:
+        processed_log = log_processor.process_log(error_log.model_dump(by_alias=True))
+        if on_token is None:
+            guidance = await genai_agent.get_remediation(processed_log)
+        else:
+            chunks = []
+            async for chunk in genai_agent.stream_remediation(processed_log):
+                chunks.append(chunk)
+                on_token(chunk)
+            guidance = "".join(chunks).strip()
+    except Exception as e:
+        generation_stats["fallbacks"] += 1
+        logger.warning(f"Falling back to rule-based remediation: {str(e)}")
+        return remediation
+    return {**remediation, "ai_guidance": guidance}
+
+async def generate_template(error_log: ErrorLog, fingerprint,
+                            on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Generate a remediation with the message's variables replaced by placeholders."""
+    started = time.perf_counter()
+    remediation = generate_remediation(error_log)
+    generation_duration.observe(time.perf_counter() - started, "rules", remediation.get("action", ""))
+    if genai_agent is not None:
+        started = time.perf_counter()
+        remediation = await add_genai_guidance(error_log, remediation, on_token)
+        generation_duration.observe(time.perf_counter() - started, "genai", remediation.get("action", ""))
+    return templatize_remediation(remediation, fingerprint.variables)
+
+async def persist_remediations(items, background_tasks: Optional[BackgroundTasks]):
+    """Store new remediations, after the response is sent when write-behind is enabled.
 
-    # Default remediation for unknown errors
+    Without background_tasks (in a job) they are stored before returning.
+    """
+    if WRITE_BEHIND and background_tasks is not None:
+        storage.prime_cache(items)
+        background_tasks.add_task(storage.store_in_background, items)
+    else:
+        await storage.store_errors(items)
+
+def record_served(source: str, action: str):
+    """Count a returned remediation and mark the end of the handler for timing."""
+    remediations_served.inc(source, action or "")
+    stages.mark_handler_done()
+
+def parse_error_log(body: bytes) -> ErrorLog:
+    """Parse a request body into an ErrorLog, answering 422 when it is not one."""
+    try:
+        return ErrorLog.model_validate(loads(body))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid JSON body: {str(e)}")
+
+def request_fields(error_log: ErrorLog, started: float, **fields) -> Dict[str, Any]:
+    """Fields of the per-request log line."""
     return {
-        "action": "investigate_error",
-        "parameters": {
-            "error_level": level,
-            "service_name": app_name
-        },
-        "description": f"Manual investigation required for unknown error type on {host}.",
-        "steps": [
-            "1. Review the error message and related logs.",
-            "2. Check the health and status of affected services.",
-            "3. Escalate to the appropriate team if necessary."
-        ],
-        "preventive_measures": [
-            "Implement comprehensive monitoring and alerting.",
-            "Document all incidents and resolutions for future reference."
-        ],
-        "verification": [
-            "Confirm the issue is resolved and services are operational.",
-            "Monitor for recurrence of the error."
-        ]
+        "event_id": error_log.event_id,
+        "application": error_log.contextual_metadata.get("applicationName"),
+        "host": error_log.contextual_metadata.get("affectedHost"),
+        "error_level": error_log.log_entry.get("level"),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        **fields
     }
 
-@app.post("/remediate")
-async def remediate_error(error_log: ErrorLog):
+# Synthetic event used by warm_up(); it is never stored
+WARMUP_EVENT = {
+    "eventId": "warm-up",
+    "eventTimestamp": "1970-01-01T00:00:00+00:00",
+    "sourceAgent": {"name": "RemediationAgent", "version": "warm-up"},
+    "logEntry": {"level": "INFO", "message": "Startup warm-up check for service 0.0.0.0:0"},
+    "anomalyDetectionResults": {},
+    "contextualMetadata": {"applicationName": "warm-up", "environment": "warm-up", "affectedHost": "localhost"}
+}
+
+async def warm_up():
+    """Run the lookup and generation stages once without storing anything.
+
+    Opens the backend's connections and compiles the rule and fingerprint
+    regexes ahead of the first real request.
+    """
+    started = time.perf_counter()
+    error_log = ErrorLog.model_validate(WARMUP_EVENT)
+    essential_data = {"message": error_log.log_entry["message"], "level": error_log.log_entry["level"]}
     try:
-        # Log the incoming request
-        logger.info("=" * 80)
-        logger.info("Incoming API Request:")
-        logger.info(json.dumps(error_log.dict(), indent=2))
-        logger.info("=" * 80)
+        await storage.get_remediation(essential_data)
+        await storage.find_similar(essential_data)
+    except Exception as e:
+        logger.warning(f"Storage warm-up failed: {str(e)}")
+    fingerprint = fingerprint_message(essential_data["message"])
+    render_remediation(templatize_remediation(generate_remediation(error_log), fingerprint.variables), fingerprint.variables)
+    logger.info(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+async def resolve_remediation(error_log: ErrorLog, started: float, background_tasks: Optional[BackgroundTasks] = None,
+                              on_token: Optional[Callable[[str], None]] = None) -> bytes:
+    """Look up or generate the remediation for one ErrorLog and return the encoded response body.
 
+    Stored remediations are answered from their cached encoding without
+    being decoded. on_token receives the model's output as it is generated,
+    when this call is the one generating.
+    """
+    try:
         # Extract essential data for storage
         essential_data = {
             "message": error_log.log_entry.get("message"),
@@ -175,39 +350,424 @@ async def remediate_error(error_log: ErrorLog):
         }
 
         # Check if we have a stored remediation for this error
-        stored_remediation = db.get_remediation(essential_data)
+        with stages.stage("lookup"):
+            stored = await storage.lookup(essential_data)
+
+        if stored is not None:
+            request_logger.success("remediate", lambda: request_fields(error_log, started, source="database"))
+            record_served("database", stored.action)
+            return envelope(
+                {"status": "success", "message": SOURCE_MESSAGES["database"], "source": "database"},
+                "remediation",
+                stored.render_json(fingerprint_message(essential_data["message"] or "").variables)
+            )
         
-        if stored_remediation:
-            logger.info("Found existing remediation in database")
-            logger.info("Remediation returned to client (from database):")
-            logger.info(json.dumps(stored_remediation, indent=2))
-            return {
+        # Next, reuse the remediation of a sufficiently similar stored error
+        with stages.stage("similar"):
+            similar = await storage.find_similar(essential_data)
+        if similar is not None:
+            remediation, similarity = similar
+            request_logger.success("remediate", lambda: request_fields(
+                error_log, started, source="similar", similarity=round(similarity, 3)
+            ))
+            record_served("similar", remediation.get("action"))
+            return dumps({
                 "status": "success",
-                "message": "Retrieved stored remediation",
-                "source": "database",
-                "remediation": stored_remediation
-            }
-        
-        # If no stored remediation, generate a new one
-        logger.info("No existing remediation found, generating new remediation")
-        remediation = generate_remediation(error_log)
-        logger.info("Remediation returned to client (from agent):")
-        logger.info(json.dumps(remediation, indent=2))
-        
-        # Store only essential data and remediation
-        db.store_error(essential_data, remediation)
+                "message": SOURCE_MESSAGES["similar"],
+                "source": "similar",
+                "similarity": similarity,
+                "remediation": remediation
+            })
+
+        # If no stored remediation, generate a new one; concurrent requests
+        # for the same error wait for a single generation and share it
+        fingerprint = fingerprint_message(essential_data["message"] or "")
+        with stages.stage("generate"):
+            template, shared = await generation_flight.do(
+                fingerprint.hash, generate_template, error_log, fingerprint, on_token
+            )
+        remediation = render_remediation(template, fingerprint.variables)
         
-        return {
+        # Store only essential data and remediation; only the generating
+        # request writes, so coalesced requests do not race on the same row
+        if not shared:
+            with stages.stage("store"):
+                await persist_remediations([(essential_data, remediation)], background_tasks)
+
+        request_logger.success("remediate", lambda: request_fields(
+            error_log, started, source="agent", error_hash=fingerprint.hash, shared=shared,
+            action=remediation.get("action")
+        ))
+        record_served("agent", remediation.get("action"))
+        return dumps({
             "status": "success",
-            "message": "Generated new remediation",
+            "message": SOURCE_MESSAGES["agent"],
             "source": "agent",
             "remediation": remediation
-        }
+        })
         
     except Exception as e:
-        logger.error(f"Error in remediation endpoint: {str(e)}")
+        request_logger.failure("remediate", lambda: request_fields(error_log, started, error=str(e)))
+        raise
+
+async def run_remediation_job(job: Job) -> bytes:
+    """Job handler: resolve the job's ErrorLog, streaming model output into the job."""
+    return await resolve_remediation(job.payload, time.perf_counter(), on_token=job.add_token)
+
+async def publish_job(job: Job):
+    """Make a job's state readable by every worker process for as long as the job is kept."""
+    await storage.share(job_key(job.id), describe_job(job), ttl=job_manager.ttl)
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+def describe_job(job: Job) -> Dict[str, Any]:
+    description = job.describe()
+    if job.status == "done":
+        description["result"] = loads(job.result)
+    return description
+
+# Runs ?mode=async requests on a bounded pool of worker tasks, and
+# up to REMEDIATION_JOB_MAX_STREAMS ?mode=stream requests at once; results
+# are kept for REMEDIATION_JOB_TTL
+job_manager = JobManager(
+    run_remediation_job,
+    workers=int(os.getenv("REMEDIATION_JOB_WORKERS", "8")),
+    queue_size=int(os.getenv("REMEDIATION_JOB_QUEUE_SIZE", "1000")),
+    ttl=float(os.getenv("REMEDIATION_JOB_TTL", "600")),
+    publish=publish_job,
+    max_streams=int(os.getenv("REMEDIATION_JOB_MAX_STREAMS", "64"))
+)
+
+def event_stream(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/remediate", openapi_extra={
+    "requestBody": {"required": True, "content": {"application/json": {"schema": ErrorLog.model_json_schema()}}}
+})
+async def remediate_error(request: Request, background_tasks: BackgroundTasks,
+                          mode: str = Query("sync", pattern="^(sync|async|stream)$")):
+    """Return a remediation for one ErrorLog.
+
+    mode=sync (the default) answers with the remediation. mode=async queues
+    the work and answers 202 with a job id at once; fetch the result from
+    GET /jobs/{id} or GET /jobs/{id}/events. mode=stream starts the work at
+    once and answers with that job's Server-Sent Events, including model
+    tokens as they are generated.
+
+    The body is parsed here rather than by FastAPI, and responses are
+    encoded directly.
+    """
+    started = time.perf_counter()
+    error_log = parse_error_log(await request.body())
+    stages.mark_parsed()
+    if mode == "async":
+        try:
+            job = job_manager.submit(error_log)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        try:
+            await publish_job(job)
+        except Exception as e:
+            # The job still runs; only this worker can report on it
+            logger.warning(f"Failed to share job {job.id}: {str(e)}")
+        return JSONBytesResponse(
+            {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}",
+             "events_url": f"/jobs/{job.id}/events"},
+            status_code=202,
+            headers={"Location": f"/jobs/{job.id}"}
+        )
+    if mode == "stream":
+        try:
+            job = job_manager.start_now(error_log)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return event_stream(job_events(job))
+    try:
+        return JSONBytesResponse(await resolve_remediation(error_log, started, background_tasks))
+    except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def find_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """A job's description from another worker process, if it published one."""
+    try:
+        return await storage.get_shared(job_key(job_id))
+    except Exception as e:
+        logger.warning(f"Failed to read job {job_id} from the shared cache: {str(e)}")
+        return None
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a ?mode=async or ?mode=stream job, with its result once done."""
+    job = job_manager.get(job_id)
+    if job is None:
+        description = await find_job(job_id)
+        if description is None:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired job: {job_id}")
+        return JSONBytesResponse(description)
+    if job.status == "done":
+        return JSONBytesResponse(envelope(job.describe(), "result", job.result))
+    return JSONBytesResponse(job.describe())
+
+async def shared_job_events(job_id: str, description: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """Events for a job owned by another worker: its status, then the result once published."""
+    yield sse_event("status", dumps({"job_id": job_id, "status": description["status"]}))
+    while description is not None and description["status"] not in ("done", "failed"):
+        await asyncio.sleep(SHARED_CACHE_SYNC_INTERVAL)
+        description = await find_job(job_id)
+    if description is None:
+        yield sse_event("error", dumps({"job_id": job_id, "detail": "Job expired"}))
+    elif description["status"] == "done":
+        yield sse_event("result", dumps(description["result"]))
+    else:
+        yield sse_event("error", dumps({"job_id": job_id, "detail": description.get("error")}))
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    """Server-Sent Events for a job: status, model tokens while generating, then result (or error)."""
+    job = job_manager.get(job_id)
+    if job is not None:
+        return event_stream(job_events(job))
+    description = await find_job(job_id)
+    if description is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job: {job_id}")
+    # Owned by another worker: only its final state is shared
+    return event_stream(shared_job_events(job_id, description))
+
+def check_batch_size(count: int):
+    if count > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {count} events exceeds the limit of {MAX_BATCH_SIZE}"
+        )
+
+def parse_batch_body(body: bytes, content_type: str) -> List[ErrorLog]:
+    """Parse a batch request body given either as a JSON array or as NDJSON.
+
+    Oversized batches are rejected before any event is validated.
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        lines = [(line_number, line) for line_number, line in enumerate(body.splitlines(), start=1) if line.strip()]
+        check_batch_size(len(lines))
+        error_logs = []
+        for line_number, line in lines:
+            try:
+                error_logs.append(ErrorLog.model_validate(loads(line)))
+            except ValidationError as e:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Invalid ErrorLog on line {line_number}: {e.errors()}"
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=f"Invalid JSON on line {line_number}: {str(e)}")
+        return error_logs
+
+    try:
+        events = loads(body)
+        if isinstance(events, list):
+            check_batch_size(len(events))
+        return error_log_list_adapter.validate_python(events)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid JSON body: {str(e)}")
+
+@app.post("/remediate/batch")
+async def remediate_batch(request: Request, background_tasks: BackgroundTasks):
+    """Remediate a burst of error logs with a handful of database operations.
+
+    Accepts a JSON array of ErrorLog objects or an NDJSON stream
+    (Content-Type: application/x-ndjson). Errors sharing a message template
+    are resolved once, cache hits are fetched with a single query and all
+    newly generated remediations are written back in one transaction.
+    """
+    started = time.perf_counter()
+    with stages.stage("parse"):
+        error_logs = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+
+    try:
+        essential_data = [
+            {
+                "message": error_log.log_entry.get("message"),
+                "level": error_log.log_entry.get("level")
+            }
+            for error_log in error_logs
+        ]
+        fingerprints = [fingerprint_message(data.get("message") or "") for data in essential_data]
+        with stages.stage("lookup"):
+            stored = await storage.get_remediations(essential_data)
+
+        # Look up each distinct miss in the similarity tier; anything still
+        # missing is generated once per message template. Later events with
+        # the same template get the result rendered with their own variables
+        similar = {}
+        leaders = {}
+        with stages.stage("similar"):
+            for index, (fingerprint, remediation) in enumerate(zip(fingerprints, stored)):
+                if remediation is not None or fingerprint.hash in similar or fingerprint.hash in leaders:
+                    continue
+                match = await storage.find_similar(essential_data[index])
+                if match is not None:
+                    similar[fingerprint.hash] = templatize_remediation(match[0], fingerprint.variables)
+                else:
+                    leaders[fingerprint.hash] = index
+
+        with stages.stage("generate"):
+            generated = await asyncio.gather(*(
+                generation_flight.do(fingerprints[index].hash, generate_template, error_logs[index], fingerprints[index])
+                for index in leaders.values()
+            ))
+        templates = dict(zip(leaders, generated))
+
+        results = []
+        new_items = []
+        for index, (fingerprint, remediation) in enumerate(zip(fingerprints, stored)):
+            if remediation is not None:
+                results.append(("database", remediation))
+            elif fingerprint.hash in similar:
+                results.append(("similar", render_remediation(similar[fingerprint.hash], fingerprint.variables)))
+            else:
+                template, shared = templates[fingerprint.hash]
+                remediation = render_remediation(template, fingerprint.variables)
+                results.append(("agent", remediation))
+                if not shared and leaders[fingerprint.hash] == index:
+                    new_items.append((essential_data[index], remediation))
+
+        if new_items:
+            with stages.stage("store"):
+                await persist_remediations(new_items, background_tasks)
+        for source, remediation in results:
+            remediations_served.inc(source, remediation.get("action", ""))
+        stages.mark_handler_done()
+
+        request_logger.success("remediate_batch", lambda: {
+            "events": len(error_logs),
+            "generated": len(new_items),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+        })
+
+        return JSONBytesResponse({
+            "status": "success",
+            "count": len(error_logs),
+            "generated": len(new_items),
+            "results": [
+                {
+                    "eventId": error_log.event_id,
+                    "message": SOURCE_MESSAGES[source],
+                    "source": source,
+                    "remediation": remediation
+                }
+                for error_log, (source, remediation) in zip(error_logs, results)
+            ]
+        })
+
+    except Exception as e:
+        request_logger.failure("remediate_batch", lambda: {
+            "events": len(error_logs),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "error": str(e)
+        })
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Largest page GET /errors returns
+MAX_PAGE_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def require_queryable_backend():
+    if not isinstance(storage.backend, QueryableBackend):
+        raise HTTPException(status_code=501, detail=f"The {STORAGE_BACKEND} storage backend cannot list errors")
+
+def error_filters(level: Optional[str], action: Optional[str], since: Optional[str],
+                  until: Optional[str], q: Optional[str]) -> Dict[str, Any]:
+    """Collect the query-string filters shared by the /errors endpoints."""
+    return {"level": level, "action": action, "since": since, "until": until, "search": q}
+
+@app.get("/errors")
+async def list_errors(
+    level: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Page through stored errors, newest first.
+
+    Filters: level, action, since/until (ISO dates or datetimes) and q
+    (message substring). Pass next_cursor back as cursor for the next page.
+    """
+    require_queryable_backend()
+    try:
+        items, next_cursor = await storage.query_errors(
+            error_filters(level, action, since, until, q), limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONBytesResponse({"items": items, "count": len(items), "next_cursor": next_cursor})
+
+@app.get("/errors/export")
+async def export_errors(
+    format: str = Query("ndjson", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    level: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """Stream every matching error as NDJSON or CSV, one page of rows in memory at a time."""
+    require_queryable_backend()
+    filters = error_filters(level, action, since, until, q)
+    try:
+        # Validate the filters before the response starts streaming
+        await storage.query_errors(filters, 1, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        aiter_export(storage.iter_errors(filters), format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="errors.{format}"'}
+    )
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.post("/rules/reload")
+async def reload_rules():
+    reloaded = rule_engine.reload()
+    return {"status": "success", "reloaded": reloaded, "rules": rule_engine.rule_count}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Expose counters and latency histograms in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/stats")
+async def stats():
+    shared_cache = await storage.shared_cache_stats() if storage is not None else None
+    retention = await storage.retention_stats() if storage is not None else None
+    return {
+        "cache": {"enabled": True, **cache.stats()} if cache is not None else {"enabled": False},
+        "storage": {
+            "backend": STORAGE_BACKEND,
+            **(storage.backend.stats() if storage is not None and hasattr(storage.backend, "stats") else {})
+        },
+        "shared_cache": {"enabled": True, **shared_cache} if shared_cache is not None else {"enabled": False},
+        "retention": {"enabled": True, **retention} if retention is not None else {"enabled": False},
+        "jobs": job_manager.stats(),
+        "coalescing": generation_flight.stats(),
+        "logging": {**logging_stats(), "sample_rate": request_logger.sample_rate, "sampled_out": request_logger.sampled_out},
+        "generation": {
+            "generator": GENERATOR,
+            **generation_stats,
+            **(genai_agent.pipeline.stats() if genai_agent is not None else {})
+        }
+    } 
\ No newline at end of file
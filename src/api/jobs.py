@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from api.responses import dumps
+
+# Seconds between keep-alive comments on an idle event stream
+KEEPALIVE_INTERVAL = 15.0
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is full."""
+
+
+class Job:
+    """One remediation request run in the background.
+
+    status goes pending -> running -> done or failed. tokens holds the model
+    output streamed so far; result is the encoded response body once done.
+    """
+
+    def __init__(self, payload: Any, clock=time.monotonic):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = "pending"
+        self.tokens: List[str] = []
+        self.result: Optional[bytes] = None
+        self.error: Optional[str] = None
+        self.created_at = clock()
+        self.finished_at: Optional[float] = None
+        self._clock = clock
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def changed(self) -> asyncio.Event:
+        """Event set on the job's next change; take it before reading the job's state."""
+        return self._changed
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def start(self):
+        self.status = "running"
+        self._notify()
+
+    def add_token(self, text: str):
+        self.tokens.append(text)
+        self._notify()
+
+    def finish(self, result: bytes):
+        self.status = "done"
+        self.result = result
+        self.finished_at = self._clock()
+        self._notify()
+
+    def fail(self, error: str):
+        self.status = "failed"
+        self.error = error
+        self.finished_at = self._clock()
+        self._notify()
+
+    def describe(self) -> Dict[str, Any]:
+        """The job's state without its result, as returned by GET /jobs/{id}."""
+        description = {"job_id": self.id, "status": self.status}
+        if self.error is not None:
+            description["error"] = self.error
+        if self.tokens and not self.finished:
+            description["partial"] = "".join(self.tokens)
+        return description
+
+
+class JobManager:
+    """Runs jobs on a fixed pool of worker tasks.
+
+    submit() queues a job for the workers and fails with JobQueueFull once
+    queue_size jobs are waiting; start_now() runs one at once, outside the
+    pool, for callers that stream its progress, and fails with JobQueueFull
+    while max_streams such jobs are running. handler(job) does the work
+    and returns the encoded result. Finished jobs are kept for ttl seconds.
+    publish(job), if given, is awaited whenever a job finishes.
+    """
+
+    def __init__(self, handler: Callable[[Job], Awaitable[bytes]], workers: int = 8, queue_size: int = 1000,
+                 ttl: float = 600.0, publish: Optional[Callable[[Job], Awaitable[None]]] = None,
+                 max_streams: int = 64, clock=time.monotonic):
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_streams = max_streams
+        self.ttl = ttl
+        self.publish = publish
+        self._clock = clock
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._direct: Set[asyncio.Task] = set()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Cancel running jobs and fail the queued ones."""
+        tasks = self._workers + list(self._direct)
+        self._workers = []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.fail("Server shutting down")
+
+    def _purge(self):
+        """Forget finished jobs older than ttl, oldest first."""
+        now = self._clock()
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if not job.finished or job.finished_at + self.ttl > now:
+                return
+            self._jobs.popitem(last=False)
+
+    def _register(self, payload: Any) -> Job:
+        self._purge()
+        job = Job(payload, clock=self._clock)
+        self._jobs[job.id] = job
+        self.submitted += 1
+        return job
+
+    def submit(self, payload: Any) -> Job:
+        """Queue a job for the worker pool."""
+        if not self._workers:
+            raise JobQueueFull("Job workers are not running")
+        if self._queue.full():
+            self.rejected += 1
+            raise JobQueueFull("Job queue is full")
+        job = self._register(payload)
+        self._queue.put_nowait(job)
+        return job
+
+    def start_now(self, payload: Any) -> Job:
+        """Run a job immediately, on its own task."""
+        if len(self._direct) >= self.max_streams:
+            self.rejected += 1
+            raise JobQueueFull("Too many streaming jobs")
+        job = self._register(payload)
+        task = asyncio.create_task(self._run(job))
+        self._direct.add(task)
+        task.add_done_callback(self._direct.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: Job):
+        job.start()
+        try:
+            job.finish(await self.handler(job))
+            self.completed += 1
+        except asyncio.CancelledError:
+            job.fail("Job cancelled")
+            raise
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Job {job.id} failed: {str(e)}")
+            job.fail(str(e))
+        if self.publish is not None:
+            try:
+                await self.publish(job)
+            except Exception as e:
+                logging.warning(f"Failed to publish job {job.id}: {str(e)}")
+
+    async def _worker(self):
+        while True:
+            await self._run(await self._queue.get())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the job counters."""
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "streaming": len(self._direct),
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+            "retained": len(self._jobs),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+
+def sse_event(event: str, data: bytes) -> bytes:
+    """Encode one Server-Sent Event whose data is a single line of JSON."""
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+async def job_events(job: Job) -> AsyncIterator[bytes]:
+    """Server-Sent Events for a job: its status, each model token, then the result.
+
+    The result event carries the same body a synchronous request returns;
+    a failed job ends with an error event instead.
+    """
+    yield sse_event("status", dumps({"job_id": job.id, "status": job.status}))
+    sent = 0
+    while True:
+        changed = job.changed
+        tokens, sent = job.tokens[sent:], len(job.tokens)
+        for text in tokens:
+            yield sse_event("token", dumps({"text": text}))
+        if job.status == "done":
+            yield sse_event("result", job.result)
+            return
+        if job.status == "failed":
+            yield sse_event("error", dumps({"job_id": job.id, "detail": job.error}))
+            return
+        try:
+            await asyncio.wait_for(changed.wait(), KEEPALIVE_INTERVAL)
+        except asyncio.TimeoutError:
+            yield b": keep-alive\n\n"
@@ -0,0 +1,254 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Histogram:
+    """Latency histogram with fixed upper bounds and optional labels.
+
+    observe() increments a single bucket; cumulative counts are only
+    computed when the metrics are rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = []
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {repr(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text exposition format.
+
+    Besides counters and histograms owned by the registry, collectors can
+    expose values that are already counted elsewhere (cache statistics,
+    pipeline counters): a collector returns {label values: value} and is
+    only called when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Tuple[str, str, str, Tuple[str, ...], Callable[[], Dict[Tuple[str, ...], float]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name: str, documentation: str, metric_type: str, labelnames: Tuple[str, ...],
+                  collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self._collectors.append((name, documentation, metric_type, tuple(labelnames), collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        for name, documentation, metric_type, labelnames, collect in self._collectors:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in collect().items():
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(float(value))}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    """Stage durations of one request, reported in the Server-Timing header."""
+
+    __slots__ = ("started", "handler_done", "stages")
+
+    def __init__(self, started: float):
+        self.started = started
+        self.handler_done: Optional[float] = None
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, seconds: float):
+        self.stages.append((stage, seconds))
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages)
+
+
+# Timings of the request being handled by the current task, set by MetricsMiddleware
+current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "current_timings", default=None
+)
+
+
+class StageRecorder:
+    """Records hot-path stage durations into a histogram and the request's timings."""
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def record(self, stage: str, seconds: float):
+        self.histogram.observe(seconds, stage)
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add(stage, seconds)
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def mark_parsed(self):
+        """Record the time from request arrival to the handler starting as the parse stage."""
+        timings = current_timings.get()
+        if timings is not None:
+            self.record("parse", time.perf_counter() - timings.started)
+
+    def mark_handler_done(self):
+        """Remember when the handler returned; the rest until the response starts is serialization."""
+        timings = current_timings.get()
+        if timings is not None:
+            timings.handler_done = time.perf_counter()
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them end to end.
+
+    Written as plain ASGI rather than BaseHTTPMiddleware so it adds no extra
+    task or response copying per request. With server_timing enabled, the
+    stage durations recorded during the request are sent in a Server-Timing
+    header.
+    """
+
+    def __init__(self, app, requests: Counter, duration: Histogram, stages: StageRecorder,
+                 server_timing: bool = False):
+        self.app = app
+        self.requests = requests
+        self.duration = duration
+        self.stages = stages
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(time.perf_counter())
+        token = current_timings.set(timings)
+        status = 500
+        finished = None
+
+        async def send_wrapper(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                now = time.perf_counter()
+                if timings.handler_done is not None:
+                    self.stages.record("serialize", now - timings.handler_done)
+                if self.server_timing:
+                    timings.add("total", now - timings.started)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", timings.server_timing().encode("latin-1"))
+                    ]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timings.reset(token)
+            # Label by route template rather than raw path to keep cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.duration.observe((finished or time.perf_counter()) - timings.started, scope["method"], path)
+            self.requests.inc(scope["method"], path, str(status))
@@ -0,0 +1,45 @@
+import json
+from typing import Any
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, via orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JSONBytesResponse(Response):
+    """JSON response that skips FastAPI's jsonable_encoder.
+
+    Content is either JSON-compatible data, encoded with dumps(), or bytes
+    that are already encoded JSON and are sent as they are. Endpoints return
+    it directly; FastAPI only runs jsonable_encoder on plain return values.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def envelope(fields: dict, key: str, encoded: bytes) -> bytes:
+    """Encode fields as a JSON object whose last member, key, holds already encoded JSON."""
+    head = dumps(fields)
+    separator = b"," if len(head) > 2 else b""
+    return head[:-1] + separator + dumps(key) + b":" + encoded + b"}"
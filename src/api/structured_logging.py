@@ -0,0 +1,158 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one compact JSON object per line.
+
+    Fields passed with extra={"fields": {...}} are merged into the object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "fields":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments here; JSON formatting happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLogger:
+    """One structured log line per request, sampled and built lazily.
+
+    fields is a callable so the line is only assembled when it will
+    actually be written: the level is enabled and, for successful requests,
+    the request was picked by sampling at sample_rate. Failures are always
+    logged.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = 1.0):
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.sampled_out = 0
+
+    def success(self, event: str, fields: Callable[[], Dict[str, Any]]):
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        self.logger.info(event, extra={"fields": {"sample_rate": self.sample_rate, **fields()}})
+
+    def failure(self, event: str, fields: Callable[[], Dict[str, Any]]):
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.error(event, extra={"fields": fields()})
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def configure_logging(level: str = "INFO", queue_size: int = 10000, stream=None) -> NonBlockingQueueHandler:
+    """Send all log records through a bounded queue to a background JSON writer.
+
+    Request threads only enqueue records; a QueueListener thread formats and
+    writes them, so slow log I/O never blocks request handling. Calling this
+    again replaces the previous configuration.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, stream_handler)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper())
+    _listener.start()
+    return _queue_handler
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener = None
+        _queue_handler = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Return queue depth and drop counters of the background writer."""
+    if _queue_handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped
+    }
+
+
+def _restart_after_fork():
+    """Give a forked child (e.g. a gunicorn worker) its own queue and writer thread.
+
+    Threads do not survive fork(), and the parent's queue may have been
+    locked by its writer at the time, so neither is reused.
+    """
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.Queue(maxsize=_queue_handler.queue.maxsize)
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_listener.handlers)
+    _listener.start()
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,381 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from database.codec import PreparedTemplate
+from database.similarity_index import conflicting_tokens
+from processor.log_processor import fingerprint_message, remediation_placeholders, render_remediation, templatize_remediation
+
+
+class AsyncStorage:
+    """Asyncio interface over a synchronous storage backend.
+
+    The backend (any StorageBackend: SQLiteService, FirestoreService or
+    TieredBackend) is called on a dedicated thread pool so blocking database
+    I/O never runs on the event loop.
+
+    When a RemediationCache is given, lookups are answered from memory first
+    and every store replaces the cached entry for the error, so hot errors
+    never reach the backend. Cached entries are PreparedTemplates, which keep
+    their JSON encoding; lookup() returns them for callers that respond with
+    pre-encoded bytes.
+
+    Errors are keyed by their message fingerprint. Remediations are stored
+    with the message's variables replaced by {{name}} placeholders and are
+    rendered with the requesting message's variables on the way out, so
+    "... from 172.16.0.11" reuses the entry stored for "... from 172.16.0.10".
+
+    With a SimilarityIndex, find_similar() offers a second lookup tier for
+    paraphrased errors, using the backend's get_remediation_by_hash and
+    iter_messages.
+
+    query_errors() pages through stored errors and needs a QueryableBackend
+    (SQLiteService or TieredBackend).
+
+    observer, if given, is called as observer(method_name, seconds) with the
+    duration of every backend call, measured on the worker thread.
+
+    With a SharedCache, lookups that miss the in-process cache try the cache
+    shared by all worker processes before the backend, stored remediations
+    are published to it, and sync_shared_cache() drops in-process entries
+    that other workers have replaced.
+
+    With a RetentionManager, every remediation served from storage or a
+    cache counts as a hit for its error, and run_retention() periodically
+    evicts stored errors and drops them from the caches.
+    """
+
+    def __init__(self, backend, max_workers: int = 4, cache=None, similarity_index=None, observer=None,
+                 shared_cache=None, retention=None):
+        self.backend = backend
+        self.max_workers = max_workers
+        self.cache = cache
+        self.similarity_index = similarity_index
+        self.observer = observer
+        self.shared_cache = shared_cache
+        self.retention = retention
+        self._closing = False
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the worker pool, creating it on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="storage"
+                )
+            return self._executor
+
+    def _call(self, func, *args):
+        """Call a backend method, reporting its duration to the observer."""
+        if self.observer is None:
+            return func(*args)
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.observer(func.__name__, time.perf_counter() - started)
+
+    async def _run(self, func, *args):
+        """Run a blocking backend call on the storage thread pool."""
+        return await self._run_blocking(self._call, func, *args)
+
+    async def _run_blocking(self, func, *args):
+        """Run any blocking function on the storage thread pool, unobserved."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(func, *args))
+
+    def _fetch_templates(self, error_data_list: List[Dict[str, Any]], hashes: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Look templates up in the shared cache, then the backend; runs on the pool."""
+        found = self.shared_cache.get_many(hashes) if self.shared_cache is not None else {}
+        missing = [i for i, error_hash in enumerate(hashes) if error_hash not in found]
+        if len(missing) == 1:
+            fetched = [self._call(self.backend.get_remediation, error_data_list[missing[0]])]
+        elif missing:
+            fetched = self._call(self.backend.get_remediations, [error_data_list[i] for i in missing])
+        else:
+            fetched = []
+        loaded = [(hashes[i], template) for i, template in zip(missing, fetched) if template is not None]
+        if loaded and self.shared_cache is not None:
+            # Same value the backend gives every worker, so no invalidation
+            self.shared_cache.put_many(loaded, notify=False)
+        found.update(loaded)
+        return [found.get(error_hash) for error_hash in hashes]
+
+    def _store_items(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Write to the backend, then publish to the shared cache; runs on the pool."""
+        self._call(self.backend.store_errors, items)
+        if self.shared_cache is not None:
+            self.shared_cache.put_many([(self.error_hash(error_data), template) for error_data, template in items])
+
+    def error_hash(self, error_data: Dict[str, Any]) -> str:
+        """Return the cache key for an error: the hash of its message template."""
+        return fingerprint_message(error_data.get("message") or "").hash
+
+    async def lookup(self, error_data: Dict[str, Any]) -> Optional[PreparedTemplate]:
+        """Return the stored remediation template for an error, if any.
+
+        Render it with the message's variables (render or render_json).
+        """
+        error_hash = self.error_hash(error_data)
+        prepared = self.cache.get(error_hash) if self.cache is not None else None
+        if prepared is None:
+            template = (await self._run_blocking(self._fetch_templates, [error_data], [error_hash]))[0]
+            if template is None:
+                return None
+            prepared = PreparedTemplate(template)
+            if self.cache is not None:
+                self.cache.put(error_hash, prepared)
+        if self.retention is not None:
+            self.retention.record(error_hash)
+        return prepared
+
+    async def get_remediation(self, error_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Retrieve the stored remediation for an error, if any."""
+        prepared = await self.lookup(error_data)
+        if prepared is None:
+            return None
+        return prepared.render(fingerprint_message(error_data.get("message") or "").variables)
+
+    async def get_remediations(self, error_data_list: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Retrieve stored remediations for many errors, in input order."""
+        fingerprints = [fingerprint_message(error_data.get("message") or "") for error_data in error_data_list]
+        if self.cache is not None:
+            templates = [self.cache.get(fingerprint.hash) for fingerprint in fingerprints]
+            templates = [prepared.template if prepared is not None else None for prepared in templates]
+        else:
+            templates = [None] * len(error_data_list)
+
+        missing = [i for i, template in enumerate(templates) if template is None]
+        if missing:
+            fetched = await self._run_blocking(
+                self._fetch_templates,
+                [error_data_list[i] for i in missing],
+                [fingerprints[i].hash for i in missing]
+            )
+            for i, template in zip(missing, fetched):
+                if template is not None and self.cache is not None:
+                    self.cache.put(fingerprints[i].hash, PreparedTemplate(template))
+                templates[i] = template
+
+        if self.retention is not None:
+            for template, fingerprint in zip(templates, fingerprints):
+                if template is not None:
+                    self.retention.record(fingerprint.hash)
+        return [
+            render_remediation(template, fingerprint.variables) if template is not None else None
+            for template, fingerprint in zip(templates, fingerprints)
+        ]
+
+    async def find_similar(self, error_data: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return (remediation, similarity) of the nearest stored error, if close enough.
+
+        The neighbour's remediation is rendered with the requesting message's
+        variables only. Neighbours are refused when their remediation would
+        need a variable the message lacks, or still holds values from the
+        neighbour's own message (rows not keyed by their template, or words a
+        rule extracted), or when only one of the two messages is negated (see
+        conflicting_tokens): their remediation is about another error.
+        """
+        if self.similarity_index is None:
+            return None
+        message = error_data.get("message") or ""
+        fingerprint = fingerprint_message(message)
+        match = self.similarity_index.query(message, exclude=fingerprint.hash)
+        if match is None:
+            return None
+        neighbour_hash, similarity = match
+        stored = await self._run(self.backend.get_remediation_by_hash, neighbour_hash)
+        if stored is None:
+            return None
+        neighbour_message, template = stored
+        neighbour = fingerprint_message(neighbour_message or "")
+        if (neighbour.hash != neighbour_hash
+                or templatize_remediation(template, neighbour.variables) != template
+                or not remediation_placeholders(template) <= {name for name, _ in fingerprint.variables}
+                or conflicting_tokens(message, neighbour_message or "", template)):
+            return None
+        if self.retention is not None:
+            self.retention.record(neighbour_hash)
+        return render_remediation(template, fingerprint.variables), similarity
+
+    async def query_errors(self, filters: Dict[str, Any] = None, limit: int = 100,
+                           cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return one page of stored errors and the cursor of the next page."""
+        return await self._run(self.backend.query_errors, filters, limit, cursor)
+
+    async def iter_errors(self, filters: Dict[str, Any] = None, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every stored error matching filters, newest first.
+
+        Each page is one query_errors call on the storage thread pool, so a
+        long export neither blocks the event loop nor opens connections on
+        threads outside the pool.
+        """
+        cursor = None
+        while True:
+            rows, cursor = await self.query_errors(filters, batch_size, cursor)
+            for row in rows:
+                yield row
+            if cursor is None:
+                return
+
+    def _load_similarity_index(self) -> int:
+        count = 0
+        for error_hash, message in self.backend.iter_messages():
+            if self._closing:
+                break
+            self.similarity_index.add(error_hash, message or "")
+            count += 1
+        return count
+
+    async def load_similarity_index(self):
+        """Index every stored message; lookups work on a partial index meanwhile."""
+        if self.similarity_index is None:
+            return
+        try:
+            count = await self._run(self._load_similarity_index)
+            logging.info(f"Similarity index loaded with {count} stored errors")
+        except Exception as e:
+            logging.error(f"Failed to load similarity index: {str(e)}")
+
+    def _index_items(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Add newly stored messages to the similarity index."""
+        if self.similarity_index is not None:
+            for error_data, _ in items:
+                message = error_data.get("message") or ""
+                self.similarity_index.add(fingerprint_message(message).hash, message)
+
+    def _templatize_items(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Replace each message's variables in its remediation with placeholders."""
+        return [
+            (error_data, templatize_remediation(
+                remediation,
+                fingerprint_message(error_data.get("message") or "").variables
+            ))
+            for error_data, remediation in items
+        ]
+
+    def _cache_items(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Replace cached entries with remediations that are about to be stored."""
+        if self.cache is not None:
+            for error_data, template in items:
+                self.cache.put(self.error_hash(error_data), PreparedTemplate(template))
+
+    def _invalidate_items(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Drop cached entries whose write did not reach the backend."""
+        if self.cache is not None:
+            for error_data, _ in items:
+                self.cache.invalidate(self.error_hash(error_data))
+
+    def prime_cache(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Make remediations visible to lookups ahead of a write-behind store."""
+        self._cache_items(self._templatize_items(items))
+
+    async def store_error(self, error_data: Dict[str, Any], remediation: Dict[str, Any]):
+        """Store an error and its remediation."""
+        await self.store_errors([(error_data, remediation)])
+
+    async def store_errors(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Store many (error_data, remediation) pairs in one backend call."""
+        items = self._templatize_items(items)
+        # Cache first so requests arriving during a write-behind see the new value
+        self._cache_items(items)
+        try:
+            await self._run_blocking(self._store_items, items)
+        except Exception:
+            self._invalidate_items(items)
+            raise
+        self._index_items(items)
+
+    async def store_in_background(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Write-behind entry point for background tasks; failures are logged, not raised."""
+        try:
+            await self.store_errors(items)
+        except Exception as e:
+            logging.error(f"Failed to persist {len(items)} remediation(s) in background: {str(e)}")
+
+    async def share(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Publish a value to the other worker processes for ttl seconds; a no-op without a SharedCache."""
+        if self.shared_cache is not None:
+            await self._run_blocking(self.shared_cache.put, key, value, False, ttl)
+
+    async def get_shared(self, key: str) -> Optional[Any]:
+        """Read a value published with share(), if any."""
+        if self.shared_cache is None:
+            return None
+        return await self._run_blocking(self.shared_cache.get, key)
+
+    async def sync_shared_cache(self, interval: float = 0.5):
+        """Drop in-process entries other workers replaced, every interval seconds, until cancelled."""
+        if self.shared_cache is None or self.cache is None:
+            return
+        seq = await self._run_blocking(self.shared_cache.latest_seq)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                seq, keys, complete = await self._run_blocking(self.shared_cache.changes_since, seq)
+            except Exception as e:
+                logging.warning(f"Failed to read shared cache invalidations: {str(e)}")
+                continue
+            if not complete:
+                self.cache.clear()
+            for key in keys:
+                self.cache.invalidate(key)
+
+    def _apply_retention(self) -> List[str]:
+        """Run one retention pass and remove evicted errors from the shared cache; runs on the pool."""
+        evicted = self.retention.run()
+        if evicted and self.shared_cache is not None:
+            self.shared_cache.invalidate_many(evicted)
+        return evicted
+
+    async def run_retention(self, interval: float = 60.0):
+        """Run a retention pass every interval seconds, until cancelled."""
+        if self.retention is None:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = await self._run_blocking(self._apply_retention)
+            except Exception as e:
+                logging.error(f"Retention pass failed: {str(e)}")
+                continue
+            for error_hash in evicted:
+                if self.cache is not None:
+                    self.cache.invalidate(error_hash)
+                if self.similarity_index is not None:
+                    self.similarity_index.remove(error_hash)
+
+    async def shared_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Shared cache counters and size, or None without a SharedCache."""
+        if self.shared_cache is None:
+            return None
+        return await self._run_blocking(self.shared_cache.stats)
+
+    async def retention_stats(self) -> Optional[Dict[str, Any]]:
+        """Retention counters and storage figures, or None without a RetentionManager."""
+        if self.retention is None:
+            return None
+        return await self._run_blocking(self.retention.stats)
+
+    def close(self):
+        """Wait for pending storage calls, then close the backend."""
+        self._closing = True
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self._closing = False
+        if self.retention is not None:
+            try:
+                self.retention.flush()
+            except Exception as e:
+                logging.error(f"Failed to record access counts at shutdown: {str(e)}")
+        self.backend.close()
+        if self.shared_cache is not None:
+            self.shared_cache.close()
@@ -0,0 +1,106 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Tuple, runtime_checkable
+
+
+BACKEND_NAMES = ("sqlite", "firestore", "tiered")
+
+
+@runtime_checkable
+class StorageBackend(Protocol):
+    """Synchronous storage interface wrapped by AsyncStorage.
+
+    Remediations are stored and returned as templates (see
+    templatize_remediation), keyed by error_hash(error_log).
+    """
+
+    def error_hash(self, error_log: Dict[str, Any]) -> str: ...
+
+    def store_error(self, error_log: Dict[str, Any], remediation: Dict[str, Any]) -> Any: ...
+
+    def store_errors(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None: ...
+
+    def get_remediation(self, error_log: Dict[str, Any]) -> Optional[Dict[str, Any]]: ...
+
+    def get_remediations(self, error_logs: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]: ...
+
+    def get_remediation_by_hash(self, error_hash: str) -> Optional[Tuple[str, Dict[str, Any]]]: ...
+
+    def iter_messages(self) -> Iterator[Tuple[str, str]]: ...
+
+    def close(self) -> None: ...
+
+
+@runtime_checkable
+class QueryableBackend(StorageBackend, Protocol):
+    """A backend that can also page through and export stored errors."""
+
+    def query_errors(self, filters: Dict[str, Any] = None, limit: int = 100,
+                     cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]: ...
+
+    def iter_errors(self, filters: Dict[str, Any] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]: ...
+
+
+@runtime_checkable
+class RetentionBackend(StorageBackend, Protocol):
+    """A backend whose stored errors can be aged out (see RetentionManager)."""
+
+    def record_access(self, counts: Dict[str, int]) -> None: ...
+
+    def decay_hits(self, batch_size: int = 500) -> int: ...
+
+    def evict_older_than(self, max_age: float, batch_size: int = 500) -> List[str]: ...
+
+    def evict_excess(self, max_rows: int, policy: str = "lfu", batch_size: int = 500) -> List[str]: ...
+
+    def remove_unused_templates(self) -> int: ...
+
+    def optimize(self, vacuum_pages: int = 1000, analyze: bool = False) -> int: ...
+
+    def storage_stats(self) -> Dict[str, Any]: ...
+
+
+def create_firestore_client(name: str):
+    """Build a Firestore client by name: "google" or "fake" (in memory, for tests and benchmarks)."""
+    if name == "google":
+        # FirestoreService creates the real client itself
+        return None
+    if name == "fake":
+        from database.fake_firestore import FakeFirestoreClient
+        return FakeFirestoreClient(latency=float(os.getenv("FIRESTORE_FAKE_LATENCY_MS", "0")) / 1000)
+    raise ValueError(f"Unknown Firestore client: {name}")
+
+
+def create_backend(name: str) -> StorageBackend:
+    """Build a storage backend by name: "sqlite", "firestore" or "tiered".
+
+    Backend modules are imported here, so only the selected ones are loaded.
+    """
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"Unknown storage backend: {name}")
+    if name == "sqlite":
+        from database.sqlite_service import SQLiteService
+        return SQLiteService(
+            os.getenv("REMEDIATION_DB_PATH", "remediation.db"),
+            codec=os.getenv("REMEDIATION_CODEC", "json+zlib")
+        )
+    from database.firestore_service import FirestoreService
+
+    remote = FirestoreService(
+        client=create_firestore_client(os.getenv("FIRESTORE_CLIENT", "google")),
+        project=os.getenv("GOOGLE_CLOUD_PROJECT"),
+        collection=os.getenv("FIRESTORE_COLLECTION", "errors")
+    )
+    if name == "firestore":
+        return remote
+    from database.sqlite_service import SQLiteService
+    from database.tiered_backend import TieredBackend
+
+    return TieredBackend(
+        SQLiteService(
+            os.getenv("REMEDIATION_DB_PATH", "remediation.db"),
+            codec=os.getenv("REMEDIATION_CODEC", "json+zlib")
+        ),
+        remote,
+        ttl=float(os.getenv("TIERED_CACHE_TTL", "300")),
+        flush_interval=float(os.getenv("TIERED_FLUSH_INTERVAL", "1"))
+    )
@@ -0,0 +1,187 @@
+import json
+import re
+import zlib
+from typing import Any, Dict, Optional, Tuple, Union
+
+from processor.log_processor import PARAMETER_PLACEHOLDER_REGEX, render_remediation
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# First byte of every encoded payload, so stored data stays readable when the
+# configured codec changes
+TAG_JSON = b"J"
+TAG_MSGPACK = b"M"
+TAG_ZLIB = b"Z"
+
+# Payloads shorter than this are stored uncompressed; zlib only pays off on
+# larger documents such as remediation templates
+COMPRESS_THRESHOLD = 256
+
+CODEC_NAMES = ("json", "json+zlib", "msgpack", "msgpack+zlib")
+
+# PLACEHOLDER_REGEX over encoded JSON
+ENCODED_PLACEHOLDER_REGEX = re.compile(rb"\{\{(\w+)\}\}")
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class PayloadCodec:
+    """Serializes remediation payloads for storage.
+
+    "json" uses orjson when it is installed and the standard library
+    otherwise; "msgpack" requires the msgpack package. A "+zlib" suffix
+    compresses payloads of COMPRESS_THRESHOLD bytes or more. Encoded
+    payloads are tagged, so decode() reads any of them regardless of the
+    configured codec, as well as plain JSON text written by older versions.
+    """
+
+    def __init__(self, name: str = "json+zlib"):
+        if name not in CODEC_NAMES:
+            raise ValueError(f"Unknown codec {name!r}; expected one of {', '.join(CODEC_NAMES)}")
+        serializer, _, compression = name.partition("+")
+        if serializer == "msgpack" and msgpack is None:
+            raise ValueError("The msgpack codec requires the msgpack package")
+        self.name = name
+        self._msgpack = serializer == "msgpack"
+        self._compress = compression == "zlib"
+
+    def encode(self, value: Any) -> bytes:
+        if self._msgpack:
+            data = TAG_MSGPACK + msgpack.packb(value, use_bin_type=True)
+        else:
+            data = TAG_JSON + _json_dumps(value)
+        if self._compress and len(data) >= COMPRESS_THRESHOLD:
+            return TAG_ZLIB + zlib.compress(data)
+        return data
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str):
+            return json.loads(data)
+        tag = data[:1]
+        if tag == TAG_ZLIB:
+            data = zlib.decompress(data[1:])
+            tag = data[:1]
+        if tag == TAG_JSON:
+            return _json_loads(data[1:])
+        if tag == TAG_MSGPACK:
+            if msgpack is None:
+                raise ValueError("Stored payload is msgpack-encoded but msgpack is not installed")
+            return msgpack.unpackb(data[1:], raw=False)
+        # Untagged bytes: JSON text stored as a BLOB
+        return _json_loads(data)
+
+
+class CompiledTemplate:
+    """A remediation template (see split_remediation) prepared for fast joining.
+
+    The template is serialized to JSON once and split at its {{p.name}}
+    placeholders; fill() splices in the JSON-escaped parameter values and
+    parses the result, which is cheaper than walking the structure with a
+    regex per string. fill(parameters) equals
+    join_remediation(template, parameters) and always returns a new object.
+    """
+
+    __slots__ = ("parts",)
+
+    def __init__(self, template: Any):
+        self.parts = PARAMETER_PLACEHOLDER_REGEX.split(_json_dumps(template).decode())
+
+    def fill(self, parameters: Optional[Dict[str, Any]]) -> Any:
+        parts = self.parts
+        if len(parts) == 1:
+            text = parts[0]
+        else:
+            values = parameters or {}
+            chunks = [parts[0]]
+            for i in range(1, len(parts), 2):
+                value = values.get(parts[i])
+                if isinstance(value, str):
+                    # Escaped the way JSON would, minus the surrounding quotes
+                    chunks.append(_json_dumps(value).decode()[1:-1])
+                else:
+                    chunks.append("{{p." + parts[i] + "}}")
+                chunks.append(parts[i + 1])
+            text = "".join(chunks)
+        remediation = _json_loads(text)
+        if parameters is not None:
+            remediation["parameters"] = parameters
+        return remediation
+
+
+def _keys_contain(value: Any, marker: str) -> bool:
+    if isinstance(value, dict):
+        return any(marker in key or _keys_contain(item, marker) for key, item in value.items())
+    if isinstance(value, list):
+        return any(_keys_contain(item, marker) for item in value)
+    return False
+
+
+class PreparedTemplate:
+    """A remediation template (see templatize_remediation) plus its JSON encoding.
+
+    The template is encoded once, on first use, and split at its {{name}}
+    placeholders. render_json() then splices a message's JSON-escaped
+    variables straight into the bytes, so answering a cached lookup needs no
+    render and re-encode of the whole remediation. render_json(variables)
+    encodes the same value as render_remediation(template, variables).
+    """
+
+    __slots__ = ("template", "_head", "_slots")
+
+    def __init__(self, template: Any):
+        self.template = template
+        self._head = None
+        self._slots = None
+
+    @property
+    def action(self) -> str:
+        return self.template.get("action", "") if isinstance(self.template, dict) else ""
+
+    def render(self, variables: Tuple[Tuple[str, str], ...]) -> Any:
+        return render_remediation(self.template, variables)
+
+    def _prepare(self):
+        if _keys_contain(self.template, "{{"):
+            # Placeholders are only rendered in values; splicing would touch keys too
+            self._slots = ()
+            return
+        parts = ENCODED_PLACEHOLDER_REGEX.split(_json_dumps(self.template))
+        self._slots = tuple(
+            (parts[i].decode(), b"{{" + parts[i] + b"}}", parts[i + 1])
+            for i in range(1, len(parts), 2)
+        )
+        self._head = parts[0]
+
+    def render_json(self, variables: Tuple[Tuple[str, str], ...]) -> bytes:
+        if self._slots is None:
+            self._prepare()
+        if self._head is None:
+            return _json_dumps(self.render(variables))
+        if not self._slots:
+            return self._head
+        values = dict(variables)
+        chunks = [self._head]
+        for name, placeholder, tail in self._slots:
+            value = values.get(name)
+            # Escaped the way JSON would, minus the surrounding quotes
+            chunks.append(placeholder if value is None else _json_dumps(value)[1:-1])
+            chunks.append(tail)
+        return b"".join(chunks)
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+CSV_COLUMNS = ("id", "timestamp", "level", "action", "error_hash", "message", "remediation")
+
+
+def ndjson_line(record: Dict[str, Any]) -> str:
+    """Encode a record as one JSON line."""
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def csv_line(values: Iterable[Any]) -> str:
+    """Encode one CSV row."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def csv_record(record: Dict[str, Any]) -> str:
+    """Encode a record as a CSV row of CSV_COLUMNS; the remediation is a JSON cell."""
+    return csv_line(
+        json.dumps(record.get(column), separators=(",", ":")) if column == "remediation" else record.get(column)
+        for column in CSV_COLUMNS
+    )
+
+
+def iter_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Yield one JSON line per record."""
+    for record in records:
+        yield ndjson_line(record)
+
+
+def iter_csv(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Yield a CSV header and one row per record."""
+    yield csv_line(CSV_COLUMNS)
+    for record in records:
+        yield csv_record(record)
+
+
+def iter_export(records: Iterable[Dict[str, Any]], export_format: str) -> Iterator[str]:
+    """Stream records as NDJSON or CSV text chunks."""
+    if export_format == "ndjson":
+        return iter_ndjson(records)
+    if export_format == "csv":
+        return iter_csv(records)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+async def aiter_export(records: AsyncIterable[Dict[str, Any]], export_format: str) -> AsyncIterator[str]:
+    """Stream records from an async iterable as NDJSON or CSV text chunks."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    if export_format == "csv":
+        yield csv_line(CSV_COLUMNS)
+    encode = csv_record if export_format == "csv" else ndjson_line
+    async for record in records:
+        yield encode(record)
@@ -0,0 +1,155 @@
+import copy
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from database.firestore_service import MAX_BATCH_WRITES
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection: "FakeCollectionReference", document_id: str):
+        self._collection = collection
+        self.id = document_id
+
+    @property
+    def _client(self) -> "FakeFirestoreClient":
+        return self._collection._client
+
+    def get(self) -> FakeDocumentSnapshot:
+        return self._client._read([self])[0]
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        batch = self._client.batch()
+        batch.set(self, data, merge=merge)
+        batch.commit()
+
+    def delete(self):
+        batch = self._client.batch()
+        batch.delete(self)
+        batch.commit()
+
+
+class FakeQuery:
+    def __init__(self, collection: "FakeCollectionReference", fields: Optional[List[str]] = None):
+        self._collection = collection
+        self._fields = fields
+
+    def stream(self) -> Iterator[FakeDocumentSnapshot]:
+        client = self._collection._client
+        with client._lock:
+            documents = list(client._documents.get(self._collection.id, {}).items())
+        client._wait()
+        for document_id, data in documents:
+            client.reads += 1
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            yield FakeDocumentSnapshot(self._collection.document(document_id), copy.deepcopy(data))
+
+    def get(self) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollectionReference:
+    def __init__(self, client: "FakeFirestoreClient", collection_id: str):
+        self._client = client
+        self.id = collection_id
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self, document_id or uuid.uuid4().hex)
+
+    def select(self, field_paths: Iterable[str]) -> FakeQuery:
+        return FakeQuery(self, list(field_paths))
+
+    def stream(self) -> Iterator[FakeDocumentSnapshot]:
+        return FakeQuery(self).stream()
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeFirestoreClient"):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False):
+        self._writes.append((reference, copy.deepcopy(data), merge))
+
+    def delete(self, reference: FakeDocumentReference):
+        self._writes.append((reference, None, False))
+
+    def commit(self):
+        if len(self._writes) > MAX_BATCH_WRITES:
+            raise ValueError(f"A write batch holds at most {MAX_BATCH_WRITES} writes, got {len(self._writes)}")
+        self._client._commit(self._writes)
+        self._writes = []
+
+
+class FakeFirestoreClient:
+    """In-memory stand-in for google.cloud.firestore.Client.
+
+    Implements the subset FirestoreService uses: collection/document
+    references, get_all, select().stream() and atomic write batches. Data is
+    deep-copied on the way in and out, as serialization would. Every round
+    trip sleeps for latency seconds to imitate the network, and reads,
+    writes and commits count what a real client would have sent.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._documents: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read(self, references: List[FakeDocumentReference]) -> List[FakeDocumentSnapshot]:
+        self._wait()
+        with self._lock:
+            self.reads += len(references)
+            return [
+                FakeDocumentSnapshot(reference, copy.deepcopy(
+                    self._documents.get(reference._collection.id, {}).get(reference.id)
+                ))
+                for reference in references
+            ]
+
+    def _commit(self, writes):
+        self._wait()
+        with self._lock:
+            for reference, data, merge in writes:
+                documents = self._documents.setdefault(reference._collection.id, {})
+                if data is None:
+                    documents.pop(reference.id, None)
+                elif merge and reference.id in documents:
+                    documents[reference.id].update(data)
+                else:
+                    documents[reference.id] = data
+            self.writes += len(writes)
+            self.commits += 1
+
+    def collection(self, collection_id: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, collection_id)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def get_all(self, references: Iterable[FakeDocumentReference]) -> Iterator[FakeDocumentSnapshot]:
+        # Like the real client, results are not guaranteed to follow input order
+        return iter(reversed(self._read(list(references))))
+
+    def close(self):
+        pass
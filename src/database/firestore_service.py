@@ -1,49 +1,126 @@
-import os
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/home/anish/RemediationAgent/orbit-460719-40dfab18b8b4.json"
-from google.cloud import firestore
 import logging
+from datetime import datetime, timezone
+from processor.log_processor import fingerprint_message
+
+# Firestore rejects write batches with more operations than this
+MAX_BATCH_WRITES = 500
+
 
 class FirestoreService:
-    def __init__(self):
-        try:
-            self.db = firestore.Client(project="orbit-460719")
-        except Exception as e:
-            logging.error(f"Failed to initialize Firestore client: {str(e)}")
-            raise
+    """Stores errors in a Firestore collection, one document per error hash.
+
+    Keying documents by hash turns every lookup into a direct document read
+    (get_all for batches) instead of a query, and makes stores idempotent
+    upserts. Writes go out in WriteBatch commits of up to MAX_BATCH_WRITES.
+
+    Without a client, a google.cloud.firestore.Client is created for project
+    using Application Default Credentials (GOOGLE_APPLICATION_CREDENTIALS or
+    the environment's service account). Pass a FakeFirestoreClient to run
+    without Google Cloud.
+    """
+
+    def __init__(self, client=None, project: str = None, collection: str = "errors"):
+        if client is None:
+            try:
+                from google.cloud import firestore
+                client = firestore.Client(project=project)
+            except Exception as e:
+                logging.error(f"Failed to initialize Firestore client: {str(e)}")
+                raise
+            self._server_timestamp = firestore.SERVER_TIMESTAMP
+        else:
+            self._server_timestamp = None
+        self.db = client
+        self.collection = collection
+
+    def _timestamp(self):
+        return self._server_timestamp or datetime.now(timezone.utc)
+
+    def _document(self, error_hash: str):
+        return self.db.collection(self.collection).document(error_hash)
 
     def store_error(self, error_log, remediation):
         """Store error log and remediation in Firestore."""
+        self.store_errors([(error_log, remediation)])
+        return self.error_hash(error_log)
+
+    def store_errors(self, items):
+        """Store many (error_log, remediation) pairs in as few batch commits as possible."""
         try:
-            error_hash = self._hash_error_log(error_log)
-            doc_ref = self.db.collection("errors").document()
-            doc_ref.set({
-                "error_log": error_log,
-                "remediation": remediation,
-                "error_hash": error_hash,
-                "timestamp": firestore.SERVER_TIMESTAMP
-            })
-            return doc_ref.id
+            for start in range(0, len(items), MAX_BATCH_WRITES):
+                batch = self.db.batch()
+                for error_log, remediation in items[start:start + MAX_BATCH_WRITES]:
+                    error_hash = self.error_hash(error_log)
+                    batch.set(self._document(error_hash), {
+                        "error_log": error_log,
+                        "remediation": remediation,
+                        "error_hash": error_hash,
+                        "timestamp": self._timestamp()
+                    })
+                batch.commit()
         except Exception as e:
-            logging.error(f"Failed to store error in Firestore: {str(e)}")
+            logging.error(f"Failed to store errors in Firestore: {str(e)}")
             raise
 
+    def _get_documents(self, error_hashes):
+        """Return {error_hash: document data} for the hashes that exist."""
+        unique = list(dict.fromkeys(error_hashes))
+        if not unique:
+            return {}
+        snapshots = self.db.get_all([self._document(error_hash) for error_hash in unique])
+        return {snapshot.id: snapshot.to_dict() for snapshot in snapshots if snapshot.exists}
+
     def get_remediation(self, error_log):
         """Retrieve remediation from Firestore if the error exists."""
         try:
-            error_hash = self._hash_error_log(error_log)
-            query = self.db.collection("errors").where(
-                filter=firestore.FieldFilter("error_hash", "==", error_hash)
-            ).limit(1)
-            docs = query.get()
-            if docs:
-                return docs[0].to_dict()["remediation"]
-            return None
+            snapshot = self._document(self.error_hash(error_log)).get()
+            return snapshot.to_dict()["remediation"] if snapshot.exists else None
         except Exception as e:
             logging.error(f"Failed to get remediation from Firestore: {str(e)}")
             raise
 
-    def _hash_error_log(self, error_log):
-        """Generate a unique hash for the error log."""
-        import hashlib
-        error_str = str(error_log)
-        return hashlib.md5(error_str.encode()).hexdigest() 
\ No newline at end of file
+    def get_remediations(self, error_logs):
+        """Retrieve remediations for many errors, in input order, with one batched read."""
+        try:
+            hashes = [self.error_hash(error_log) for error_log in error_logs]
+            documents = self._get_documents(hashes)
+            return [
+                documents[error_hash]["remediation"] if error_hash in documents else None
+                for error_hash in hashes
+            ]
+        except Exception as e:
+            logging.error(f"Failed to get remediations from Firestore: {str(e)}")
+            raise
+
+    def get_documents_by_hash(self, error_hashes):
+        """Return {error_hash: (error_log, remediation)} for the stored hashes, in one batched read."""
+        try:
+            return {
+                error_hash: (data["error_log"], data["remediation"])
+                for error_hash, data in self._get_documents(error_hashes).items()
+            }
+        except Exception as e:
+            logging.error(f"Failed to get remediations from Firestore: {str(e)}")
+            raise
+
+    def get_remediation_by_hash(self, error_hash):
+        """Retrieve (message, remediation) for an error hash, or None."""
+        stored = self.get_documents_by_hash([error_hash]).get(error_hash)
+        if stored is None:
+            return None
+        error_log, remediation = stored
+        return error_log.get("message", ""), remediation
+
+    def iter_messages(self):
+        """Yield (error_hash, message) for every stored error."""
+        for doc in self.db.collection(self.collection).select(["error_hash", "error_log"]).stream():
+            data = doc.to_dict()
+            yield data["error_hash"], data["error_log"].get("message", "")
+
+    def close(self):
+        """Release the Firestore client's network resources."""
+        self.db.close()
+
+    def error_hash(self, error_log):
+        """Generate a hash from the error message's template."""
+        return fingerprint_message(error_log.get("message", "")).hash
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+EVICTION_POLICIES = ("lfu", "lru")
+
+
+class RetentionManager:
+    """Keeps a RetentionBackend's stored errors bounded.
+
+    record() counts a served hit in memory; run() writes the counts
+    accumulated since the previous run in one transaction, so reads never
+    write to the database. run() then:
+
+    - evicts errors neither stored nor read in the last max_age seconds,
+    - evicts errors beyond max_rows, fewest hits first ("lfu") or least
+      recently read first ("lru"),
+    - with "lfu", halves every hit count once per hit_half_life seconds, so
+      errors that were popular long ago do not outlive newer ones,
+    - deletes remediation templates no remaining error uses,
+    - releases up to vacuum_pages free pages (incremental vacuum),
+    - refreshes planner statistics (ANALYZE) every analyze_interval seconds.
+
+    Evicted errors are regenerated when they are next requested. run()
+    returns their hashes so callers can drop cached copies.
+    """
+
+    def __init__(self, backend, max_rows: Optional[int] = None, max_age: Optional[float] = None,
+                 eviction: str = "lfu", batch_size: int = 500, vacuum_pages: int = 1000,
+                 analyze_interval: float = 3600.0, hit_half_life: float = 86400.0, clock=time.monotonic):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {eviction}")
+        self.backend = backend
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.eviction = eviction
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.analyze_interval = analyze_interval
+        self.hit_half_life = hit_half_life
+        self._clock = clock
+        self._hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._next_analyze = 0.0
+        self._next_decay = clock() + hit_half_life
+        self.runs = 0
+        self.failures = 0
+        self.evicted_by_age = 0
+        self.evicted_by_size = 0
+        self.templates_removed = 0
+        self.pages_released = 0
+        self.last_run_ms = 0.0
+
+    def record(self, error_hash: str):
+        """Count one hit for an error; written by the next flush()."""
+        with self._lock:
+            self._hits[error_hash] = self._hits.get(error_hash, 0) + 1
+
+    def flush(self) -> int:
+        """Write the hit counts recorded so far; returns how many errors they cover."""
+        with self._lock:
+            hits, self._hits = self._hits, {}
+        if not hits:
+            return 0
+        try:
+            self.backend.record_access(hits)
+        except Exception:
+            with self._lock:
+                # Keep the counts for the next flush
+                for error_hash, count in hits.items():
+                    self._hits[error_hash] = self._hits.get(error_hash, 0) + count
+            raise
+        return len(hits)
+
+    def run(self) -> List[str]:
+        """Flush hit counts, evict and reclaim space; returns the evicted hashes."""
+        with self._run_lock:
+            started = time.perf_counter()
+            try:
+                self.flush()
+                evicted = []
+                if self.max_age:
+                    by_age = self.backend.evict_older_than(self.max_age, self.batch_size)
+                    self.evicted_by_age += len(by_age)
+                    evicted.extend(by_age)
+                if self.max_rows:
+                    by_size = self.backend.evict_excess(self.max_rows, self.eviction, self.batch_size)
+                    self.evicted_by_size += len(by_size)
+                    evicted.extend(by_size)
+                now = self._clock()
+                if self.eviction == "lfu" and now >= self._next_decay:
+                    self._next_decay = now + self.hit_half_life
+                    self.backend.decay_hits(self.batch_size)
+                if evicted:
+                    self.templates_removed += self.backend.remove_unused_templates()
+                analyze = now >= self._next_analyze
+                if analyze:
+                    self._next_analyze = now + self.analyze_interval
+                self.pages_released += self.backend.optimize(self.vacuum_pages, analyze)
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.runs += 1
+                self.last_run_ms = (time.perf_counter() - started) * 1000
+        if evicted:
+            logging.info(f"Retention evicted {len(evicted)} stored error(s)")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the retention counters and the backend's storage figures."""
+        try:
+            storage = self.backend.storage_stats()
+        except Exception as e:
+            logging.warning(f"Failed to read storage stats: {str(e)}")
+            storage = {}
+        return {
+            "max_rows": self.max_rows,
+            "max_age": self.max_age,
+            "eviction": self.eviction,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_ms": round(self.last_run_ms, 3),
+            "pending_hits": len(self._hits),
+            "evicted_by_age": self.evicted_by_age,
+            "evicted_by_size": self.evicted_by_size,
+            "templates_removed": self.templates_removed,
+            "pages_released": self.pages_released,
+            **storage
+        }
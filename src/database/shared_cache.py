@@ -0,0 +1,250 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.codec import PayloadCodec
+from database.sqlite_service import MAX_SQL_VARIABLES
+
+CREATE_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_entries_expires_at ON entries (expires_at)",
+    # Invalidation log: one row per replaced entry, read by the other workers
+    """
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL,
+        origin INTEGER NOT NULL,
+        changed_at REAL NOT NULL
+    )
+    """
+]
+
+UPSERT_ENTRY_SQL = """
+    INSERT INTO entries (key, value, expires_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+"""
+
+INSERT_CHANGE_SQL = "INSERT INTO changes (key, origin, changed_at) VALUES (?, ?, ?)"
+
+# Most keys a single changes_since() call returns
+MAX_CHANGES_PER_POLL = 10000
+
+
+class SharedCache:
+    """Remediation cache shared by the worker processes of one host.
+
+    Entries live in a SQLite file that every worker opens. Put it on tmpfs
+    (e.g. /dev/shm) so no read or write touches a disk: durability is not
+    needed, since the storage backend remains the source of truth.
+
+    Every put(notify=True) or invalidate() also appends the key to an
+    invalidation log. Workers poll it with changes_since() and drop those
+    keys from their in-process caches, so a remediation replaced by one
+    worker stops being served by the others within one poll interval. Log
+    entries older than log_retention seconds are pruned; a worker that falls
+    further behind is told to clear its whole cache.
+
+    Cache failures are logged and treated as misses: they never fail a request.
+    """
+
+    def __init__(self, path: str, ttl: float = 300.0, max_entries: int = 100000,
+                 log_retention: float = 60.0, busy_timeout: float = 1.0, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.log_retention = log_retention
+        self.busy_timeout = busy_timeout
+        self.codec = PayloadCodec("json")
+        self.origin = os.getpid()
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._next_maintenance = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        conn = self._get_connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in CREATE_SQL:
+                conn.execute(statement)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _write(self, statements: List[Tuple[str, list]]):
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, rows in statements:
+                conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _failed(self, operation: str, error: Exception):
+        self.errors += 1
+        logging.warning(f"Shared cache {operation} failed: {str(error)}")
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Return {key: value} for the keys present, not expired and readable."""
+        unique = list(dict.fromkeys(keys))
+        if not unique:
+            return {}
+        conn = self._get_connection()
+        now = self._clock()
+        rows = []
+        try:
+            for start in range(0, len(unique), MAX_SQL_VARIABLES):
+                chunk = unique[start:start + MAX_SQL_VARIABLES]
+                rows.extend(conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                    (*chunk, now)
+                ))
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return {}
+        found = {}
+        for key, value in rows:
+            try:
+                found[key] = self.codec.decode(value)
+            except Exception as e:
+                # A corrupt or foreign entry is a miss; the backend still has the value
+                self._failed(f"decode of {key}", e)
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: List[Tuple[str, Any]], notify: bool = True, ttl: Optional[float] = None):
+        """Insert or replace entries for ttl seconds (default: the cache's ttl).
+
+        notify=True tells the other workers to drop their copies.
+        """
+        if not items:
+            return
+        now = self._clock()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        statements = [(UPSERT_ENTRY_SQL, [(key, self.codec.encode(value), expires_at) for key, value in items])]
+        if notify:
+            statements.append((INSERT_CHANGE_SQL, [(key, self.origin, now) for key, _ in items]))
+        try:
+            self._write(statements)
+        except sqlite3.Error as e:
+            self._failed("write", e)
+            return
+        self._maintain(now)
+
+    def put(self, key: str, value: Any, notify: bool = True, ttl: Optional[float] = None):
+        self.put_many([(key, value)], notify, ttl)
+
+    def invalidate_many(self, keys: List[str]):
+        """Remove entries and tell the other workers to drop their copies."""
+        if not keys:
+            return
+        now = self._clock()
+        try:
+            self._write([
+                ("DELETE FROM entries WHERE key = ?", [(key,) for key in keys]),
+                (INSERT_CHANGE_SQL, [(key, self.origin, now) for key in keys])
+            ])
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def latest_seq(self) -> int:
+        """Position of the newest invalidation log entry; pass it to changes_since()."""
+        row = self._get_connection().execute("SELECT MAX(seq) FROM changes").fetchone()
+        return row[0] or 0
+
+    def changes_since(self, seq: int) -> Tuple[int, List[str], bool]:
+        """Return (new seq, keys changed by other processes after seq, complete).
+
+        complete is False when entries after seq were already pruned; the
+        caller must then assume any key may have changed.
+        """
+        conn = self._get_connection()
+        rows = conn.execute(
+            "SELECT seq, key, origin FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, MAX_CHANGES_PER_POLL)
+        ).fetchall()
+        if not rows:
+            return seq, [], True
+        complete = rows[0][0] == seq + 1 or conn.execute(
+            # AUTOINCREMENT leaves no gaps other than pruned or rolled back rows
+            "SELECT COUNT(*) FROM changes WHERE seq <= ?", (seq,)
+        ).fetchone()[0] > 0
+        return rows[-1][0], [key for _, key, origin in rows if origin != self.origin], complete
+
+    def _maintain(self, now: float):
+        """Drop expired entries, old log rows and entries beyond max_entries, every few seconds."""
+        if now < self._next_maintenance:
+            return
+        self._next_maintenance = now + min(self.log_retention, 5.0)
+        try:
+            self._write([
+                ("DELETE FROM entries WHERE expires_at <= ?", [(now,)]),
+                ("DELETE FROM changes WHERE changed_at < ?", [(now - self.log_retention,)]),
+                ("""
+                    DELETE FROM entries WHERE key IN (
+                        SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, [(self.max_entries,)])
+            ])
+        except sqlite3.Error as e:
+            self._failed("maintenance", e)
+
+    def __len__(self) -> int:
+        return self._get_connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        try:
+            size = len(self)
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            size = None
+        return {
+            "path": self.path,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "errors": self.errors
+        }
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        self._local = threading.local()
+        for conn in connections:
+            conn.close()
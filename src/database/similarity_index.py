@@ -0,0 +1,233 @@
+import random
+import re
+import threading
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from processor.log_processor import fingerprint_message
+
+# Mersenne prime used for the MinHash permutations
+_PRIME = (1 << 61) - 1
+
+TOKEN_REGEX = re.compile(r"<[a-z]+>|[a-z0-9]+")
+
+# Common abbreviations and near-synonyms in error messages, mapped to one form
+SYNONYMS = {
+    "db": "database",
+    "dbs": "database",
+    "sql": "database",
+    "conn": "connection",
+    "connect": "connection",
+    "connections": "connection",
+    "refused": "failed",
+    "failure": "failed",
+    "fail": "failed",
+    "fails": "failed",
+    "unable": "failed",
+    "timeout": "timed",
+    "oom": "memory",
+    "mem": "memory",
+    "ram": "memory",
+    "crashed": "crash",
+    "crashes": "crash",
+    "srv": "server",
+    "svc": "service",
+    "auth": "authentication",
+    "perm": "permission",
+    "permissions": "permission",
+    "denied": "failed"
+}
+
+STOPWORDS = frozenset({"a", "an", "the", "in", "on", "of", "to", "for", "from", "at", "is", "was", "be", "by", "with"})
+
+# Words that invert a message: "breach detected" and "breach not detected"
+# share almost every token but need different remediations
+NEGATIONS = frozenset({"not", "no", "never", "without", "cannot", "none"})
+
+
+def _normalize_token(token: str) -> str:
+    token = SYNONYMS.get(token, token)
+    # Light suffix stripping so "overflowing" and "overflowed" meet
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix) and not token.startswith("<"):
+            return SYNONYMS.get(token[:-len(suffix)], token[:-len(suffix)])
+    return token
+
+
+def message_tokens(message: str) -> Tuple[str, ...]:
+    """Normalized word tokens of a message, with variable tokens masked."""
+    template = fingerprint_message(message or "").template.lower()
+    return tuple(dict.fromkeys(
+        _normalize_token(token) for token in TOKEN_REGEX.findall(template) if token not in STOPWORDS
+    ))
+
+
+def _string_values(value: Any):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _string_values(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _string_values(item)
+
+
+def conflicting_tokens(message: str, neighbour_message: str, remediation: Any) -> Set[str]:
+    """Tokens that make a neighbour's remediation wrong for message.
+
+    These are negations only one of the two messages has, and words only the
+    neighbour's message has that its remediation repeats. The second kind
+    are values a rule extracted, such as a service name, which are not
+    masked as message variables.
+    """
+    tokens = set(message_tokens(message))
+    neighbour_tokens = set(message_tokens(neighbour_message))
+    conflicts = (tokens ^ neighbour_tokens) & NEGATIONS
+    unshared = neighbour_tokens - tokens
+    if unshared:
+        text = " ".join(_string_values(remediation)).lower()
+        conflicts |= unshared & {_normalize_token(token) for token in TOKEN_REGEX.findall(text)}
+    return conflicts
+
+
+@lru_cache(maxsize=65536)
+def token_features(token: str) -> FrozenSet[int]:
+    """Hashed features of one token: the word itself and its character trigrams."""
+    features = {zlib.crc32(b"w:" + token.encode())}
+    padded = f"^{token}$"
+    for i in range(len(padded) - 2):
+        features.add(zlib.crc32(padded[i:i + 3].encode()))
+    return frozenset(features)
+
+
+def tokens_features(tokens: Tuple[str, ...]) -> FrozenSet[int]:
+    """Feature set of a message: the union of its tokens' features."""
+    return frozenset().union(*(token_features(token) for token in tokens))
+
+
+class SimilarityIndex:
+    """Approximate nearest-neighbour index over stored error messages.
+
+    Messages are reduced to feature sets (see tokens_features) and indexed
+    with MinHash locality-sensitive hashing: num_perm MinHash values split
+    into bands, each band hashed into a bucket. Only messages sharing at
+    least one bucket with the query are compared exactly, so lookups stay
+    fast as the index grows. Works offline with no model or native library.
+
+    The default 20 bands of 6 rows find pairs at Jaccard 0.7 with ~92%
+    probability while keeping unrelated messages out of the candidate set.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 120, bands: int = 20, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)
+        ]
+        self._buckets: List[Dict[Tuple[int, ...], List[str]]] = [{} for _ in range(bands)]
+        # key -> (feature set, band keys); band keys are kept for removal
+        self._features: Dict[str, Tuple[FrozenSet[int], List[Tuple[int, ...]]]] = {}
+        self._lock = threading.Lock()
+        self._token_signatures = lru_cache(maxsize=65536)(self._token_signature)
+        self.lookups = 0
+        self.matches = 0
+
+    def _token_signature(self, token: str) -> Tuple[int, ...]:
+        """MinHash signature of a single token's features.
+
+        Tokens repeat far more often than messages, so signatures are cached
+        per token and combined with an element-wise min per message.
+        """
+        permutations = self._permutations
+        return tuple(
+            min((a * feature + b) % _PRIME for feature in token_features(token))
+            for a, b in permutations
+        )
+
+    def _signature(self, tokens: Tuple[str, ...]) -> List[int]:
+        return list(map(min, zip(*(self._token_signatures(token) for token in tokens))))
+
+    def _band_keys(self, signature: List[int]):
+        rows = self.rows
+        return [tuple(signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._features
+
+    def add(self, key: str, message: str):
+        """Index a message under key (an error hash); re-adding a key is a no-op."""
+        if key in self._features:
+            return
+        tokens = message_tokens(message)
+        if not tokens:
+            return
+        features = tokens_features(tokens)
+        band_keys = self._band_keys(self._signature(tokens))
+        with self._lock:
+            if key in self._features:
+                return
+            self._features[key] = (features, band_keys)
+            for buckets, band_key in zip(self._buckets, band_keys):
+                buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key: str):
+        """Drop key from the index."""
+        with self._lock:
+            entry = self._features.pop(key, None)
+            if entry is None:
+                return
+            for buckets, band_key in zip(self._buckets, entry[1]):
+                members = buckets.get(band_key)
+                if members and key in members:
+                    members.remove(key)
+                    if not members:
+                        del buckets[band_key]
+
+    def query(self, message: str, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Return (key, similarity) of the nearest indexed message above the threshold."""
+        self.lookups += 1
+        tokens = message_tokens(message)
+        if not tokens:
+            return None
+        features = tokens_features(tokens)
+
+        candidates = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(self._signature(tokens))):
+            members = buckets.get(band_key)
+            if members:
+                candidates.update(members)
+        candidates.discard(exclude)
+
+        best = None
+        best_score = self.threshold
+        for key in candidates:
+            entry = self._features.get(key)
+            if entry is None:
+                continue
+            other = entry[0]
+            score = len(features & other) / len(features | other)
+            if score >= best_score:
+                best, best_score = key, score
+        if best is None:
+            return None
+        self.matches += 1
+        return best, best_score
+
+    def stats(self):
+        """Return a snapshot of the index counters."""
+        return {
+            "size": len(self._features),
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "matches": self.matches
+        }
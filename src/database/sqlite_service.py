@@ -1,96 +1,702 @@
 import sqlite3
-import json
+import base64
 import hashlib
-from datetime import datetime
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
 import logging
+from database.codec import CompiledTemplate, PayloadCodec
+from processor.log_processor import fingerprint_message, render_remediation, split_remediation, templatize_remediation
+
+# SQLite's default SQLITE_MAX_VARIABLE_NUMBER on older builds is 999
+MAX_SQL_VARIABLES = 900
+
+# Stored in PRAGMA user_version. 1: rows are keyed by the hash of their
+# message template and hold templatized remediations
+SCHEMA_VERSION = 1
+
+# Statements are kept as constants so every call reuses the same SQL text
+# and hits the connection's prepared statement cache.
+# One atomic statement, so concurrent writers (threads or worker processes)
+# never race between an INSERT and a fallback UPDATE
+UPSERT_ERROR_SQL = """
+    INSERT INTO errors (error_hash, timestamp, last_access, hit_count, message, level, action, template_id, params)
+    VALUES (?1, ?2, ?2, 1, ?3, ?4, ?5, ?6, ?7)
+    ON CONFLICT (error_hash) DO UPDATE SET
+        remediation = NULL,
+        template_id = excluded.template_id,
+        params = excluded.params,
+        action = excluded.action,
+        timestamp = excluded.timestamp,
+        last_access = excluded.last_access
+"""
+
+RECORD_ACCESS_SQL = """
+    UPDATE errors
+    SET hit_count = hit_count + ?, last_access = MAX(COALESCE(last_access, ''), ?)
+    WHERE error_hash = ?
+"""
+
+SELECT_HIT_IDS_SQL = """
+    SELECT id
+    FROM errors
+    WHERE id > ? AND hit_count > 0
+    ORDER BY id
+    LIMIT ?
+"""
+
+INSERT_TEMPLATE_SQL = """
+    INSERT OR IGNORE INTO remediation_templates (template_hash, body)
+    VALUES (?, ?)
+"""
+
+SELECT_TEMPLATE_ID_SQL = """
+    SELECT id
+    FROM remediation_templates
+    WHERE template_hash = ?
+"""
+
+SELECT_TEMPLATE_SQL = """
+    SELECT body
+    FROM remediation_templates
+    WHERE id = ?
+"""
+
+SELECT_REMEDIATION_SQL = """
+    SELECT remediation, template_id, params
+    FROM errors
+    WHERE error_hash = ?
+"""
+
+SELECT_BY_HASH_SQL = """
+    SELECT message, remediation, template_id, params
+    FROM errors
+    WHERE error_hash = ?
+"""
+
+# Indexes backing the filters of query_errors; every one ends in timestamp
+# (and implicitly the rowid) so filtered pages come out already ordered
+CREATE_INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_errors_timestamp ON errors (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_errors_level_timestamp ON errors (level, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_errors_action_timestamp ON errors (action, timestamp)"
+]
+
+# Indexes backing eviction: by age (LRU) and by hit count, oldest first (LFU)
+CREATE_RETENTION_INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_errors_last_access ON errors (last_access)",
+    "CREATE INDEX IF NOT EXISTS idx_errors_hit_count_last_access ON errors (hit_count, last_access)"
+]
+
+# Rows examined per index by ANALYZE, so it stays cheap on large tables
+ANALYSIS_LIMIT = 1000
+
+# Order in which evict_excess removes rows, per eviction policy
+EVICTION_ORDERS = {
+    "lfu": "hit_count, last_access",
+    "lru": "last_access"
+}
+
+# External-content FTS5 table over errors.message, kept in sync by triggers.
+# The trigram tokenizer makes MATCH work for arbitrary substrings.
+CREATE_FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE errors_fts USING fts5(
+        message, content='errors', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS errors_fts_insert AFTER INSERT ON errors BEGIN
+        INSERT INTO errors_fts (rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS errors_fts_delete AFTER DELETE ON errors BEGIN
+        INSERT INTO errors_fts (errors_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS errors_fts_update AFTER UPDATE OF message ON errors BEGIN
+        INSERT INTO errors_fts (errors_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO errors_fts (rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    "INSERT INTO errors_fts (errors_fts) VALUES ('rebuild')"
+]
+
+# Shortest search string the trigram index can answer
+MIN_FTS_SEARCH_LENGTH = 3
+
+ERROR_COLUMNS = ("id", "error_hash", "timestamp", "message", "level", "action")
+
+# Columns holding a row's remediation: a full payload (rows written before
+# templates existed) or a template reference plus the per-error parameters
+REMEDIATION_COLUMNS = ("remediation", "template_id", "params")
 
 class SQLiteService:
-    def __init__(self, db_path="remediation.db"):
-        """Initialize SQLite database connection."""
+    def __init__(self, db_path="remediation.db", busy_timeout=5.0, cached_statements=256,
+                 codec="json+zlib", template_cache_size=1024):
+        """Initialize SQLite database connection management.
+
+        Each thread gets its own long-lived connection, opened lazily on first
+        use and kept until close() is called.
+
+        Remediations are stored normalized: the shared part of a remediation
+        is kept once in remediation_templates and each error row references it
+        with only its own parameters (see split_remediation). Payloads are
+        serialized with codec (see PayloadCodec); decoded templates are cached.
+        """
         self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.codec = PayloadCodec(codec)
+        self._load_template = lru_cache(maxsize=template_cache_size)(self._fetch_template)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        # Bumped by close() so threads drop connections from a previous generation
+        self._generation = 0
+        self.fts_enabled = False
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection configured for concurrent access."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            cached_statements=self.cached_statements,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        return conn
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it if needed."""
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            conn = self._connect()
+            with self._lock:
+                self._connections.append(conn)
+                local.conn = conn
+                local.generation = self._generation
+        return local.conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run a write transaction, taking the write lock up front.
+
+        BEGIN IMMEDIATE makes concurrent writers wait on the busy timeout
+        instead of failing mid-transaction with "database is locked".
+        """
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn.cursor()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
     def _init_db(self):
         """Initialize the database with the required tables."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create errors table with simplified schema
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS errors (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    error_hash TEXT UNIQUE,
-                    timestamp TEXT,
-                    message TEXT,
-                    level TEXT,
-                    remediation TEXT
-                )
-            """)
-            
-            conn.commit()
-            conn.close()
+            conn = self._get_connection()
+            # Lets optimize() return free pages a few at a time. It only takes
+            # effect on a new database and must come before switching to WAL;
+            # compact() converts existing databases.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL is persistent in the database file, so it only needs setting once
+            conn.execute("PRAGMA journal_mode=WAL")
+
+            # The write lock serializes schema changes between processes
+            with self._transaction() as cursor:
+                # Create errors table with simplified schema
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS errors (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        error_hash TEXT UNIQUE,
+                        timestamp TEXT,
+                        message TEXT,
+                        level TEXT,
+                        action TEXT,
+                        remediation TEXT,
+                        template_id INTEGER REFERENCES remediation_templates (id),
+                        params BLOB,
+                        hit_count INTEGER NOT NULL DEFAULT 0,
+                        last_access TEXT
+                    )
+                """)
+                # AUTOINCREMENT so ids of removed templates are never reused
+                # while readers still cache them
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS remediation_templates (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        template_hash TEXT UNIQUE,
+                        body BLOB
+                    )
+                """)
+                self._migrate(cursor)
+                for statement in CREATE_INDEXES_SQL + CREATE_RETENTION_INDEXES_SQL:
+                    cursor.execute(statement)
+            self.fts_enabled = self._init_fts()
         except Exception as e:
             logging.error(f"Failed to initialize SQLite database: {str(e)}")
             raise
 
-    def _generate_hash(self, data: dict) -> str:
-        """Generate a hash from the error message."""
-        message = data.get("message", "")
-        return hashlib.md5(message.encode()).hexdigest()
+    def _migrate(self, cursor: sqlite3.Cursor):
+        """Bring tables created by older versions up to the current schema."""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(errors)")}
+        if "action" not in columns:
+            cursor.execute("ALTER TABLE errors ADD COLUMN action TEXT")
+            cursor.execute("""
+                UPDATE errors
+                SET action = json_extract(remediation, '$.action')
+                WHERE json_valid(remediation)
+            """)
+        if "template_id" not in columns:
+            cursor.execute("ALTER TABLE errors ADD COLUMN template_id INTEGER REFERENCES remediation_templates (id)")
+            cursor.execute("ALTER TABLE errors ADD COLUMN params BLOB")
+        if "hit_count" not in columns:
+            cursor.execute("ALTER TABLE errors ADD COLUMN hit_count INTEGER NOT NULL DEFAULT 0")
+            cursor.execute("ALTER TABLE errors ADD COLUMN last_access TEXT")
+            cursor.execute("UPDATE errors SET last_access = timestamp")
+        if cursor.execute("PRAGMA user_version").fetchone()[0] < 1:
+            self._rekey_legacy_rows(cursor)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _rekey_legacy_rows(self, cursor: sqlite3.Cursor, batch_size: int = 1000):
+        """Move rows keyed by the hash of their raw message to their template's key.
+
+        Their remediations hold the message's concrete values, so they are
+        templatized on the way. A row whose template already has a row of its
+        own is dropped in favour of it.
+        """
+        last_id, rekeyed, dropped = 0, 0, 0
+        while True:
+            rows = cursor.execute("""
+                SELECT id, error_hash, message, remediation, template_id, params
+                FROM errors
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            for row_id, error_hash, message, remediation, template_id, params in rows:
+                fingerprint = fingerprint_message(message or "")
+                if error_hash == fingerprint.hash:
+                    continue
+                if cursor.execute("SELECT 1 FROM errors WHERE error_hash = ?", (fingerprint.hash,)).fetchone():
+                    cursor.execute("DELETE FROM errors WHERE id = ?", (row_id,))
+                    dropped += 1
+                    continue
+                decoded = self._decode_remediation(remediation, template_id, params)
+                template, parameters = split_remediation(templatize_remediation(decoded, fingerprint.variables))
+                cursor.execute("""
+                    UPDATE errors
+                    SET error_hash = ?, remediation = NULL, template_id = ?, params = ?
+                    WHERE id = ?
+                """, (
+                    fingerprint.hash,
+                    self._template_id(cursor, template),
+                    self.codec.encode(parameters) if parameters is not None else None,
+                    row_id
+                ))
+                rekeyed += 1
+        if rekeyed or dropped:
+            logging.info(f"Re-keyed {rekeyed} legacy error row(s) by message template, dropped {dropped} duplicate(s)")
+
+    def _init_fts(self) -> bool:
+        """Create the full-text index on messages; False if FTS5 is unavailable."""
+        try:
+            with self._transaction() as cursor:
+                exists = cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'errors_fts'"
+                ).fetchone()
+                if not exists:
+                    for statement in CREATE_FTS_SQL:
+                        cursor.execute(statement)
+            return True
+        except sqlite3.OperationalError as e:
+            logging.warning(f"Full-text search unavailable, falling back to LIKE: {str(e)}")
+            return False
+
+    def error_hash(self, data: dict) -> str:
+        """Generate a hash from the error message's template.
+
+        Variable tokens (IPs, numbers, IDs, ...) are masked first, so messages
+        that differ only in those tokens share a row.
+        """
+        return fingerprint_message(data.get("message", "")).hash
+
+    def _template_id(self, cursor: sqlite3.Cursor, template) -> int:
+        """Return the id of a stored template, storing it first if it is new."""
+        canonical = json.dumps(template, sort_keys=True, separators=(",", ":"))
+        template_hash = hashlib.md5(canonical.encode()).hexdigest()
+        cursor.execute(INSERT_TEMPLATE_SQL, (template_hash, self.codec.encode(template)))
+        return cursor.execute(SELECT_TEMPLATE_ID_SQL, (template_hash,)).fetchone()[0]
+
+    def _fetch_template(self, template_id: int) -> CompiledTemplate:
+        row = self._get_connection().execute(SELECT_TEMPLATE_SQL, (template_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"Remediation template {template_id} is missing")
+        return CompiledTemplate(self.codec.decode(row[0]))
+
+    def _decode_remediation(self, remediation, template_id, params):
+        """Rebuild a stored remediation from the columns in REMEDIATION_COLUMNS."""
+        if template_id is None:
+            return self.codec.decode(remediation) if remediation is not None else None
+        return self._load_template(template_id).fill(
+            self.codec.decode(params) if params is not None else None
+        )
+
+    def _upsert(self, cursor: sqlite3.Cursor, error_data: dict, remediation: dict, timestamp: str):
+        """Insert an error row, updating the remediation if it already exists."""
+        error_hash = self.error_hash(error_data)
+        template, params = split_remediation(remediation)
+        template_id = self._template_id(cursor, template)
+        payload = self.codec.encode(params) if params is not None else None
+        cursor.execute(UPSERT_ERROR_SQL, (
+            error_hash,
+            timestamp,
+            error_data.get("message"),
+            error_data.get("level"),
+            remediation.get("action"),
+            template_id,
+            payload
+        ))
 
     def store_error(self, error_data: dict, remediation: dict):
         """Store error and its remediation in the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        error_hash = self._generate_hash(error_data)
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        try:
-            cursor.execute("""
-                INSERT INTO errors (error_hash, timestamp, message, level, remediation)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                error_hash,
-                timestamp,
-                error_data.get("message"),
-                error_data.get("level"),
-                json.dumps(remediation)
-            ))
-            conn.commit()
-        except sqlite3.IntegrityError:
-            # If error already exists, update the remediation
-            cursor.execute("""
-                UPDATE errors 
-                SET remediation = ?, timestamp = ?
-                WHERE error_hash = ?
-            """, (json.dumps(remediation), timestamp, error_hash))
-            conn.commit()
-        finally:
-            conn.close()
+        with self._transaction() as cursor:
+            self._upsert(cursor, error_data, remediation, timestamp)
+
+    def store_errors(self, items: list):
+        """Store many (error_data, remediation) pairs in a single transaction."""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._transaction() as cursor:
+            for error_data, remediation in items:
+                self._upsert(cursor, error_data, remediation, timestamp)
 
     def get_remediation(self, error_data: dict) -> dict:
         """Retrieve remediation for a given error."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        error_hash = self._generate_hash(error_data)
-        
-        cursor.execute("""
-            SELECT remediation 
-            FROM errors 
-            WHERE error_hash = ?
-        """, (error_hash,))
-        
-        result = cursor.fetchone()
-        conn.close()
-        
+        error_hash = self.error_hash(error_data)
+        result = self._get_connection().execute(SELECT_REMEDIATION_SQL, (error_hash,)).fetchone()
+
+        if result:
+            return self._decode_remediation(*result)
+        return None
+
+    def get_remediations(self, error_data_list: list) -> list:
+        """Retrieve remediations for many errors with one IN (...) query per chunk.
+
+        Results are returned in input order, with None for errors that have
+        no stored remediation.
+        """
+        hashes = [self.error_hash(error_data) for error_data in error_data_list]
+        unique_hashes = list(dict.fromkeys(hashes))
+        found = {}
+
+        conn = self._get_connection()
+        for start in range(0, len(unique_hashes), MAX_SQL_VARIABLES):
+            chunk = unique_hashes[start:start + MAX_SQL_VARIABLES]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"""
+                SELECT error_hash, remediation, template_id, params
+                FROM errors
+                WHERE error_hash IN ({placeholders})
+            """, chunk)
+            for error_hash, remediation, template_id, params in rows:
+                found[error_hash] = self._decode_remediation(remediation, template_id, params)
+
+        return [found.get(error_hash) for error_hash in hashes]
+
+    def get_remediation_by_hash(self, error_hash: str):
+        """Retrieve (message, remediation) for an error hash, or None."""
+        result = self._get_connection().execute(SELECT_BY_HASH_SQL, (error_hash,)).fetchone()
         if result:
-            return json.loads(result[0])
+            return result[0], self._decode_remediation(*result[1:])
         return None
 
+    def iter_messages(self, batch_size: int = 1000):
+        """Yield (error_hash, message) for every stored error without loading them all."""
+        cursor = self._get_connection().execute("SELECT error_hash, message FROM errors")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def _filter_clauses(self, filters: dict):
+        """Translate query filters into WHERE clauses and parameters."""
+        clauses, params = [], []
+        if filters.get("level"):
+            clauses.append("level = ?")
+            params.append(filters["level"])
+        if filters.get("action"):
+            clauses.append("action = ?")
+            params.append(filters["action"])
+        if filters.get("since"):
+            clauses.append("timestamp >= ?")
+            params.append(normalize_timestamp(filters["since"]))
+        if filters.get("until"):
+            clauses.append("timestamp < ?")
+            params.append(normalize_timestamp(filters["until"]))
+        search = filters.get("search")
+        if search:
+            if self.fts_enabled and len(search) >= MIN_FTS_SEARCH_LENGTH:
+                clauses.append("id IN (SELECT rowid FROM errors_fts WHERE errors_fts MATCH ?)")
+                params.append('"' + search.replace('"', '""') + '"')
+            else:
+                clauses.append("message LIKE ? ESCAPE '\\'")
+                params.append("%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        return clauses, params
+
+    def _fetch_page(self, filters: dict, limit: int, after) -> list:
+        """Fetch up to limit rows older than the (timestamp, id) position after."""
+        clauses, params = self._filter_clauses(filters)
+        if after is not None:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._get_connection().execute(f"""
+            SELECT {', '.join(ERROR_COLUMNS + REMEDIATION_COLUMNS)}
+            FROM errors
+            {where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        """, (*params, limit)).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def _row_to_dict(self, row: tuple) -> dict:
+        """Build a result record, rendering the stored template with the row's own message."""
+        record = dict(zip(ERROR_COLUMNS, row))
+        remediation = self._decode_remediation(*row[len(ERROR_COLUMNS):])
+        if remediation is not None:
+            remediation = render_remediation(remediation, fingerprint_message(record["message"] or "").variables)
+        record["remediation"] = remediation
+        return record
+
+    def query_errors(self, filters: dict = None, limit: int = 100, cursor: str = None):
+        """Return (rows, next_cursor) for one page of stored errors, newest first.
+
+        filters may hold level, action, since, until (timestamps, inclusive
+        and exclusive) and search (message substring). Pagination is keyset
+        based: pass the returned next_cursor to get the following page; it is
+        None on the last page.
+        """
+        filters = filters or {}
+        after = decode_cursor(cursor) if cursor else None
+        rows = self._fetch_page(filters, limit + 1, after)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+
+    def iter_errors(self, filters: dict = None, batch_size: int = 1000):
+        """Yield every stored error matching filters, newest first, one page at a time.
+
+        Each page is a separate short query, so streaming a large table never
+        holds a read transaction open or keeps more than one page in memory.
+        """
+        filters = filters or {}
+        after = None
+        while True:
+            rows = self._fetch_page(filters, batch_size, after)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]["timestamp"], rows[-1]["id"])
+
+    def compact(self, batch_size: int = 1000) -> int:
+        """Convert rows stored as full remediation payloads to template references.
+
+        Runs in batches of batch_size rows per transaction, then vacuums the
+        database to return the freed pages. Returns the number of rows converted.
+        """
+        converted = 0
+        while True:
+            with self._transaction() as cursor:
+                rows = cursor.execute("""
+                    SELECT id, remediation
+                    FROM errors
+                    WHERE template_id IS NULL AND remediation IS NOT NULL
+                    LIMIT ?
+                """, (batch_size,)).fetchall()
+                for row_id, remediation in rows:
+                    template, params = split_remediation(self.codec.decode(remediation))
+                    cursor.execute("""
+                        UPDATE errors
+                        SET remediation = NULL, template_id = ?, params = ?
+                        WHERE id = ?
+                    """, (
+                        self._template_id(cursor, template),
+                        self.codec.encode(params) if params is not None else None,
+                        row_id
+                    ))
+            converted += len(rows)
+            if len(rows) < batch_size:
+                break
+        conn = self._get_connection()
+        # Also switches databases created before incremental vacuum over to it
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return converted
+
+    def record_access(self, counts: dict):
+        """Add {error_hash: hits} to the rows' hit counts and mark them accessed now.
+
+        Meant to be called with hits accumulated over a while (see
+        RetentionManager), so reads never write.
+        """
+        if not counts:
+            return
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._transaction() as cursor:
+            cursor.executemany(RECORD_ACCESS_SQL, [
+                (count, timestamp, error_hash) for error_hash, count in counts.items()
+            ])
+
+    def decay_hits(self, batch_size: int = 500) -> int:
+        """Halve every error's hit count, batch_size rows per transaction; returns how many changed.
+
+        Run periodically so LFU eviction weighs recent hits over old ones.
+        """
+        decayed = 0
+        last_id = 0
+        while True:
+            with self._transaction() as cursor:
+                rows = cursor.execute(SELECT_HIT_IDS_SQL, (last_id, batch_size)).fetchall()
+                cursor.executemany("UPDATE errors SET hit_count = hit_count / 2 WHERE id = ?", rows)
+            decayed += len(rows)
+            if len(rows) < batch_size:
+                return decayed
+            last_id = rows[-1][0]
+
+    def _evict(self, select_sql: str, params: tuple, batch_size: int, max_rows: int = None) -> list:
+        """Delete the rows select_sql picks, batch_size per transaction; returns their hashes.
+
+        With max_rows, each batch only removes the rows in excess of it, counted
+        inside the transaction so concurrent workers never overshoot.
+        """
+        evicted = []
+        while True:
+            with self._transaction() as cursor:
+                limit = batch_size
+                if max_rows is not None:
+                    excess = cursor.execute("SELECT COUNT(*) FROM errors").fetchone()[0] - max_rows
+                    limit = min(limit, excess)
+                rows = cursor.execute(f"{select_sql} LIMIT ?", (*params, limit)).fetchall() if limit > 0 else []
+                cursor.executemany("DELETE FROM errors WHERE id = ?", [(row_id,) for row_id, _ in rows])
+            evicted.extend(error_hash for _, error_hash in rows)
+            if not rows or len(rows) < limit or (max_rows is not None and limit < batch_size):
+                return evicted
+
+    def evict_older_than(self, max_age: float, batch_size: int = 500) -> list:
+        """Delete errors neither stored nor read in the last max_age seconds; returns their hashes."""
+        cutoff = (datetime.now() - timedelta(seconds=max_age)).strftime("%Y-%m-%d %H:%M:%S")
+        return self._evict(
+            "SELECT id, error_hash FROM errors WHERE last_access < ? ORDER BY last_access",
+            (cutoff,), batch_size
+        )
+
+    def evict_excess(self, max_rows: int, policy: str = "lfu", batch_size: int = 500) -> list:
+        """Delete errors beyond max_rows, least valuable first; returns their hashes.
+
+        policy "lfu" removes the fewest hits first, oldest access breaking
+        ties (new rows start with one hit; see decay_hits); "lru" removes
+        the oldest access first.
+        """
+        if policy not in EVICTION_ORDERS:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        return self._evict(
+            f"SELECT id, error_hash FROM errors ORDER BY {EVICTION_ORDERS[policy]}",
+            (), batch_size, max_rows
+        )
+
+    def remove_unused_templates(self) -> int:
+        """Delete remediation templates no error references; returns how many."""
+        with self._transaction() as cursor:
+            cursor.execute("""
+                DELETE FROM remediation_templates
+                WHERE id NOT IN (SELECT template_id FROM errors WHERE template_id IS NOT NULL)
+            """)
+            return cursor.rowcount
+
+    def optimize(self, vacuum_pages: int = 1000, analyze: bool = False) -> int:
+        """Release up to vacuum_pages free pages and, if asked, refresh planner statistics.
+
+        Returns the number of pages released. Databases not yet converted by
+        compact() release nothing.
+        """
+        conn = self._get_connection()
+        released = 0
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free_pages:
+                # executescript steps the pragma to completion; execute()
+                # would release a single page
+                conn.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+                released = free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if analyze:
+            conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+        return released
+
+    def storage_stats(self) -> dict:
+        """Row counts and file size figures for the database."""
+        conn = self._get_connection()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        return {
+            "rows": conn.execute("SELECT COUNT(*) FROM errors").fetchone()[0],
+            "templates": conn.execute("SELECT COUNT(*) FROM remediation_templates").fetchone()[0],
+            "size_bytes": page_size * page_count,
+            "free_bytes": page_size * conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "incremental_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        }
+
+    def close(self):
+        """Close every connection opened by this service.
+
+        The service stays usable: threads reconnect lazily on their next call.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logging.warning(f"Failed to close SQLite connection: {str(e)}")
+
     def __del__(self):
-        """Close database connection when object is destroyed."""
-        if hasattr(self, 'conn'):
-            self.conn.close() 
\ No newline at end of file
+        """Close database connections when object is destroyed."""
+        if hasattr(self, "_connections"):
+            self.close()
+
+
+def normalize_timestamp(value: str) -> str:
+    """Convert an ISO date or datetime into the stored "YYYY-MM-DD HH:MM:SS" form."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    """Opaque pagination cursor for the position after (timestamp, id)."""
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors."""
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = decoded.rsplit("|", 1)
+        return timestamp, int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
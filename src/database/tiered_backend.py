@@ -0,0 +1,275 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.firestore_service import MAX_BATCH_WRITES
+
+
+class TieredBackend:
+    """A local backend (SQLiteService) used as a cache in front of a shared one (FirestoreService).
+
+    Reads are read-through: an entry fetched or written within the last ttl
+    seconds is served locally, anything else is read from the remote backend
+    in one batched call and copied into the local one. When the remote
+    backend cannot be reached, whatever the local backend holds is served.
+
+    Writes are write-behind: they land in the local backend immediately and
+    are queued for the remote one, which a background thread flushes every
+    flush_interval seconds (sooner once MAX_BATCH_WRITES are queued). Only
+    the latest write per error is sent, and failed flushes are retried on the
+    next round. Local entries the remote backend lacks are queued as well,
+    so a node's existing database is shared on first use.
+
+    query_errors, iter_errors and compact operate on the local backend, and
+    so only see errors this node has stored or looked up. iter_messages
+    reads the remote backend, so the similarity index covers every node.
+    The retention methods (record_access, evict_*, optimize) also apply to
+    the local backend only: evicted entries are reread from the remote
+    backend when next requested.
+    """
+
+    def __init__(self, local, remote, ttl: float = 300.0, flush_interval: float = 1.0, clock=time.monotonic):
+        self.local = local
+        self.remote = remote
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._clock = clock
+        # error_hash -> time until which the local copy is served, soonest first
+        self._fresh_until: "OrderedDict[str, float]" = OrderedDict()
+        # error_hash -> (error_log, remediation) waiting for the remote backend
+        self._pending: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self._flushing: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._flusher = None
+        self.local_hits = 0
+        self.remote_reads = 0
+        self.refreshes = 0
+        self.stale_served = 0
+        self.flushed = 0
+        self.flush_failures = 0
+
+    def error_hash(self, error_log: Dict[str, Any]) -> str:
+        return self.local.error_hash(error_log)
+
+    def _mark_fresh(self, error_hash: str, fresh_until: float):
+        self._fresh_until[error_hash] = fresh_until
+        self._fresh_until.move_to_end(error_hash)
+
+    def _prune_fresh(self, now: float):
+        """Drop expired freshness marks; they are kept in expiry order, so only the front is checked."""
+        fresh_until = self._fresh_until
+        while fresh_until:
+            error_hash, until = next(iter(fresh_until.items()))
+            if until > now:
+                return
+            del fresh_until[error_hash]
+
+    def _is_local(self, error_hash: str, now: float) -> bool:
+        """Whether the local copy can be served without asking the remote backend."""
+        return (
+            self._fresh_until.get(error_hash, 0.0) > now
+            or error_hash in self._pending
+            or error_hash in self._flushing
+        )
+
+    def _enqueue(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        now = self._clock()
+        fresh_until = now + self.ttl
+        with self._lock:
+            self._prune_fresh(now)
+            for error_log, remediation in items:
+                error_hash = self.error_hash(error_log)
+                self._pending[error_hash] = (error_log, remediation)
+                self._mark_fresh(error_hash, fresh_until)
+            backlog = len(self._pending)
+            if self._flusher is None:
+                self._stopping = False
+                self._flusher = threading.Thread(target=self._flush_loop, name="tiered-flush", daemon=True)
+                self._flusher.start()
+        if backlog >= MAX_BATCH_WRITES:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Send queued writes to the remote backend now; returns how many were sent."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+            items = self._flushing
+            try:
+                self.remote.store_errors(list(items.values()))
+            except Exception as e:
+                with self._lock:
+                    # Keep newer writes queued meanwhile; retry the rest next round
+                    for error_hash, item in items.items():
+                        self._pending.setdefault(error_hash, item)
+                    self._flushing = {}
+                self.flush_failures += 1
+                logging.error(f"Failed to flush {len(items)} write(s) to the remote backend: {str(e)}")
+                return 0
+            with self._lock:
+                self._flushing = {}
+            self.flushed += len(items)
+            return len(items)
+
+    def store_error(self, error_log: Dict[str, Any], remediation: Dict[str, Any]):
+        self.store_errors([(error_log, remediation)])
+
+    def store_errors(self, items: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Store locally now and queue the items for the remote backend."""
+        self.local.store_errors(items)
+        self._enqueue(items)
+
+    def get_remediation(self, error_log: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.get_remediations([error_log])[0]
+
+    def get_remediations(self, error_logs: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Serve fresh entries locally and refresh the rest with one remote read."""
+        hashes = [self.error_hash(error_log) for error_log in error_logs]
+        results = self.local.get_remediations(error_logs)
+        now = self._clock()
+        with self._lock:
+            self._prune_fresh(now)
+            stale = [i for i, error_hash in enumerate(hashes) if not self._is_local(error_hash, now)]
+        self.local_hits += len(hashes) - len(stale)
+        if not stale:
+            return results
+
+        try:
+            remote = self.remote.get_documents_by_hash([hashes[i] for i in stale])
+        except Exception as e:
+            self.stale_served += sum(1 for i in stale if results[i] is not None)
+            logging.warning(f"Remote backend unavailable, serving local copies: {str(e)}")
+            return results
+        self.remote_reads += len(stale)
+
+        refreshed, unshared = {}, {}
+        for i in stale:
+            error_hash = hashes[i]
+            if error_hash in remote:
+                remediation = remote[error_hash][1]
+                if remediation != results[i]:
+                    refreshed[error_hash] = (error_logs[i], remediation)
+                results[i] = remediation
+            elif results[i] is not None:
+                unshared[error_hash] = (error_logs[i], results[i])
+
+        fresh_until = self._clock() + self.ttl
+        with self._lock:
+            # A write that arrived during the remote read is newer; keep it
+            refreshed = [item for error_hash, item in refreshed.items() if error_hash not in self._pending]
+            for i in stale:
+                if hashes[i] in remote:
+                    self._mark_fresh(hashes[i], fresh_until)
+        if refreshed:
+            self.local.store_errors(refreshed)
+            self.refreshes += len(refreshed)
+        if unshared:
+            self._enqueue(list(unshared.values()))
+        return results
+
+    def get_remediation_by_hash(self, error_hash: str):
+        """Return (message, remediation) for a hash, reading through to the remote backend."""
+        stored = self.local.get_remediation_by_hash(error_hash)
+        with self._lock:
+            now = self._clock()
+            self._prune_fresh(now)
+            if stored is not None and self._is_local(error_hash, now):
+                self.local_hits += 1
+                return stored
+        try:
+            remote = self.remote.get_documents_by_hash([error_hash]).get(error_hash)
+        except Exception as e:
+            if stored is not None:
+                self.stale_served += 1
+            logging.warning(f"Remote backend unavailable, serving local copy: {str(e)}")
+            return stored
+        self.remote_reads += 1
+        if remote is None:
+            return stored
+        error_log, remediation = remote
+        with self._lock:
+            self._mark_fresh(error_hash, self._clock() + self.ttl)
+            pending = error_hash in self._pending
+        if not pending and (stored is None or stored[1] != remediation):
+            self.local.store_errors([(error_log, remediation)])
+            self.refreshes += 1
+        return error_log.get("message", ""), remediation
+
+    def iter_messages(self):
+        """Yield (error_hash, message) for every error stored by any node."""
+        return self.remote.iter_messages()
+
+    def query_errors(self, filters: Dict[str, Any] = None, limit: int = 100, cursor: Optional[str] = None):
+        return self.local.query_errors(filters, limit, cursor)
+
+    def iter_errors(self, filters: Dict[str, Any] = None, batch_size: int = 1000):
+        return self.local.iter_errors(filters, batch_size)
+
+    def compact(self, batch_size: int = 1000) -> int:
+        return self.local.compact(batch_size)
+
+    def record_access(self, counts: Dict[str, int]):
+        self.local.record_access(counts)
+
+    def decay_hits(self, batch_size: int = 500) -> int:
+        return self.local.decay_hits(batch_size)
+
+    def _forget(self, evicted: List[str]) -> List[str]:
+        with self._lock:
+            for error_hash in evicted:
+                self._fresh_until.pop(error_hash, None)
+        return evicted
+
+    def evict_older_than(self, max_age: float, batch_size: int = 500) -> List[str]:
+        return self._forget(self.local.evict_older_than(max_age, batch_size))
+
+    def evict_excess(self, max_rows: int, policy: str = "lfu", batch_size: int = 500) -> List[str]:
+        return self._forget(self.local.evict_excess(max_rows, policy, batch_size))
+
+    def remove_unused_templates(self) -> int:
+        return self.local.remove_unused_templates()
+
+    def optimize(self, vacuum_pages: int = 1000, analyze: bool = False) -> int:
+        return self.local.optimize(vacuum_pages, analyze)
+
+    def storage_stats(self) -> Dict[str, Any]:
+        return self.local.storage_stats()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "local_hits": self.local_hits,
+            "remote_reads": self.remote_reads,
+            "refreshes": self.refreshes,
+            "stale_served": self.stale_served,
+            "pending_writes": len(self._pending),
+            "flushed": self.flushed,
+            "flush_failures": self.flush_failures
+        }
+
+    def close(self):
+        """Flush queued writes, then close both backends.
+
+        The backend stays usable: the next store restarts the flusher.
+        """
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+            self._stopping = True
+        if flusher is not None:
+            self._wake.set()
+            flusher.join()
+        self.flush()
+        self.local.close()
+        self.remote.close()
@@ -0,0 +1,282 @@
+"""
+Offline remediation of raw application log files.
+
+Usage:
+    PYTHONPATH=src python -m processor.ingest app.log [app2.log.gz ...] --db remediation.db
+
+Files are streamed line by line (gzip supported) with bounded memory: lines
+are parsed into the ErrorLog shape, run through LogProcessor.process_log,
+deduplicated by message fingerprint, generated on a worker pool and written
+to SQLite in batches. Progress is checkpointed after every batch so an
+interrupted run resumes where it stopped.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from agent.rule_engine import RuleEngine, DEFAULT_RULES_PATH
+from database.remediation_cache import RemediationCache
+from database.sqlite_service import SQLiteService
+from processor.log_processor import LogProcessor, templatize_remediation
+
+logger = logging.getLogger(__name__)
+
+LOG_LINE_REGEX = re.compile(
+    r"^(?P<timestamp>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?)\s+"
+    r"\[?(?P<level>DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL|FATAL)\]?:?\s+(?P<message>.*)$"
+)
+
+LEVEL_ORDER = {"DEBUG": 10, "INFO": 20, "WARN": 30, "WARNING": 30, "ERROR": 40, "CRITICAL": 50, "FATAL": 50}
+
+# Rule engine of the current worker process, built by _init_worker
+_worker_engine = None
+
+
+def open_log(path: str):
+    """Open a log file for binary reading, decompressing .gz files on the fly."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def read_lines(f, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset after the line, line) pairs starting at offset."""
+    if offset:
+        f.seek(offset)
+    for line in f:
+        offset += len(line)
+        yield offset, line
+
+
+def parse_line(line: str, source: Dict[str, str], line_id: str) -> Optional[Dict[str, Any]]:
+    """Turn a raw "<timestamp> <LEVEL>: <message>" line into an ErrorLog-shaped event."""
+    match = LOG_LINE_REGEX.match(line)
+    if match is None:
+        return None
+    level = match.group("level")
+    return {
+        "eventId": line_id,
+        "eventTimestamp": datetime.now(timezone.utc).isoformat(),
+        "sourceAgent": {"name": "LogIngestor", "version": "1.0.0"},
+        "logEntry": {
+            "originalLine": line,
+            "timestamp": match.group("timestamp"),
+            "level": "WARNING" if level == "WARN" else "CRITICAL" if level == "FATAL" else level,
+            "message": match.group("message").strip()
+        },
+        "anomalyDetectionResults": {
+            "reason": "Log level at or above ingestion threshold",
+            "score": 0.0,
+            "notes": "Ingested from log file",
+            "matchedPatterns": []
+        },
+        "contextualMetadata": source
+    }
+
+
+def parse_events(lines: Iterable[Tuple[int, bytes]], source: Dict[str, str], name: str,
+                 min_level: str = "WARNING") -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """Yield (offset, event or None) for every line; None marks skipped lines."""
+    threshold = LEVEL_ORDER[min_level]
+    for offset, raw_line in lines:
+        line = raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+        event = parse_line(line, source, f"{name}@{offset}")
+        if event is not None and LEVEL_ORDER.get(event["logEntry"]["level"], 0) < threshold:
+            event = None
+        yield offset, event
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of up to size items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _init_worker(rules_path: str):
+    global _worker_engine
+    _worker_engine = RuleEngine(rules_path, reload_interval=None)
+
+
+def _generate(processed_log: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate the remediation for a processed log in a worker."""
+    return _worker_engine.evaluate(
+        message=processed_log["log_details"]["message"],
+        level=processed_log["log_details"]["level"],
+        app_name=processed_log["context"]["application"],
+        host=processed_log["context"]["host"]
+    )
+
+
+class Checkpoint:
+    """Byte offset reached in a log file, persisted next to it."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> int:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)["offset"]
+        except FileNotFoundError:
+            return 0
+
+    def save(self, offset: int):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"offset": offset, "updated": datetime.now(timezone.utc).isoformat()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class LogIngestor:
+    """Streams log files into the remediation database.
+
+    The fingerprints of the last seen_size distinct errors are remembered so
+    repeats skip the database lookup; older ones are looked up again.
+    """
+
+    def __init__(self, db: SQLiteService, rules_path: str = DEFAULT_RULES_PATH, workers: int = None,
+                 batch_size: int = 5000, use_threads: bool = False, min_level: str = "WARNING",
+                 source: Dict[str, str] = None, report_interval: float = 5.0, seen_size: int = 100000):
+        self.db = db
+        self.rules_path = rules_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.use_threads = use_threads
+        self.min_level = min_level
+        self.source = source or {"applicationName": "unknown", "environment": "unknown", "affectedHost": "unknown"}
+        self.report_interval = report_interval
+        self.processor = LogProcessor()
+        self.seen = RemediationCache(max_entries=seen_size, ttl=float("inf"))
+        self.lines = 0
+        self.events = 0
+        self.distinct = 0
+        self.generated = 0
+        self.started = None
+
+    def _report(self, final: bool = False):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        logger.info(
+            f"{'Finished' if final else 'Progress'}: {self.lines} lines ({self.lines / elapsed:,.0f} lines/s), "
+            f"{self.events} events, {self.distinct} distinct errors, {self.generated} generated"
+        )
+
+    def _process_batch(self, executor, batch: List[Tuple[int, Optional[Dict[str, Any]]]]):
+        """Dedupe a batch of events, generate the unseen ones and store them."""
+        pending = {}
+        for _, event in batch:
+            if event is None:
+                continue
+            self.events += 1
+            processed = self.processor.process_log(event)
+            error_hash = processed["fingerprint"]["hash"]
+            if error_hash not in pending and self.seen.get(error_hash) is None:
+                pending[error_hash] = processed
+        if not pending:
+            return
+
+        # Errors already in the database (e.g. from an earlier run) are not regenerated
+        essential_data = [
+            {"message": processed["log_details"]["message"], "level": processed["log_details"]["level"]}
+            for processed in pending.values()
+        ]
+        existing = self.db.get_remediations(essential_data)
+        missing = [
+            (data, processed)
+            for data, processed, stored in zip(essential_data, pending.values(), existing)
+            if stored is None
+        ]
+        remediations = executor.map(_generate, [processed for _, processed in missing], chunksize=64)
+        self.db.store_errors([
+            (data, templatize_remediation(remediation, tuple(map(tuple, processed["fingerprint"]["variables"]))))
+            for (data, processed), remediation in zip(missing, remediations)
+        ])
+        self.generated += len(missing)
+        self.distinct += len(pending)
+        for error_hash in pending:
+            self.seen.put(error_hash, True)
+
+    def ingest(self, path: str, resume: bool = True):
+        """Ingest one log file, resuming from its checkpoint when present."""
+        checkpoint = Checkpoint(path + ".checkpoint")
+        offset = checkpoint.load() if resume else 0
+        if offset:
+            logger.info(f"Resuming {path} from byte offset {offset}")
+
+        if self.use_threads:
+            executor = ThreadPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.rules_path,))
+        else:
+            executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.rules_path,))
+
+        self.started = self.started or time.monotonic()
+        next_report = time.monotonic() + self.report_interval
+        with executor, open_log(path) as f:
+            events = parse_events(read_lines(f, offset), self.source, os.path.basename(path), self.min_level)
+            for batch in batched(events, self.batch_size):
+                self._process_batch(executor, batch)
+                self.lines += len(batch)
+                checkpoint.save(batch[-1][0])
+                if time.monotonic() >= next_report:
+                    self._report()
+                    next_report = time.monotonic() + self.report_interval
+
+        checkpoint.clear()
+        self._report(final=True)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Generate remediations for errors in raw log files.")
+    parser.add_argument("paths", nargs="+", help="Log files to ingest (.gz supported)")
+    parser.add_argument("--db", default="remediation.db", help="SQLite database path")
+    parser.add_argument("--rules", default=DEFAULT_RULES_PATH, help="Remediation rule file")
+    parser.add_argument("--workers", type=int, default=None, help="Generation workers (default: CPU count)")
+    parser.add_argument("--threads", action="store_true", help="Use threads instead of processes for generation")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Lines per processing and write batch")
+    parser.add_argument("--seen-size", type=int, default=100000, help="Distinct errors remembered between batches")
+    parser.add_argument("--min-level", default="WARNING", choices=sorted(LEVEL_ORDER), help="Lowest level to remediate")
+    parser.add_argument("--application", default="unknown", help="applicationName for ingested events")
+    parser.add_argument("--environment", default="unknown", help="environment for ingested events")
+    parser.add_argument("--host", default="unknown", help="affectedHost for ingested events")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore existing checkpoints")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db = SQLiteService(args.db)
+    ingestor = LogIngestor(
+        db,
+        rules_path=args.rules,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        use_threads=args.threads,
+        min_level=args.min_level,
+        seen_size=args.seen_size,
+        source={"applicationName": args.application, "environment": args.environment, "affectedHost": args.host}
+    )
+    try:
+        for path in args.paths:
+            ingestor.ingest(path, resume=not args.no_resume)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; rerun the same command to resume from the last checkpoint")
+        sys.exit(130)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
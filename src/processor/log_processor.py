@@ -1,5 +1,157 @@
-from typing import Dict, Any
+from typing import Dict, Any, NamedTuple, Optional, Set, Tuple
 from datetime import datetime
+from functools import lru_cache
+import hashlib
+import re
+
+# Variable token patterns, tried in order at each position. Earlier entries win
+# when several could match, e.g. a timestamp before its individual numbers.
+VARIABLE_PATTERNS = [
+    ("ts", r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"),
+    ("uuid", r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"),
+    ("ip", r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d{1,5})?\b"),
+    ("path", r"(?<![\w/])(?:/[\w.@~+-]+)+/?|\b[A-Za-z]:\\(?:[\w.@~+-]+\\?)+"),
+    ("hex", r"\b0x[0-9a-fA-F]+\b|\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\b"),
+    ("num", r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?![\w.]*\w)")
+]
+
+VARIABLE_REGEX = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in VARIABLE_PATTERNS))
+
+# Short numbers ("1", "60") collide with step numbers and other literals in
+# remediation text, so only longer numeric values are substituted back.
+MIN_NUMERIC_SUBSTITUTION_LENGTH = 3
+
+PLACEHOLDER_REGEX = re.compile(r"\{\{(\w+)\}\}")
+
+# {{p.name}} marks where a value of the remediation's "parameters" object was
+# lifted out of its text; see split_remediation
+PARAMETER_PLACEHOLDER_REGEX = re.compile(r"\{\{p\.(\w+)\}\}")
+MIN_PARAMETER_SUBSTITUTION_LENGTH = 3
+
+
+class MessageFingerprint(NamedTuple):
+    """A log message reduced to its template and the variables masked out of it."""
+    template: str
+    hash: str
+    variables: Tuple[Tuple[str, str], ...]
+
+
+@lru_cache(maxsize=8192)
+def fingerprint_message(message: str) -> MessageFingerprint:
+    """Mask variable tokens (IPs, numbers, UUIDs, hex IDs, paths, timestamps).
+
+    "Security breach detected from 172.16.0.10" becomes the template
+    "Security breach detected from <IP>" with variables (("ip_0", "172.16.0.10"),),
+    so every message of the same shape shares one hash and one stored remediation.
+    """
+    variables = []
+    counts = {}
+
+    def mask(match):
+        kind = match.lastgroup
+        index = counts.get(kind, 0)
+        counts[kind] = index + 1
+        variables.append((f"{kind}_{index}", match.group()))
+        return f"<{kind.upper()}>"
+
+    template = VARIABLE_REGEX.sub(mask, message or "")
+    return MessageFingerprint(
+        template=template,
+        hash=hashlib.md5(template.encode()).hexdigest(),
+        variables=tuple(variables)
+    )
+
+
+def _substitutable(name: str, value: str) -> bool:
+    """Whether a variable value is distinctive enough to replace inside remediation text."""
+    return not name.startswith("num_") or len(value) >= MIN_NUMERIC_SUBSTITUTION_LENGTH
+
+
+def templatize_remediation(remediation: Any, variables: Tuple[Tuple[str, str], ...]) -> Any:
+    """Replace message variable values in a remediation with {{name}} placeholders."""
+    replacements = sorted(
+        ((name, value) for name, value in variables if _substitutable(name, value)),
+        key=lambda item: len(item[1]),
+        reverse=True
+    )
+    if not replacements:
+        return remediation
+    pattern = re.compile("|".join(
+        rf"(?<![\w.])(?P<{name}>{re.escape(value)})(?!\w|\.\w)" for name, value in replacements
+    ))
+    return _map_strings(remediation, lambda text: pattern.sub(lambda m: "{{" + m.lastgroup + "}}", text))
+
+
+def render_remediation(template: Any, variables: Tuple[Tuple[str, str], ...]) -> Any:
+    """Fill {{name}} placeholders in a stored remediation with a message's variables.
+
+    Placeholders without a matching variable are left untouched.
+    """
+    values = dict(variables)
+    return _map_strings(template, lambda text: PLACEHOLDER_REGEX.sub(
+        lambda m: values.get(m.group(1), m.group()), text
+    ) if "{{" in text else text)
+
+
+def remediation_placeholders(template: Any) -> Set[str]:
+    """Names of the {{name}} placeholders in a stored remediation."""
+    names = set()
+    _map_strings(template, lambda text: names.update(PLACEHOLDER_REGEX.findall(text)) or text)
+    return names
+
+
+def split_remediation(remediation: Any) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """Split a remediation into a shareable template and its per-error parameters.
+
+    The parameters are the remediation's own "parameters" object. Their
+    string values are replaced by {{p.name}} placeholders wherever they occur
+    in the rest of the remediation, so remediations that differ only in
+    service names, IPs and the like share one template. join_remediation
+    reverses this exactly.
+    """
+    if not isinstance(remediation, dict) or not isinstance(remediation.get("parameters"), dict):
+        return remediation, None
+    parameters = remediation["parameters"]
+    template = dict(remediation, parameters=None)
+    replacements = sorted(
+        (
+            (name, value) for name, value in parameters.items()
+            if isinstance(value, str) and len(value) >= MIN_PARAMETER_SUBSTITUTION_LENGTH
+            and name.isidentifier()
+        ),
+        key=lambda item: len(item[1]),
+        reverse=True
+    )
+    if replacements:
+        pattern = re.compile("|".join(
+            rf"(?<!\w)(?P<{name}>{re.escape(value)})(?!\w)" for name, value in replacements
+        ))
+        template = _map_strings(template, lambda text: pattern.sub(lambda m: "{{p." + m.lastgroup + "}}", text))
+    return template, parameters
+
+
+def join_remediation(template: Any, parameters: Optional[Dict[str, Any]]) -> Any:
+    """Rebuild a remediation from split_remediation's template and parameters."""
+    if parameters is None:
+        return template
+    values = {name: value for name, value in parameters.items() if isinstance(value, str)}
+    remediation = _map_strings(template, lambda text: PARAMETER_PLACEHOLDER_REGEX.sub(
+        lambda m: values.get(m.group(1), m.group()), text
+    ) if "{{p." in text else text)
+    remediation["parameters"] = parameters
+    return remediation
+
+
+def _map_strings(value: Any, func) -> Any:
+    """Apply func to every string inside a JSON-like structure."""
+    if isinstance(value, str):
+        return func(value)
+    if isinstance(value, dict):
+        return {key: _map_strings(item, func) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_map_strings(item, func) for item in value]
+    return value
+
 
 class LogProcessor:
     def __init__(self):
@@ -33,7 +185,8 @@ class LogProcessor:
                     "timestamp": error_log["logEntry"]["timestamp"],
                     "level": error_log["logEntry"]["level"],
                     "message": error_log["logEntry"].get("message", "")
-                }
+                },
+                "fingerprint": fingerprint_message(error_log["logEntry"].get("message", ""))._asdict()
             }
             return processed_log
         except Exception as e:
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+# The service is run with PYTHONPATH=src; make the same imports work under pytest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from database.fake_firestore import FakeFirestoreClient  # noqa: E402
+from database.firestore_service import FirestoreService  # noqa: E402
+from database.sqlite_service import SQLiteService  # noqa: E402
+from database.tiered_backend import TieredBackend  # noqa: E402
+
+BACKENDS = ("sqlite", "firestore", "tiered")
+
+
+def make_backend(name: str, path: str):
+    if name == "sqlite":
+        return SQLiteService(os.path.join(path, "remediation.db"))
+    if name == "firestore":
+        return FirestoreService(client=FakeFirestoreClient())
+    if name == "tiered":
+        return TieredBackend(SQLiteService(os.path.join(path, "local.db")), FirestoreService(client=FakeFirestoreClient()))
+    raise ValueError(f"Unknown backend: {name}")
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path):
+    """Every storage backend, each on fresh storage."""
+    backend = make_backend(request.param, str(tmp_path))
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    backend = SQLiteService(str(tmp_path / "remediation.db"))
+    yield backend
+    backend.close()
+
+
+def error_event(message: str, level: str = "ERROR", application: str = "checkout", host: str = "web-01") -> dict:
+    """A /remediate request body."""
+    return {
+        "eventId": "evt-1",
+        "eventTimestamp": "2024-01-01T00:00:00+00:00",
+        "sourceAgent": {"name": "test", "version": "1"},
+        "logEntry": {"level": level, "message": message},
+        "anomalyDetectionResults": {},
+        "contextualMetadata": {"applicationName": application, "environment": "test", "affectedHost": host}
+    }
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """The api.app module, serving from a fresh SQLite database."""
+    monkeypatch.setenv("REMEDIATION_DB_PATH", str(tmp_path / "remediation.db"))
+    from api import app as app_module
+
+    # Module-level state outlives a single app lifespan
+    if app_module.cache is not None:
+        app_module.cache.clear()
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_module.app) as client:
+        yield client
@@ -0,0 +1,148 @@
+import asyncio
+import os
+
+from conftest import make_backend
+from database.async_storage import AsyncStorage
+from database.backend import StorageBackend
+from database.fake_firestore import FakeFirestoreClient
+from database.firestore_service import FirestoreService
+from database.sqlite_service import SQLiteService
+from database.tiered_backend import TieredBackend
+
+REMEDIATION = {
+    "action": "block_ip",
+    "parameters": {"ip_address": "{{ip_0}}", "duration": 3600},
+    "description": "Block IP address {{ip_0}}",
+    "steps": ["1. Block {{ip_0}} at the firewall."]
+}
+
+
+def error(message, level="ERROR"):
+    return {"message": message, "level": level}
+
+
+def test_implements_protocol(backend):
+    assert isinstance(backend, StorageBackend)
+
+
+def test_missing_error_is_none(backend):
+    assert backend.get_remediation(error("Nothing stored for this")) is None
+    assert backend.get_remediations([error("Nothing stored"), error("Or this")]) == [None, None]
+    assert backend.get_remediation_by_hash("0" * 32) is None
+
+
+def test_store_and_get(backend):
+    backend.store_error(error("Security breach detected from 1.2.3.4"), REMEDIATION)
+    assert backend.get_remediation(error("Security breach detected from 1.2.3.4")) == REMEDIATION
+    # Keyed by the message template, so another IP finds the same entry
+    assert backend.get_remediation(error("Security breach detected from 10.9.9.9")) == REMEDIATION
+
+
+def test_store_replaces(backend):
+    backend.store_error(error("Disk full on /var/log"), {"action": "clean_disk", "parameters": None})
+    backend.store_error(error("Disk full on /var/log"), REMEDIATION)
+    assert backend.get_remediation(error("Disk full on /var/log")) == REMEDIATION
+
+
+def test_batch_reads_keep_input_order(backend):
+    first = dict(REMEDIATION, action="first")
+    second = dict(REMEDIATION, action="second")
+    backend.store_errors([(error("First failure mode"), first), (error("Second failure mode"), second)])
+    assert backend.get_remediations([
+        error("Second failure mode"), error("Unknown failure mode"), error("First failure mode")
+    ]) == [second, None, first]
+
+
+def test_get_by_hash_and_iter_messages(backend):
+    message = "Security breach detected from 1.2.3.4"
+    backend.store_error(error(message), REMEDIATION)
+    error_hash = backend.error_hash(error(message))
+    assert backend.get_remediation_by_hash(error_hash) == (message, REMEDIATION)
+    if isinstance(backend, TieredBackend):
+        # iter_messages reads the remote backend, which writes reach on flush
+        backend.flush()
+    assert list(backend.iter_messages()) == [(error_hash, message)]
+
+
+def test_backends_agree_on_hashes(tmp_path):
+    message = error("Connection to 10.0.0.1:5432 timed out after 30s")
+    hashes = set()
+    for name in ("sqlite", "firestore", "tiered"):
+        backend = make_backend(name, str(tmp_path))
+        hashes.add(backend.error_hash(message))
+        backend.close()
+    assert len(hashes) == 1
+
+
+def test_async_storage_round_trip(backend):
+    """Stored with one message's values, served with another's, on every backend."""
+    async def run():
+        storage = AsyncStorage(backend)
+        await storage.store_error(
+            error("Security breach detected from 172.16.0.10"),
+            {"action": "block_ip", "parameters": {"ip_address": "172.16.0.10"},
+             "description": "Block IP address 172.16.0.10"}
+        )
+        remediation = await storage.get_remediation(error("Security breach detected from 10.9.9.9"))
+        batch = await storage.get_remediations([error("Security breach detected from 10.1.1.1")])
+        storage.close()
+        return remediation, batch
+
+    remediation, batch = asyncio.run(run())
+    assert remediation["parameters"]["ip_address"] == "10.9.9.9"
+    assert remediation["description"] == "Block IP address 10.9.9.9"
+    assert batch[0]["description"] == "Block IP address 10.1.1.1"
+
+
+def test_tiered_shares_writes_between_nodes(tmp_path):
+    remote = FirestoreService(client=FakeFirestoreClient())
+    writer = TieredBackend(SQLiteService(os.path.join(tmp_path, "a.db")), remote)
+    reader = TieredBackend(SQLiteService(os.path.join(tmp_path, "b.db")), remote)
+    writer.store_error(error("Security breach detected from 1.2.3.4"), REMEDIATION)
+    assert reader.get_remediation(error("Security breach detected from 1.2.3.4")) is None
+    assert writer.flush() == 1
+    assert reader.get_remediation(error("Security breach detected from 1.2.3.4")) == REMEDIATION
+    # Now served from the reader's own local copy
+    assert reader.local.get_remediation(error("Security breach detected from 1.2.3.4")) == REMEDIATION
+    writer.close()
+    reader.close()
+
+
+def test_tiered_serves_local_copy_when_remote_fails(tmp_path):
+    class Unreachable(FakeFirestoreClient):
+        def _read(self, references):
+            raise ConnectionError("remote down")
+
+    now = [0.0]
+    backend = TieredBackend(SQLiteService(os.path.join(tmp_path, "local.db")),
+                            FirestoreService(client=Unreachable()), ttl=10.0, clock=lambda: now[0])
+    backend.store_error(error("Disk full on /var/log"), REMEDIATION)
+    backend.flush()
+    now[0] = 60.0
+    assert backend.get_remediation(error("Disk full on /var/log")) == REMEDIATION
+    assert backend.stale_served == 1
+    backend.close()
+
+
+def test_tiered_forgets_expired_freshness(tmp_path):
+    now = [0.0]
+    backend = TieredBackend(SQLiteService(os.path.join(tmp_path, "local.db")),
+                            FirestoreService(client=FakeFirestoreClient()), ttl=10.0, clock=lambda: now[0])
+    backend.store_errors([(error(f"Queue {name} backlog growing"), REMEDIATION) for name in ("alpha", "beta", "gamma")])
+    backend.flush()
+    assert len(backend._fresh_until) == 3
+    now[0] = 5.0
+    backend.store_error(error("Disk full on /var/log"), REMEDIATION)
+    backend.flush()
+    now[0] = 10.0
+    # The first three expired and are dropped even though only the fourth is read
+    assert backend.get_remediation(error("Disk full on /var/log")) == REMEDIATION
+    assert list(backend._fresh_until) == [backend.error_hash(error("Disk full on /var/log"))]
+    assert backend.local_hits == 1
+    # An expired entry is read through again, and fresh for another ttl
+    assert backend.get_remediation(error("Queue alpha backlog growing")) == REMEDIATION
+    assert backend.remote_reads == 1
+    now[0] = 15.0
+    assert backend.get_remediation_by_hash(backend.error_hash(error("Queue alpha backlog growing")))[1] == REMEDIATION
+    assert list(backend._fresh_until) == [backend.error_hash(error("Queue alpha backlog growing"))]
+    backend.close()
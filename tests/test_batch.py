@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from conftest import error_event
+
+
+def batch(*messages):
+    events = []
+    for number, message in enumerate(messages):
+        event = error_event(message)
+        event["eventId"] = f"evt-{number}"
+        events.append(event)
+    return events
+
+
+def ndjson(events):
+    return "\n".join(json.dumps(event) for event in events).encode() + b"\n"
+
+
+def test_json_array_and_ndjson_agree(client):
+    events = batch("Security breach detected from 10.0.0.1", "Database connection failed on primary")
+    as_array = client.post("/remediate/batch", json=events).json()
+    as_ndjson = client.post(
+        "/remediate/batch", content=ndjson(events), headers={"Content-Type": "application/x-ndjson"}
+    ).json()
+    assert as_array["count"] == as_ndjson["count"] == 2
+    assert [result["remediation"] for result in as_array["results"]] == [result["remediation"] for result in as_ndjson["results"]]
+    assert [result["eventId"] for result in as_ndjson["results"]] == ["evt-0", "evt-1"]
+    # The first call stored both, so the second was answered from the database
+    assert [result["source"] for result in as_ndjson["results"]] == ["database", "database"]
+
+
+def test_ndjson_skips_blank_lines_and_reports_bad_ones(client):
+    events = batch("Disk full on node 7")
+    body = b"\n" + ndjson(events) + b"\n  \n"
+    response = client.post("/remediate/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["count"] == 1
+    response = client.post("/remediate/batch", content=ndjson(events) + b"{broken\n",
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 422
+    assert "line 2" in response.json()["detail"]
+
+
+def test_invalid_event_is_rejected(client):
+    assert client.post("/remediate/batch", json=[{"eventId": "missing-fields"}]).status_code == 422
+    assert client.post("/remediate/batch", content=b"[not json").status_code == 422
+
+
+@pytest.mark.parametrize("ndjson_body", [False, True])
+def test_size_limit_applies_before_validation(app_module, client, monkeypatch, ndjson_body):
+    monkeypatch.setattr(app_module, "MAX_BATCH_SIZE", 3)
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("oversized batches must not be validated")
+
+    # Events that would fail validation: the size check has to answer first
+    events = [{"eventId": str(number)} for number in range(4)]
+    monkeypatch.setattr(app_module.ErrorLog, "model_validate", unexpected)
+    monkeypatch.setattr(app_module.error_log_list_adapter, "validate_python", unexpected)
+    if ndjson_body:
+        response = client.post("/remediate/batch", content=ndjson(events), headers={"Content-Type": "application/x-ndjson"})
+    else:
+        response = client.post("/remediate/batch", json=events)
+    assert response.status_code == 413
+    assert "limit of 3" in response.json()["detail"]
+
+
+def test_batch_at_the_limit_is_accepted(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "MAX_BATCH_SIZE", 3)
+    response = client.post("/remediate/batch", json=batch("Queue backlog 1", "Queue backlog 2", "Queue backlog 3"))
+    assert response.status_code == 200
+    # One message template, generated once
+    assert response.json()["generated"] == 1
+
+
+def test_mixed_hits_and_misses_keep_request_order(client):
+    assert client.post("/remediate", json=error_event("Security breach detected from 10.0.0.1")).json()["source"] == "agent"
+    response = client.post("/remediate/batch", json=batch(
+        "Database connection failed on replica 12345",
+        "Security breach detected from 10.0.0.2",
+        "Database connection failed on replica 67890",
+        "Memory overflow in webserver",
+        "Security breach detected from 10.0.0.3",
+    )).json()
+    results = response["results"]
+    assert [result["eventId"] for result in results] == [f"evt-{number}" for number in range(5)]
+    assert [result["source"] for result in results] == ["agent", "database", "agent", "agent", "database"]
+    # Hits are rendered with each event's own variables
+    assert [results[i]["remediation"]["parameters"]["ip_address"] for i in (1, 4)] == ["10.0.0.2", "10.0.0.3"]
+    assert results[0]["remediation"] == results[2]["remediation"]
+    assert results[0]["remediation"]["action"] == "restart_database"
+    assert results[3]["remediation"]["action"] == "scale_resources"
+    # The two replica events share one message template, generated and stored once
+    assert response["generated"] == 2
@@ -0,0 +1,92 @@
+import zlib
+
+import pytest
+
+from database.codec import (COMPRESS_THRESHOLD, TAG_JSON, TAG_MSGPACK, TAG_ZLIB, CompiledTemplate, PayloadCodec)
+from processor.log_processor import join_remediation, split_remediation
+
+SMALL = {"action": "block_ip", "parameters": {"ip_address": "10.0.0.1", "duration": 3600}}
+
+LARGE = {
+    "action": "investigate_error",
+    "description": "Investigate the error reported by checkout on web-01 — \"quoted\" and \\ escaped",
+    "steps": [f"{number}. Check the application logs for related entries." for number in range(1, 12)],
+    "parameters": {"error_level": "ERROR", "service_name": "checkout", "retries": None, "ratio": 0.5}
+}
+
+
+def test_json_round_trip():
+    codec = PayloadCodec("json")
+    for value in (SMALL, LARGE):
+        data = codec.encode(value)
+        assert data[:1] == TAG_JSON
+        assert codec.decode(data) == value
+
+
+def test_zlib_only_compresses_large_payloads():
+    codec = PayloadCodec("json+zlib")
+    small = codec.encode(SMALL)
+    assert small[:1] == TAG_JSON
+    large = codec.encode(LARGE)
+    assert len(PayloadCodec("json").encode(LARGE)) >= COMPRESS_THRESHOLD
+    assert large[:1] == TAG_ZLIB
+    assert zlib.decompress(large[1:])[:1] == TAG_JSON
+    assert codec.decode(small) == SMALL
+    assert codec.decode(large) == LARGE
+
+
+@pytest.mark.parametrize("name", ["msgpack", "msgpack+zlib"])
+def test_msgpack_round_trip(name):
+    pytest.importorskip("msgpack")
+    codec = PayloadCodec(name)
+    data = codec.encode(SMALL)
+    assert data[:1] == TAG_MSGPACK
+    assert codec.decode(data) == SMALL
+    assert codec.decode(codec.encode(LARGE)) == LARGE
+
+
+def test_msgpack_requires_the_package(monkeypatch):
+    monkeypatch.setattr("database.codec.msgpack", None)
+    with pytest.raises(ValueError):
+        PayloadCodec("msgpack")
+    with pytest.raises(ValueError):
+        PayloadCodec("json").decode(TAG_MSGPACK + b"\x80")
+
+
+def test_decode_reads_every_codec():
+    # The tag decides, not the configured codec, so changing REMEDIATION_CODEC keeps old rows readable
+    reader = PayloadCodec("json")
+    for name in ("json", "json+zlib"):
+        assert reader.decode(PayloadCodec(name).encode(LARGE)) == LARGE
+
+
+def test_decode_untagged_json():
+    codec = PayloadCodec()
+    assert codec.decode('{"action": "block_ip"}') == {"action": "block_ip"}
+    assert codec.decode(b'{"action": "block_ip"}') == {"action": "block_ip"}
+
+
+@pytest.mark.parametrize("data", [b"Xgarbage", TAG_ZLIB + b"not zlib", b"\x00\x01"])
+def test_decode_unknown_tag_fails(data):
+    with pytest.raises((ValueError, zlib.error)):
+        PayloadCodec().decode(data)
+
+
+def test_unknown_codec_rejected():
+    with pytest.raises(ValueError):
+        PayloadCodec("yaml")
+
+
+@pytest.mark.parametrize("remediation", [
+    SMALL,
+    LARGE,
+    {"action": "block_ip", "description": "Block \"10.0.0.1\" from \\\\share — ünïcode",
+     "parameters": {"ip_address": "10.0.0.1"}},
+    {"action": "restart", "description": "No parameters"},
+])
+def test_compiled_template_matches_join_remediation(remediation):
+    template, parameters = split_remediation(remediation)
+    compiled = CompiledTemplate(template)
+    assert compiled.fill(parameters) == join_remediation(template, parameters) == remediation
+    # Every fill returns a new object
+    assert compiled.fill(parameters) is not compiled.fill(parameters)
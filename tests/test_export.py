@@ -0,0 +1,47 @@
+import asyncio
+import csv
+import io
+import json
+
+from database.async_storage import AsyncStorage
+from database.export import CSV_COLUMNS, aiter_export, iter_export
+
+
+def export(backend, export_format, batch_size):
+    async def run():
+        storage = AsyncStorage(backend)
+        try:
+            return "".join([chunk async for chunk in aiter_export(storage.iter_errors({}, batch_size), export_format)])
+        finally:
+            storage.close()
+
+    return asyncio.run(run())
+
+
+def store(backend, count):
+    backend.store_errors([
+        ({"message": f"Failure in module {chr(97 + i // 26)}{chr(97 + i % 26)}", "level": "ERROR"}, {"action": "restart"})
+        for i in range(count)
+    ])
+
+
+def test_ndjson_export_pages_through_every_row(sqlite_backend):
+    store(sqlite_backend, 25)
+    lines = export(sqlite_backend, "ndjson", batch_size=10).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert len(records) == 25
+    assert len({record["id"] for record in records}) == 25
+    assert records[0]["remediation"] == {"action": "restart"}
+
+
+def test_csv_export_matches_sync_export(sqlite_backend):
+    store(sqlite_backend, 5)
+    exported = export(sqlite_backend, "csv", batch_size=2)
+    assert exported == "".join(iter_export(sqlite_backend.iter_errors(), "csv"))
+    rows = list(csv.reader(io.StringIO(exported)))
+    assert tuple(rows[0]) == CSV_COLUMNS
+    assert len(rows) == 6
+
+
+def test_empty_csv_export_has_a_header(sqlite_backend):
+    assert export(sqlite_backend, "csv", batch_size=10) == ",".join(CSV_COLUMNS) + "\r\n"
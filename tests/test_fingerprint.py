@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from agent.rule_engine import RuleEngine
+from processor.log_processor import (
+    fingerprint_message, join_remediation, remediation_placeholders, render_remediation, split_remediation,
+    templatize_remediation
+)
+
+
+def round_trip(stored_message, remediation, requested_message):
+    """Templatize a remediation for one message, then render it for another of the same template."""
+    stored = fingerprint_message(stored_message)
+    requested = fingerprint_message(requested_message)
+    assert stored.hash == requested.hash
+    return render_remediation(templatize_remediation(remediation, stored.variables), requested.variables)
+
+
+def test_variables_are_masked_into_the_template():
+    first = fingerprint_message("Connection to 10.0.0.1:5432 failed after 1500 ms")
+    second = fingerprint_message("Connection to 192.168.1.7:6543 failed after 30 ms")
+    assert first.template == second.template
+    assert first.hash == second.hash
+    assert dict(first.variables) == {"ip_0": "10.0.0.1:5432", "num_0": "1500"}
+
+
+def test_different_templates_hash_differently():
+    assert fingerprint_message("Disk full on /var/log").hash != fingerprint_message("Disk slow on /var/log").hash
+
+
+def test_round_trip_substitutes_every_variable_kind():
+    remediation = {
+        "description": "Block 172.16.0.10 and inspect /var/log/auth.log",
+        "steps": ["Trace request 123e4567-e89b-12d3-a456-426614174000", "Dump 0x7fff5fbff8a8"]
+    }
+    rendered = round_trip(
+        "Breach from 172.16.0.10 in /var/log/auth.log, request 123e4567-e89b-12d3-a456-426614174000 at 0x7fff5fbff8a8",
+        remediation,
+        "Breach from 10.9.9.9 in /srv/app.log, request 00000000-1111-2222-3333-444444444444 at 0xdeadbeef"
+    )
+    assert rendered == {
+        "description": "Block 10.9.9.9 and inspect /srv/app.log",
+        "steps": ["Trace request 00000000-1111-2222-3333-444444444444", "Dump 0xdeadbeef"]
+    }
+
+
+def test_round_trip_keeps_mixed_case_values():
+    rendered = round_trip(
+        "Disk full on /Var/Log at 0xDEADBEEF",
+        {"description": "Free space on /Var/Log", "steps": ["Inspect 0xDEADBEEF"]},
+        "Disk full on /Srv/Data at 0xCafeF00D"
+    )
+    assert rendered == {"description": "Free space on /Srv/Data", "steps": ["Inspect 0xCafeF00D"]}
+
+
+def test_short_numbers_stay_literal():
+    fingerprint = fingerprint_message("Retry 3 of request failed")
+    template = templatize_remediation({"steps": ["1. Retry 3 times"]}, fingerprint.variables)
+    assert template == {"steps": ["1. Retry 3 times"]}
+    assert remediation_placeholders(template) == set()
+
+
+def test_unknown_placeholders_are_left_untouched():
+    assert render_remediation({"text": "{{ip_0}} and {{ip_1}}"}, (("ip_0", "1.2.3.4"),)) == {"text": "1.2.3.4 and {{ip_1}}"}
+
+
+def test_placeholders():
+    assert remediation_placeholders({"a": "{{ip_0}}", "b": ["{{path_0}} {{ip_0}}"], "c": 3}) == {"ip_0", "path_0"}
+
+
+def test_split_and_join_are_inverse():
+    remediation = {
+        "action": "scale_resources",
+        "parameters": {"service_name": "webserver", "replicas": 3},
+        "description": "Scale webserver",
+        "steps": ["Restart webserver"]
+    }
+    template, parameters = split_remediation(remediation)
+    assert "webserver" not in json.dumps(template)
+    assert join_remediation(template, parameters) == remediation
+
+
+@pytest.fixture
+def rule_engine(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({
+        "rules": [{
+            "id": "disk_full",
+            "match": ["disk full"],
+            "extract": {"path": {"pattern": "on (\\S+)"}},
+            "remediation": {"description": "Free space on {path}", "steps": ["Investigate: {message}"]}
+        }],
+        "default": {"remediation": {"description": "Investigate {message}"}}
+    }))
+    return RuleEngine(str(path), reload_interval=None)
+
+
+def test_rule_output_keeps_message_case(rule_engine):
+    remediation = rule_engine.evaluate("DISK FULL on /Var/Log at 0xDEADBEEF", "error")
+    assert remediation == {
+        "description": "Free space on /Var/Log",
+        "steps": ["Investigate: DISK FULL on /Var/Log at 0xDEADBEEF"]
+    }
+
+
+def test_rule_output_templatizes_and_renders(rule_engine):
+    stored = "Disk full on /Var/Log at 0xDEADBEEF"
+    rendered = round_trip(stored, rule_engine.evaluate(stored, "ERROR"), "Disk full on /Srv/Data at 0xCAFE1234")
+    assert rendered == {
+        "description": "Free space on /Srv/Data",
+        "steps": ["Investigate: Disk full on /Srv/Data at 0xCAFE1234"]
+    }
@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+
+from agent.generation_pipeline import GenerationError, GenerationPipeline, TokenBucket
+from agent.model_clients import StubModelClient, VertexModelClient
+
+
+class SelectiveClient(StubModelClient):
+    """Stub whose prompts containing "fail" raise and containing "hang" never complete."""
+
+    async def _answer(self, prompt):
+        if "hang" in prompt:
+            await asyncio.Event().wait()
+        if "fail" in prompt:
+            raise RuntimeError(f"cannot answer {prompt}")
+        return self._respond(prompt)
+
+    async def generate(self, prompt):
+        self.calls += 1
+        return await self._answer(prompt)
+
+    async def generate_batch(self, prompts):
+        self.calls += len(prompts)
+        self.batches += 1
+        return await asyncio.gather(*(self._answer(prompt) for prompt in prompts), return_exceptions=True)
+
+
+def run_pipeline(client, scenario, **options):
+    async def run():
+        pipeline = GenerationPipeline(client, **options)
+        pipeline.start()
+        try:
+            return await scenario(pipeline)
+        finally:
+            await pipeline.stop()
+
+    return asyncio.run(run())
+
+
+def test_token_bucket_waits_for_refill(monkeypatch):
+    now = [0.0]
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        now[0] += delay
+        await real_sleep(0)
+
+    async def run():
+        bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0])
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+        await bucket.acquire()
+        await bucket.acquire()
+        assert sleeps == []
+        await bucket.acquire()
+        # One token at two per second
+        assert sleeps == [0.5]
+        # Requests beyond capacity are capped rather than waiting forever
+        await bucket.acquire(10)
+        assert now[0] == pytest.approx(1.5)
+
+    asyncio.run(run())
+
+
+def test_token_bucket_rejects_bad_settings():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, capacity=1)
+
+
+def test_concurrent_prompts_share_a_batch():
+    client = StubModelClient(latency=0.01)
+
+    async def scenario(pipeline):
+        return await asyncio.gather(*(pipeline.submit(f"prompt {i}", timeout=5) for i in range(5)))
+
+    results = run_pipeline(client, scenario, max_concurrency=1, max_batch_size=8, batch_window=0.05)
+    assert results == [client._respond(f"prompt {i}") for i in range(5)]
+    assert client.batches == 1
+
+
+def test_failed_prompt_fails_only_itself():
+    client = SelectiveClient()
+
+    async def scenario(pipeline):
+        return await asyncio.gather(
+            pipeline.submit("good one", timeout=5), pipeline.submit("fail me", timeout=5),
+            pipeline.submit("good two", timeout=5), return_exceptions=True
+        )
+
+    good, failed, other = run_pipeline(client, scenario, max_concurrency=1, batch_window=0.05)
+    assert client.batches == 1
+    assert good == client._respond("good one")
+    assert other == client._respond("good two")
+    assert isinstance(failed, GenerationError)
+    assert "cannot answer fail me" in str(failed)
+
+
+def test_vertex_batch_keeps_per_prompt_errors():
+    client = VertexModelClient.__new__(VertexModelClient)
+
+    async def generate(prompt):
+        if prompt == "bad":
+            raise RuntimeError("quota exceeded")
+        return prompt.upper()
+
+    client.generate = generate
+    results = asyncio.run(client.generate_batch(["a", "bad", "b"]))
+    assert results[0] == "A" and results[2] == "B"
+    assert isinstance(results[1], RuntimeError)
+
+
+def test_hung_model_call_frees_the_worker():
+    client = SelectiveClient()
+
+    async def scenario(pipeline):
+        with pytest.raises(GenerationError):
+            await pipeline.submit("hang forever", timeout=0.05)
+        # The only worker is free again once the batch's deadline passed
+        return await pipeline.submit("answer this", timeout=1)
+
+    assert run_pipeline(client, scenario, max_concurrency=1, batch_window=0) == client._respond("answer this")
+
+
+def test_full_queue_rejects():
+    client = SelectiveClient()
+
+    async def scenario(pipeline):
+        hung = asyncio.ensure_future(pipeline.submit("hang", timeout=1))
+        await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(pipeline.submit("waiting", timeout=1))
+        await asyncio.sleep(0)
+        with pytest.raises(GenerationError, match="full"):
+            await pipeline.submit("rejected", timeout=1)
+        hung.cancel()
+        queued.cancel()
+        return pipeline.stats()["rejected"]
+
+    assert run_pipeline(client, scenario, max_concurrency=1, queue_size=1, batch_window=0) == 1
+
+
+def test_submit_requires_a_running_pipeline():
+    async def run():
+        await GenerationPipeline(StubModelClient()).submit("prompt")
+
+    with pytest.raises(GenerationError):
+        asyncio.run(run())
+
+
+def test_stream_yields_chunks():
+    client = StubModelClient()
+
+    async def scenario(pipeline):
+        return [chunk async for chunk in pipeline.stream("prompt", timeout=1)]
+
+    chunks = run_pipeline(client, scenario)
+    assert len(chunks) == 3
+    assert "".join(chunks) == client._respond("prompt")
+
+
+def test_stream_without_generate_stream_is_one_chunk():
+    class BatchOnly:
+        async def generate(self, prompt):
+            return "whole answer"
+
+    async def scenario(pipeline):
+        return [chunk async for chunk in pipeline.stream("prompt", timeout=1)]
+
+    assert run_pipeline(BatchOnly(), scenario) == ["whole answer"]
+
+
+def test_stream_failure_is_a_generation_error():
+    async def scenario(pipeline):
+        with pytest.raises(GenerationError):
+            async for _ in pipeline.stream("prompt", timeout=1):
+                pass
+        return pipeline.stats()["failed"]
+
+    assert run_pipeline(StubModelClient(fail=True), scenario) == 1
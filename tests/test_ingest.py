@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from processor import ingest
+from processor.ingest import Checkpoint, LogIngestor
+
+LINES = [
+    "2024-01-01 00:00:01 ERROR: Database connection failed on replica 1",
+    "2024-01-01 00:00:02 INFO: Request served in 12 ms",
+    "2024-01-01 00:00:03 ERROR: Security breach detected from 10.0.0.1",
+    "2024-01-01 00:00:04 WARN: Memory overflow in webserver",
+    "not a log line",
+    "2024-01-01 00:00:05 ERROR: Database connection failed on replica 2",
+    "2024-01-01 00:00:06 FATAL: Disk full on /var",
+    "2024-01-01 00:00:07 ERROR: Security breach detected from 10.0.0.2",
+]
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("\n".join(LINES) + "\n")
+    return str(path)
+
+
+def stored_messages(db):
+    return sorted(row[0] for row in db._get_connection().execute("SELECT message FROM errors"))
+
+
+def test_ingest_stores_each_distinct_error_once(sqlite_backend, log_path):
+    ingestor = LogIngestor(sqlite_backend, batch_size=3, use_threads=True, workers=2)
+    ingestor.ingest(log_path)
+    assert ingestor.lines == len(LINES)
+    assert ingestor.events == 6
+    # Replica 1/2 and the two breaches share a fingerprint each
+    assert ingestor.generated == 4
+    assert stored_messages(sqlite_backend) == [
+        "Database connection failed on replica 1",
+        "Disk full on /var",
+        "Memory overflow in webserver",
+        "Security breach detected from 10.0.0.1",
+    ]
+    assert not os.path.exists(log_path + ".checkpoint")
+
+
+def test_interrupted_run_resumes_from_checkpoint(sqlite_backend, log_path, monkeypatch):
+    ingestor = LogIngestor(sqlite_backend, batch_size=3, use_threads=True, workers=1)
+    process_batch = ingestor._process_batch
+    calls = []
+
+    def interrupt_second_batch(executor, batch):
+        calls.append(batch)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        process_batch(executor, batch)
+
+    monkeypatch.setattr(ingestor, "_process_batch", interrupt_second_batch)
+    with pytest.raises(KeyboardInterrupt):
+        ingestor.ingest(log_path)
+    offset = Checkpoint(log_path + ".checkpoint").load()
+    assert offset == sum(len(line) + 1 for line in LINES[:3])
+
+    resumed = LogIngestor(sqlite_backend, batch_size=3, use_threads=True, workers=1)
+    resumed.ingest(log_path)
+    assert resumed.lines == len(LINES) - 3
+    # The first batch's errors are in the database already and are not generated again
+    assert resumed.generated == 2
+    assert len(stored_messages(sqlite_backend)) == 4
+    assert not os.path.exists(log_path + ".checkpoint")
+
+
+def test_no_resume_starts_over(sqlite_backend, log_path):
+    Checkpoint(log_path + ".checkpoint").save(sum(len(line) + 1 for line in LINES[:5]))
+    ingestor = LogIngestor(sqlite_backend, use_threads=True, workers=1)
+    ingestor.ingest(log_path, resume=False)
+    assert ingestor.lines == len(LINES)
+
+
+def test_seen_errors_are_bounded(sqlite_backend, log_path):
+    ingestor = LogIngestor(sqlite_backend, batch_size=2, use_threads=True, workers=1, seen_size=2)
+    ingestor.ingest(log_path)
+    assert len(ingestor.seen) == 2
+    # Forgotten errors are found in the database instead of being generated again
+    assert ingestor.generated == 4
+    assert len(stored_messages(sqlite_backend)) == 4
+
+
+@pytest.mark.parametrize("use_threads, expected", [(True, "ThreadPoolExecutor"), (False, "ProcessPoolExecutor")])
+def test_pool_kind_follows_use_threads(sqlite_backend, log_path, monkeypatch, use_threads, expected):
+    created = []
+
+    def recording_pool(name):
+        def pool(workers, initializer, initargs):
+            created.append((name, workers))
+            # Threads either way; only the choice is under test
+            return ThreadPoolExecutor(workers, initializer=initializer, initargs=initargs)
+        return pool
+
+    for name in ("ThreadPoolExecutor", "ProcessPoolExecutor"):
+        monkeypatch.setattr(ingest, name, recording_pool(name))
+    ingestor = LogIngestor(sqlite_backend, use_threads=use_threads, workers=3)
+    ingestor.ingest(log_path)
+    assert created == [(expected, 3)]
+    assert ingestor.generated == 4
+
+
+def test_process_pool_generates(sqlite_backend, log_path):
+    ingestor = LogIngestor(sqlite_backend, use_threads=False, workers=1)
+    ingestor.ingest(log_path)
+    assert ingestor.generated == 4
+    assert sqlite_backend.get_remediation({"message": "Disk full on /var", "level": "CRITICAL"}) is not None
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from api.jobs import JobManager, JobQueueFull, job_events
+
+
+async def echo(job):
+    await asyncio.sleep(0.01)
+    job.add_token("partial ")
+    return b'{"status":"success"}'
+
+
+def test_submitted_job_runs_on_the_pool():
+    async def run():
+        published = []
+
+        async def publish(job):
+            published.append(job.status)
+
+        manager = JobManager(echo, workers=2, publish=publish)
+        manager.start()
+        job = manager.submit({"message": "Disk full"})
+        events = [event async for event in job_events(job)]
+        await manager.stop()
+        return job, events, published
+
+    job, events, published = asyncio.run(run())
+    assert job.status == "done"
+    assert events[0].startswith(b"event: status")
+    assert events[1] == b'event: token\ndata: {"text":"partial "}\n\n'
+    assert events[-1] == b'event: result\ndata: {"status":"success"}\n\n'
+    assert published == ["done"]
+
+
+def test_full_queue_rejects():
+    async def run():
+        manager = JobManager(echo, workers=1, queue_size=1)
+        manager.start()
+        # The worker has not taken a job yet, so the second one finds the queue full
+        manager.submit(1)
+        with pytest.raises(JobQueueFull):
+            manager.submit(2)
+        await manager.stop()
+        return manager.stats()["rejected"]
+
+    assert asyncio.run(run()) == 1
+
+
+def test_stream_jobs_are_bounded():
+    async def run():
+        manager = JobManager(echo, max_streams=2)
+        first = manager.start_now(1)
+        manager.start_now(2)
+        with pytest.raises(JobQueueFull):
+            manager.start_now(3)
+        assert manager.stats()["streaming"] == 2
+        await asyncio.sleep(0.05)
+        third = manager.start_now(4)
+        await asyncio.sleep(0.05)
+        await manager.stop()
+        return first, third
+
+    first, third = asyncio.run(run())
+    assert first.status == "done"
+    assert third.status == "done"
+
+
+def test_failed_job_reports_its_error():
+    async def fail(job):
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        manager = JobManager(fail)
+        job = manager.start_now(1)
+        events = [event async for event in job_events(job)]
+        await manager.stop()
+        return job, events
+
+    job, events = asyncio.run(run())
+    assert job.status == "failed"
+    assert job.describe()["error"] == "model unavailable"
+    assert events[-1].startswith(b"event: error")
@@ -0,0 +1,128 @@
+import re
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.metrics import DEFAULT_BUCKETS, Histogram, MetricsMiddleware, MetricsRegistry, StageRecorder
+
+
+def test_render_counters_and_collectors():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("method", "path"))
+    plain = registry.counter("plain_total", "No labels.")
+    requests.inc("GET", "/a")
+    requests.inc("GET", "/a", amount=2)
+    requests.inc("POST", 'quote"back\\slash\nnewline')
+    plain.inc(amount=0.5)
+    registry.collector("entries", "Entries held.", "gauge", ("cache",), lambda: {("local",): 3, ("shared",): 1.25})
+    assert registry.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{method="GET",path="/a"} 3\n'
+        'requests_total{method="POST",path="quote\\"back\\\\slash\\nnewline"} 1\n'
+        "# HELP plain_total No labels.\n"
+        "# TYPE plain_total counter\n"
+        "plain_total 0.5\n"
+        "# HELP entries Entries held.\n"
+        "# TYPE entries gauge\n"
+        'entries{cache="local"} 3\n'
+        'entries{cache="shared"} 1.25\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.5, 0.1, 1.0))
+    assert histogram.buckets == (0.1, 0.5, 1.0)
+    # A value equal to a bound counts in that bucket (le is inclusive)
+    for value in (0.05, 0.1, 0.3, 1.0, 7.0):
+        histogram.observe(value, "lookup")
+    histogram.observe(0.2, "store")
+    assert histogram.samples() == [
+        'latency_seconds_bucket{stage="lookup",le="0.1"} 2',
+        'latency_seconds_bucket{stage="lookup",le="0.5"} 3',
+        'latency_seconds_bucket{stage="lookup",le="1.0"} 4',
+        'latency_seconds_bucket{stage="lookup",le="+Inf"} 5',
+        'latency_seconds_sum{stage="lookup"} 8.45',
+        'latency_seconds_count{stage="lookup"} 5',
+        'latency_seconds_bucket{stage="store",le="0.1"} 0',
+        'latency_seconds_bucket{stage="store",le="0.5"} 1',
+        'latency_seconds_bucket{stage="store",le="1.0"} 1',
+        'latency_seconds_bucket{stage="store",le="+Inf"} 1',
+        'latency_seconds_sum{stage="store"} 0.2',
+        'latency_seconds_count{stage="store"} 1',
+    ]
+
+
+def test_histogram_time():
+    histogram = Histogram("work_seconds", "Work.")
+    with histogram.time():
+        pass
+    samples = histogram.samples()
+    assert len(samples) == len(DEFAULT_BUCKETS) + 3
+    assert samples[0] == 'work_seconds_bucket{le="0.0005"} 1'
+    assert samples[-1] == "work_seconds_count 1"
+
+
+def make_app(server_timing):
+    registry = MetricsRegistry()
+    requests = registry.counter("http_requests_total", "Requests.", ("method", "route", "status"))
+    duration = registry.histogram("http_request_duration_seconds", "Duration.", ("method", "route"))
+    stages = StageRecorder(registry.histogram("stage_seconds", "Stages.", ("stage",)))
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, requests=requests, duration=duration, stages=stages,
+                       server_timing=server_timing)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        stages.mark_parsed()
+        with stages.stage("lookup"):
+            pass
+        stages.mark_handler_done()
+        return {"id": item_id}
+
+    return app, registry
+
+
+@pytest.mark.parametrize("server_timing", [False, True])
+def test_middleware_counts_by_route_template(server_timing):
+    app, registry = make_app(server_timing)
+    with TestClient(app) as client:
+        assert client.get("/items/1").status_code == 200
+        assert client.get("/items/2").status_code == 200
+        assert client.get("/items/x").status_code == 422
+        assert client.get("/nowhere").status_code == 404
+    text = registry.render()
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"} 2' in text
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="422"} 1' in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 3' in text
+    for stage in ("parse", "lookup", "serialize"):
+        assert f'stage_seconds_count{{stage="{stage}"}} 2' in text
+
+
+def test_server_timing_header():
+    app, _ = make_app(server_timing=True)
+    with TestClient(app) as client:
+        header = client.get("/items/1").headers["server-timing"]
+    entries = [entry.split(";dur=") for entry in header.split(", ")]
+    assert [name for name, _ in entries] == ["parse", "lookup", "serialize", "total"]
+    assert all(re.fullmatch(r"\d+\.\d{3}", duration) for _, duration in entries)
+    durations = {name: float(duration) for name, duration in entries}
+    # The stages do not overlap; allow for each being rounded to a microsecond
+    assert durations["total"] >= durations["parse"] + durations["lookup"] + durations["serialize"] - 0.002
+
+
+def test_server_timing_is_opt_in():
+    app, _ = make_app(server_timing=False)
+    with TestClient(app) as client:
+        assert "server-timing" not in client.get("/items/1").headers
+
+
+def test_app_metrics_endpoint(client):
+    client.post("/remediate", json={"not": "an event"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_requests_total counter" in response.text
+    assert re.search(r'http_requests_total\{method="POST",route="/remediate",status="422"\} \d+', response.text)
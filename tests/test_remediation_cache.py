@@ -0,0 +1,103 @@
+import pytest
+
+from database.remediation_cache import RemediationCache
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+def make_cache(clock, **options):
+    return RemediationCache(clock=lambda: clock[0], **options)
+
+
+def test_get_returns_what_was_put(clock):
+    cache = make_cache(clock)
+    assert cache.get("a") is None
+    cache.put("a", {"action": "block_ip"})
+    assert cache.get("a") == {"action": "block_ip"}
+    cache.put("a", {"action": "restart"})
+    assert cache.get("a") == {"action": "restart"}
+    assert len(cache) == 1
+
+
+def test_least_recently_used_is_evicted_first(clock):
+    cache = make_cache(clock, max_entries=3)
+    for key in "abc":
+        cache.put(key, key)
+    # Reading "a" and rewriting "b" make "c" the least recently used
+    cache.get("a")
+    cache.put("b", "b2")
+    cache.put("d", "d")
+    assert cache.get("c") is None
+    cache.put("e", "e")
+    assert cache.get("a") is None
+    assert [cache.get(key) for key in "bde"] == ["b2", "d", "e"]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_misses_do_not_refresh_order(clock):
+    cache = make_cache(clock, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("missing")
+    cache.put("c", 3)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = make_cache(clock, ttl=60)
+    cache.put("a", 1)
+    clock[0] += 59.9
+    assert cache.get("a") == 1
+    # Reads do not extend the lifetime
+    clock[0] += 0.1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 1, 1)
+
+
+def test_put_restarts_the_ttl(clock):
+    cache = make_cache(clock, ttl=60)
+    cache.put("a", 1)
+    clock[0] += 50
+    cache.put("a", 2)
+    clock[0] += 50
+    assert cache.get("a") == 2
+
+
+def test_invalidate_and_clear(clock):
+    cache = make_cache(clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    cache.invalidate("a")
+    cache.invalidate("a")
+    cache.invalidate("never-cached")
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get("b") is None
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_stats_hit_ratio(clock):
+    cache = make_cache(clock, max_entries=5, ttl=30)
+    assert cache.stats()["hit_ratio"] == 0.0
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    cache.get("c")
+    stats = cache.stats()
+    assert stats["hit_ratio"] == 0.5
+    assert (stats["size"], stats["max_entries"], stats["ttl"]) == (1, 5, 30)
+
+
+def test_max_entries_must_be_positive():
+    with pytest.raises(ValueError):
+        RemediationCache(max_entries=0)
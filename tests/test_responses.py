@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from api.responses import JSONBytesResponse, dumps, envelope
+from conftest import error_event
+from database.codec import PreparedTemplate
+from processor.log_processor import fingerprint_message, render_remediation, templatize_remediation
+
+# Values JSON has to escape, or encoders may write differently
+AWKWARD_VALUES = ['say "hi"', "C:\\Temp\\new", "Zoë → Ünïcode ✓", "tab\there\nnewline", "\u2028", "{{ip_0}}", ""]
+
+
+def test_envelope_appends_encoded_member():
+    body = envelope({"status": "success", "source": "database"}, "remediation", dumps({"action": "block_ip"}))
+    assert json.loads(body) == {"status": "success", "source": "database", "remediation": {"action": "block_ip"}}
+    assert json.loads(envelope({}, "result", b"[1,2]")) == {"result": [1, 2]}
+
+
+def test_bytes_response_sends_bytes_as_they_are():
+    assert JSONBytesResponse(b'{"a":1}').body == b'{"a":1}'
+    assert json.loads(JSONBytesResponse({"text": "Zoë"}).body) == {"text": "Zoë"}
+
+
+@pytest.mark.parametrize("value", AWKWARD_VALUES)
+def test_render_json_matches_render(value):
+    template = {
+        "action": "block_ip",
+        "parameters": {"ip_address": "{{ip_0}}", "duration": 3600},
+        "description": "Block \"{{ip_0}}\" on {{missing}} — ü",
+        "steps": ["1. Block {{ip_0}}.", "2. Check {{ip_0}} and {{path_0}} again."]
+    }
+    variables = (("ip_0", value), ("path_0", "/var/log/a\\b"))
+    prepared = PreparedTemplate(template)
+    expected = render_remediation(template, variables)
+    for _ in range(2):
+        # The second call uses the prepared slots
+        assert json.loads(prepared.render_json(variables)) == expected
+
+
+def test_render_json_without_placeholders_and_with_placeholder_keys():
+    assert json.loads(PreparedTemplate({"action": "restart"}).render_json(())) == {"action": "restart"}
+    # Placeholders in keys are not rendered, so those templates are encoded in full
+    template = {"parameters": {"{{ip_0}}": "{{ip_0}}"}}
+    assert json.loads(PreparedTemplate(template).render_json((("ip_0", "1.2.3.4"),))) == {"parameters": {"{{ip_0}}": "1.2.3.4"}}
+
+
+@pytest.mark.parametrize("stored, requested", [
+    ("Security breach detected from 172.16.0.10", "Security breach detected from 10.0.0.99"),
+    ('Security breach detected from "C:\\Users\\Zoë\\Ünï"', 'Security breach detected from "C:\\Temp\\Björk"'),
+    ("Memory overflow in webserver — pid 12345 at /srv/ünï/app", "Memory overflow in webserver — pid 67890 at /srv/ö~q/app"),
+])
+def test_cache_hit_matches_a_generated_response(app_module, client, stored, requested):
+    first = client.post("/remediate", json=error_event(stored))
+    assert first.json()["source"] == "agent"
+    hit = client.post("/remediate", json=error_event(requested))
+    assert hit.headers["content-type"] == "application/json"
+    body = hit.json()
+    assert body["source"] == "database"
+    assert body["message"] == app_module.SOURCE_MESSAGES["database"]
+    error_log = app_module.ErrorLog.model_validate(error_event(requested))
+    fingerprint = fingerprint_message(requested)
+    # What the request would have answered had it generated the remediation itself
+    generated = render_remediation(
+        templatize_remediation(app_module.generate_remediation(error_log), fingerprint.variables), fingerprint.variables
+    )
+    assert body["remediation"] == generated
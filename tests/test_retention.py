@@ -0,0 +1,193 @@
+import pytest
+
+from database.backend import RetentionBackend
+from database.retention import RetentionManager
+
+REMEDIATION = {"action": "investigate_error", "parameters": {}}
+
+MESSAGES = ["Disk full on data volume", "Queue backlog growing", "Cache miss storm", "Certificate expired"]
+
+
+def store(backend, *messages):
+    for message in messages:
+        backend.store_error({"message": message, "level": "ERROR"}, REMEDIATION)
+
+
+def error_hash(backend, message):
+    return backend.error_hash({"message": message, "level": "ERROR"})
+
+
+def hit_counts(backend):
+    rows = backend._get_connection().execute("SELECT message, hit_count FROM errors").fetchall()
+    return dict(rows)
+
+
+def set_last_access(backend, message, timestamp):
+    with backend._transaction() as cursor:
+        cursor.execute("UPDATE errors SET last_access = ? WHERE message = ?", (timestamp, message))
+
+
+def remaining(backend):
+    return set(hit_counts(backend))
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+def test_sqlite_is_a_retention_backend(sqlite_backend):
+    assert isinstance(sqlite_backend, RetentionBackend)
+
+
+def test_record_access_adds_hits(sqlite_backend):
+    store(sqlite_backend, *MESSAGES[:2])
+    set_last_access(sqlite_backend, MESSAGES[0], "2000-01-01 00:00:00")
+    sqlite_backend.record_access({error_hash(sqlite_backend, MESSAGES[0]): 3, "0" * 32: 5})
+    sqlite_backend.record_access({error_hash(sqlite_backend, MESSAGES[0]): 2})
+    # A stored error starts with the hit that generated it
+    assert hit_counts(sqlite_backend) == {MESSAGES[0]: 6, MESSAGES[1]: 1}
+    last_access = sqlite_backend._get_connection().execute(
+        "SELECT last_access FROM errors WHERE message = ?", (MESSAGES[0],)
+    ).fetchone()[0]
+    assert last_access > "2000-01-01 00:00:00"
+
+
+def test_storing_again_keeps_hits(sqlite_backend):
+    store(sqlite_backend, MESSAGES[0])
+    sqlite_backend.record_access({error_hash(sqlite_backend, MESSAGES[0]): 4})
+    store(sqlite_backend, MESSAGES[0])
+    assert hit_counts(sqlite_backend) == {MESSAGES[0]: 5}
+
+
+def test_evict_older_than(sqlite_backend):
+    store(sqlite_backend, *MESSAGES)
+    set_last_access(sqlite_backend, MESSAGES[1], "2000-01-01 00:00:00")
+    set_last_access(sqlite_backend, MESSAGES[3], "2000-01-02 00:00:00")
+    evicted = sqlite_backend.evict_older_than(86400, batch_size=1)
+    assert evicted == [error_hash(sqlite_backend, MESSAGES[1]), error_hash(sqlite_backend, MESSAGES[3])]
+    assert remaining(sqlite_backend) == {MESSAGES[0], MESSAGES[2]}
+
+
+def test_evict_excess_lfu(sqlite_backend):
+    store(sqlite_backend, *MESSAGES)
+    sqlite_backend.record_access({error_hash(sqlite_backend, MESSAGES[0]): 5, error_hash(sqlite_backend, MESSAGES[1]): 1})
+    for day, message in enumerate(MESSAGES):
+        set_last_access(sqlite_backend, message, f"2024-01-0{day + 1} 00:00:00")
+    # Fewest hits first; the older access goes first among equal counts
+    evicted = sqlite_backend.evict_excess(2, "lfu", batch_size=1)
+    assert evicted == [error_hash(sqlite_backend, MESSAGES[2]), error_hash(sqlite_backend, MESSAGES[3])]
+    assert remaining(sqlite_backend) == {MESSAGES[0], MESSAGES[1]}
+    assert sqlite_backend.evict_excess(2, "lfu") == []
+
+
+def test_evict_excess_lru(sqlite_backend):
+    store(sqlite_backend, *MESSAGES)
+    sqlite_backend.record_access({error_hash(sqlite_backend, MESSAGES[0]): 50})
+    for day, message in enumerate(MESSAGES):
+        set_last_access(sqlite_backend, message, f"2024-01-0{day + 1} 00:00:00")
+    assert sqlite_backend.evict_excess(3, "lru") == [error_hash(sqlite_backend, MESSAGES[0])]
+
+
+def test_evict_excess_rejects_unknown_policy(sqlite_backend):
+    with pytest.raises(ValueError):
+        sqlite_backend.evict_excess(1, "random")
+
+
+def test_decay_hits_halves_counts(sqlite_backend):
+    store(sqlite_backend, *MESSAGES)
+    sqlite_backend.record_access({error_hash(sqlite_backend, MESSAGES[0]): 9, error_hash(sqlite_backend, MESSAGES[1]): 2})
+    assert sqlite_backend.decay_hits(batch_size=1) == 4
+    assert hit_counts(sqlite_backend) == {MESSAGES[0]: 5, MESSAGES[1]: 1, MESSAGES[2]: 0, MESSAGES[3]: 0}
+    assert sqlite_backend.decay_hits() == 2
+
+
+def test_decay_lets_new_errors_outlive_old_favourites(sqlite_backend, clock):
+    retention = RetentionManager(sqlite_backend, max_rows=1, hit_half_life=3600, clock=lambda: clock[0])
+    store(sqlite_backend, MESSAGES[0])
+    for _ in range(8):
+        retention.record(error_hash(sqlite_backend, MESSAGES[0]))
+    retention.run()
+    # Time passes with no more hits for the old favourite; each run past the half-life halves its count
+    for _ in range(4):
+        clock[0] += 3600
+        retention.run()
+    assert hit_counts(sqlite_backend)[MESSAGES[0]] == 0
+    store(sqlite_backend, MESSAGES[2])
+    retention.record(error_hash(sqlite_backend, MESSAGES[2]))
+    assert retention.run() == [error_hash(sqlite_backend, MESSAGES[0])]
+
+
+def test_decay_waits_for_the_half_life(sqlite_backend, clock):
+    retention = RetentionManager(sqlite_backend, hit_half_life=3600, clock=lambda: clock[0])
+    store(sqlite_backend, MESSAGES[0])
+    retention.record(error_hash(sqlite_backend, MESSAGES[0]))
+    retention.run()
+    clock[0] += 3599
+    retention.run()
+    assert hit_counts(sqlite_backend) == {MESSAGES[0]: 2}
+    clock[0] += 1
+    retention.run()
+    assert hit_counts(sqlite_backend) == {MESSAGES[0]: 1}
+
+
+def test_lru_never_decays(sqlite_backend, clock):
+    retention = RetentionManager(sqlite_backend, eviction="lru", hit_half_life=1, clock=lambda: clock[0])
+    store(sqlite_backend, MESSAGES[0])
+    clock[0] += 10
+    retention.run()
+    assert hit_counts(sqlite_backend) == {MESSAGES[0]: 1}
+
+
+def test_run_evicts_and_removes_unused_templates(sqlite_backend, clock):
+    retention = RetentionManager(sqlite_backend, max_rows=1, max_age=86400, clock=lambda: clock[0])
+    store(sqlite_backend, *MESSAGES[:3])
+    sqlite_backend.store_error({"message": MESSAGES[3], "level": "ERROR"}, {"action": "restart_service", "parameters": {}})
+    set_last_access(sqlite_backend, MESSAGES[3], "2000-01-01 00:00:00")
+    retention.record(error_hash(sqlite_backend, MESSAGES[0]))
+    evicted = retention.run()
+    assert set(evicted) == {error_hash(sqlite_backend, message) for message in MESSAGES[1:]}
+    assert remaining(sqlite_backend) == {MESSAGES[0]}
+    stats = retention.stats()
+    assert stats["evicted_by_age"] == 1
+    assert stats["evicted_by_size"] == 2
+    assert stats["templates_removed"] == 1
+    assert stats["rows"] == 1
+    assert stats["pending_hits"] == 0
+
+
+def test_failed_flush_keeps_hits(sqlite_backend):
+    retention = RetentionManager(sqlite_backend)
+    retention.record("a" * 32)
+
+    def broken(counts):
+        raise RuntimeError("database is locked")
+
+    sqlite_backend.record_access = broken
+    with pytest.raises(RuntimeError):
+        retention.run()
+    assert retention.failures == 1
+    assert retention.stats()["pending_hits"] == 1
+
+
+def test_analyze_once_per_interval(sqlite_backend, clock):
+    calls = []
+    optimize = sqlite_backend.optimize
+
+    def record_optimize(vacuum_pages=1000, analyze=False):
+        calls.append(analyze)
+        return optimize(vacuum_pages, analyze)
+
+    sqlite_backend.optimize = record_optimize
+    retention = RetentionManager(sqlite_backend, analyze_interval=60, clock=lambda: clock[0])
+    retention.run()
+    clock[0] += 30
+    retention.run()
+    clock[0] += 30
+    retention.run()
+    assert calls == [True, False, True]
+
+
+def test_unknown_policy_rejected(sqlite_backend):
+    with pytest.raises(ValueError):
+        RetentionManager(sqlite_backend, eviction="random")
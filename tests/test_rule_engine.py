@@ -0,0 +1,250 @@
+import json
+import os
+import time
+
+import pytest
+
+from agent.rule_engine import DEFAULT_RULES_PATH, RuleEngine
+
+SAMPLE_MESSAGES = [
+    # The examples in test_api_request.sh
+    "Fatal: System crash detected in database",
+    "Memory overflow in webserver - system unstable",
+    "Security breach detected from 172.16.0.10",
+    "Unusual pattern detected in system logs",
+    # Every branch of the old chain, and the order between them
+    "security breach detected",
+    "security breach from 10.0.0.1 while database connection failed",
+    "database connection failed on primary",
+    "Database connection failed after crash",
+    "database crash during backup",
+    "database memory overflow",
+    "database timeout",
+    "memory overflow in mailer",
+    "memory overflow in webserver and database",
+    "",
+]
+
+
+def legacy_remediation(message, level, app_name, host):
+    """generate_remediation as it was before the rule engine, kept verbatim as the reference."""
+    message = message.lower()
+    level = level.upper()
+
+    # Security breach remediation
+    if "security breach" in message:
+        ip = message.split("from")[-1].strip()
+        return {
+            "action": "block_ip",
+            "parameters": {
+                "ip_address": ip,
+                "duration": 3600
+            },
+            "description": f"Block IP address {ip} due to security breach detection on {host}.",
+            "steps": [
+                f"1. Use your firewall to block the IP address {ip}.",
+                "2. Review system and application logs for any other suspicious activity from this IP.",
+                "3. Notify the security team and document the incident.",
+                "4. Update firewall rules to prevent future access from this IP."
+            ],
+            "preventive_measures": [
+                "Enable and regularly update intrusion detection systems.",
+                "Regularly review and update firewall rules.",
+                "Educate users about phishing and social engineering attacks."
+            ],
+            "verification": [
+                f"Run 'sudo iptables -L' or equivalent to verify {ip} is blocked.",
+                "Monitor logs for any further attempts from the blocked IP."
+            ]
+        }
+
+    # Database issues
+    elif "database" in message:
+        if "connection failed" in message:
+            return {
+                "action": "restart_database",
+                "parameters": {
+                    "service_name": "database",
+                    "wait_time": 60
+                },
+                "description": f"Restart the database service on {host} due to connection failure.",
+                "steps": [
+                    "1. Check the database service status using 'systemctl status <service>' or equivalent.",
+                    "2. Restart the database service using 'systemctl restart <service>' or equivalent.",
+                    "3. Wait 60 seconds and verify the service is running.",
+                    "4. Check application connectivity to the database."
+                ],
+                "preventive_measures": [
+                    "Monitor database resource usage and set up alerts for failures.",
+                    "Ensure regular database backups are scheduled.",
+                    "Test failover and recovery procedures periodically."
+                ],
+                "verification": [
+                    "Verify the database service is active and running.",
+                    "Check application logs to confirm successful reconnection."
+                ]
+            }
+        elif "crash" in message:
+            return {
+                "action": "restore_database",
+                "parameters": {
+                    "backup_id": "latest",
+                    "verify_after_restore": True
+                },
+                "description": f"Restore the database on {host} from the latest backup due to crash.",
+                "steps": [
+                    "1. Identify the latest valid backup.",
+                    "2. Stop the database service.",
+                    "3. Restore the database from the backup.",
+                    "4. Start the database service.",
+                    "5. Verify data integrity and application connectivity."
+                ],
+                "preventive_measures": [
+                    "Schedule regular automated backups.",
+                    "Test backup restoration procedures regularly.",
+                    "Monitor for early signs of database corruption or instability."
+                ],
+                "verification": [
+                    "Check that the database service is running.",
+                    "Run integrity checks and verify application access."
+                ]
+            }
+
+    # Memory issues
+    elif "memory overflow" in message:
+        service = "webserver" if "webserver" in message else "mailserver"
+        return {
+            "action": "scale_resources",
+            "parameters": {
+                "service_name": service,
+                "memory_increase": "2x",
+                "restart_after_scale": True
+            },
+            "description": f"Increase memory allocation for {service} on {host} due to overflow.",
+            "steps": [
+                f"1. Check current memory usage on {host} using 'free -m' or 'top'.",
+                f"2. Increase memory allocation for {service} (e.g., update container or VM settings).",
+                f"3. Restart the {service} service to apply changes.",
+                "4. Monitor the service for stability after restart."
+            ],
+            "preventive_measures": [
+                "Set up memory usage alerts for critical services.",
+                "Optimize application code to reduce memory leaks.",
+                "Regularly review and adjust resource allocations."
+            ],
+            "verification": [
+                f"Monitor memory usage on {host} to ensure it remains within limits.",
+                f"Check {service} logs for any further memory-related errors."
+            ]
+        }
+
+    # Default remediation for unknown errors
+    return {
+        "action": "investigate_error",
+        "parameters": {
+            "error_level": level,
+            "service_name": app_name
+        },
+        "description": f"Manual investigation required for unknown error type on {host}.",
+        "steps": [
+            "1. Review the error message and related logs.",
+            "2. Check the health and status of affected services.",
+            "3. Escalate to the appropriate team if necessary."
+        ],
+        "preventive_measures": [
+            "Implement comprehensive monitoring and alerting.",
+            "Document all incidents and resolutions for future reference."
+        ],
+        "verification": [
+            "Confirm the issue is resolved and services are operational.",
+            "Monitor for recurrence of the error."
+        ]
+    }
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return RuleEngine(DEFAULT_RULES_PATH, reload_interval=None)
+
+
+@pytest.mark.parametrize("message", SAMPLE_MESSAGES)
+def test_rules_reproduce_the_old_chain(engine, message):
+    assert engine.evaluate(message, "error", "checkout", "web-01") == legacy_remediation(message, "error", "checkout", "web-01")
+
+
+def test_extracted_values_keep_their_case(engine):
+    # Intentional: the old chain lowercased the whole message first
+    remediation = engine.evaluate("Security breach detected from Host-A.example.com", "ERROR")
+    assert remediation["parameters"]["ip_address"] == "Host-A.example.com"
+
+
+def write_rules(path, rules, default_action="investigate"):
+    path.write_text(json.dumps({"rules": rules, "default": {"remediation": {"action": default_action}}}))
+    # Make the change visible even on file systems with coarse timestamps
+    stamp = time.time() + len(rules)
+    os.utime(path, (stamp, stamp))
+
+
+def rule(rule_id, match, priority=0, **extra):
+    return {"id": rule_id, "match": match, "priority": priority, "remediation": {"action": rule_id}, **extra}
+
+
+def test_highest_priority_wins(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [rule("disk", ["disk"], 10), rule("disk_full", ["disk", "full"], 20), rule("full", ["full"], 5)])
+    engine = RuleEngine(str(path), reload_interval=None)
+    assert engine.evaluate("Disk full on node-3")["action"] == "disk_full"
+    assert engine.evaluate("Disk slow")["action"] == "disk"
+    assert engine.evaluate("Queue full")["action"] == "full"
+    assert engine.evaluate("Nothing matches")["action"] == "investigate"
+
+
+def test_equal_priority_keeps_file_order(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [rule("first", ["timeout"]), rule("second", ["timeout"])])
+    assert RuleEngine(str(path), reload_interval=None).evaluate("Request timeout")["action"] == "first"
+
+
+def test_exclude_skips_a_rule(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [rule("restart", ["connection failed"], 10, exclude=["permanently"]),
+                       rule("escalate", ["connection failed"], 1)])
+    engine = RuleEngine(str(path), reload_interval=None)
+    assert engine.evaluate("Connection failed")["action"] == "restart"
+    assert engine.evaluate("Connection failed permanently")["action"] == "escalate"
+
+
+def test_reload_swaps_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [rule("old", ["disk"])])
+    engine = RuleEngine(str(path), reload_interval=None)
+    write_rules(path, [rule("new", ["disk"]), rule("other", ["cpu"])])
+    assert engine.reload() is True
+    assert engine.evaluate("disk full")["action"] == "new"
+    assert engine.reload() is False
+
+
+@pytest.mark.parametrize("content", [
+    "{not json",
+    json.dumps({"rules": []}),
+    json.dumps({"rules": [{"id": "no_keywords", "remediation": {}}], "default": {"remediation": {}}}),
+    json.dumps({"rules": [{"id": "bad", "match": ["x"], "extract": {"v": {"pattern": "("}}, "remediation": {}}],
+                "default": {"remediation": {}}}),
+])
+def test_malformed_rule_file_keeps_previous_rules(tmp_path, content):
+    path = tmp_path / "rules.json"
+    write_rules(path, [rule("disk_full", ["disk full"])])
+    engine = RuleEngine(str(path), reload_interval=None)
+    path.write_text(content)
+    stamp = time.time() + 100
+    os.utime(path, (stamp, stamp))
+    assert engine.reload() is False
+    assert engine.rule_count == 1
+    assert engine.evaluate("Disk full on /var")["action"] == "disk_full"
+
+
+def test_malformed_rule_file_fails_at_startup(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text("{not json")
+    with pytest.raises(ValueError):
+        RuleEngine(str(path), reload_interval=None)
@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+from database.shared_cache import SharedCache
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / "cache.db"), ttl=300.0, clock=lambda: clock[0])
+    yield cache
+    cache.close()
+
+
+def test_put_and_get(cache):
+    cache.put("a", {"value": 1})
+    assert cache.get("a") == {"value": 1}
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_their_ttl(cache, clock):
+    cache.put("default", 1)
+    cache.put("job", 2, ttl=600.0)
+    clock[0] += 301.0
+    assert cache.get_many(["default", "job"]) == {"job": 2}
+    clock[0] += 300.0
+    assert cache.get("job") is None
+
+
+def test_get_many_beyond_the_sql_variable_limit(cache):
+    cache.put_many([(f"key-{i}", i) for i in range(3000)], notify=False)
+    found = cache.get_many([f"key-{i}" for i in range(5000)])
+    assert len(found) == 3000
+    assert found["key-2999"] == 2999
+
+
+def test_undecodable_entry_is_a_miss(cache):
+    cache.put_many([("good", 1), ("bad", 2)], notify=False)
+    conn = sqlite3.connect(cache.path)
+    conn.execute("UPDATE entries SET value = x'00ff' WHERE key = 'bad'")
+    conn.commit()
+    conn.close()
+    assert cache.get_many(["good", "bad"]) == {"good": 1}
+    assert cache.errors == 1
+
+
+def test_other_workers_see_invalidations(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    writer = SharedCache(path, clock=lambda: clock[0])
+    reader = SharedCache(path, clock=lambda: clock[0])
+    # Both handles live in this process; tell them apart as two workers would be
+    reader.origin = writer.origin + 1
+    seq = reader.latest_seq()
+    writer.put("a", 1)
+    writer.invalidate_many(["b"])
+    seq, keys, complete = reader.changes_since(seq)
+    assert keys == ["a", "b"]
+    assert complete
+    assert reader.changes_since(seq) == (seq, [], True)
+    writer.close()
+    reader.close()
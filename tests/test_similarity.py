@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from agent.rule_engine import RuleEngine
+from database.async_storage import AsyncStorage
+from database.similarity_index import SimilarityIndex, conflicting_tokens
+
+STORED = "Security breach detected from 172.16.0.10"
+REMEDIATION = {
+    "action": "block_ip",
+    "parameters": {"ip_address": "172.16.0.10"},
+    "description": "Block IP address 172.16.0.10"
+}
+
+
+def find_similar(backend, stored, message):
+    """Store (message, remediation) pairs through AsyncStorage, then look message up in the similarity tier."""
+    async def run():
+        storage = AsyncStorage(backend, similarity_index=SimilarityIndex(threshold=0.5))
+        await storage.store_errors(stored)
+        try:
+            return await storage.find_similar({"message": message})
+        finally:
+            storage.close()
+
+    return asyncio.run(run())
+
+
+def test_neighbour_is_rendered_with_the_requests_values(sqlite_backend):
+    found = find_similar(sqlite_backend, [({"message": STORED}, REMEDIATION)],
+                         "Security breach detected from host 10.9.9.9")
+    assert found is not None
+    remediation, similarity = found
+    assert remediation["parameters"]["ip_address"] == "10.9.9.9"
+    assert remediation["description"] == "Block IP address 10.9.9.9"
+    assert 0.5 <= similarity < 1.0
+
+
+def test_neighbour_needing_a_missing_variable_is_refused(sqlite_backend):
+    assert find_similar(sqlite_backend, [({"message": STORED}, REMEDIATION)], "Security breach detected") is None
+
+
+def test_neighbour_without_variables_is_served(sqlite_backend):
+    remediation = {"action": "investigate", "description": "Check the disk controller"}
+    found = find_similar(sqlite_backend, [({"message": "Disk controller reported a fault"}, remediation)],
+                         "Disk controller reported a fault again")
+    assert found is not None and found[0] == remediation
+
+
+def test_neighbour_holding_its_own_values_is_refused(sqlite_backend):
+    # Written straight to the backend, as releases before fingerprinting did:
+    # the remediation still holds the neighbour's IP
+    sqlite_backend.store_error({"message": STORED}, REMEDIATION)
+
+    async def run():
+        index = SimilarityIndex(threshold=0.5)
+        for error_hash, message in sqlite_backend.iter_messages():
+            index.add(error_hash, message)
+        storage = AsyncStorage(sqlite_backend, similarity_index=index)
+        try:
+            return await storage.find_similar({"message": "Security breach detected from host 10.9.9.9"})
+        finally:
+            storage.close()
+
+    assert asyncio.run(run()) is None
+
+
+def rule_remediation(message):
+    return RuleEngine(reload_interval=None).evaluate(message, "ERROR")
+
+
+@pytest.mark.parametrize("stored, message", [
+    # The rule extracted "webserver" from the neighbour's message
+    ("Memory overflow in webserver - system unstable", "Memory overflow in dbserver - system unstable"),
+    ("Security breach detected from 172.16.0.10", "Security breach not detected from 172.16.0.11"),
+    ("Fatal: System crash detected in database", "Fatal: System crash not detected in database"),
+])
+def test_near_misses_are_refused(sqlite_backend, stored, message):
+    assert find_similar(sqlite_backend, [({"message": stored}, rule_remediation(stored))], message) is None
+
+
+def test_paraphrase_is_served(sqlite_backend):
+    stored = "Database connection refused on 10.0.0.1"
+    found = find_similar(sqlite_backend, [({"message": stored}, rule_remediation(stored))],
+                         "DB connection failed on 10.0.0.2")
+    assert found is not None
+
+
+def test_conflicting_tokens():
+    remediation = {"description": "Increase memory for webserver", "steps": ["Restart webserver"]}
+    assert conflicting_tokens("Memory overflow in dbserver", "Memory overflow in webserver", remediation) == {"webserver"}
+    assert conflicting_tokens("Memory overflow in webserver now", "Memory overflow in webserver", remediation) == set()
+    assert conflicting_tokens("Backup not found", "Backup found", {}) == {"not"}
+    # Words only the neighbour has are fine when its remediation does not repeat them
+    assert conflicting_tokens("Disk slow", "Disk slow on primary", {"description": "Check the disk"}) == set()
+
+
+def test_index_defaults_to_a_strict_threshold():
+    assert SimilarityIndex().threshold == 0.9
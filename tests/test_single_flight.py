@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from agent.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def generate(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value * 2
+
+        results = await asyncio.gather(*(flight.do("key", generate, 21) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(run())
+    assert calls == [21]
+    assert sorted(results) == [(42, False)] + [(42, True)] * 4
+    assert flight.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "failures": 0, "in_flight": 0}
+
+
+def test_different_keys_run_separately():
+    async def run():
+        flight = SingleFlight()
+
+        async def generate(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        return await asyncio.gather(flight.do("a", generate, 1), flight.do("b", generate, 2))
+
+    assert asyncio.run(run()) == [(1, False), (2, False)]
+
+
+def test_key_is_forgotten_after_completion():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            return len(calls)
+
+        first = await flight.do("key", generate)
+        second = await flight.do("key", generate)
+        return first, second
+
+    assert asyncio.run(run()) == ((1, False), (2, False))
+
+
+def test_exception_is_shared_with_waiters():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("model unavailable")
+
+        results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.executions == 1
+    assert flight.failures == 1
+
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    async def run():
+        flight = SingleFlight()
+
+        async def generate():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", generate))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", generate))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(run()) == ("done", False)
+
+
+def test_cancelled_leader_does_not_cancel_the_call():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", generate))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", generate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return flight, calls, await waiter
+
+    flight, calls, result = asyncio.run(run())
+    assert result == ("done", True)
+    assert calls == [1]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_call_is_cancelled_when_every_caller_is():
+    async def run():
+        flight = SingleFlight()
+        cancelled = []
+
+        async def generate():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "done"
+
+        async def quick():
+            return "again"
+
+        callers = [asyncio.create_task(flight.do("key", generate)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        in_flight = flight.stats()["in_flight"]
+        # A new call starts a fresh execution rather than joining the cancelled one
+        return cancelled, in_flight, await flight.do("key", quick), flight
+
+    cancelled, in_flight, result, flight = asyncio.run(run())
+    assert cancelled == [1]
+    assert in_flight == 0
+    assert result == ("again", False)
+    assert flight.executions == 2
+    assert flight.failures == 0
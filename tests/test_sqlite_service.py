@@ -0,0 +1,65 @@
+import sqlite3
+
+from database.sqlite_service import SQLiteService
+from processor.log_processor import fingerprint_message
+
+STORED = "Security breach detected from 172.16.0.10"
+
+
+def test_legacy_rows_are_rekeyed_and_templatized(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE errors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, error_hash TEXT UNIQUE, timestamp TEXT,
+            message TEXT, level TEXT, remediation TEXT
+        )
+    """)
+    legacy_hash = "legacy-raw-message-hash"
+    conn.execute(
+        "INSERT INTO errors (error_hash, timestamp, message, level, remediation) VALUES (?, ?, ?, ?, ?)",
+        (legacy_hash, "2024-01-01 00:00:00", STORED, "ERROR", '{"description": "Block IP address 172.16.0.10"}')
+    )
+    conn.commit()
+    conn.close()
+
+    backend = SQLiteService(path)
+    try:
+        assert backend.get_remediation_by_hash(legacy_hash) is None
+        message, template = backend.get_remediation_by_hash(fingerprint_message(STORED).hash)
+        assert message == STORED
+        assert template == {"description": "Block IP address {{ip_0}}"}
+    finally:
+        backend.close()
+
+
+def test_removed_templates_never_reach_the_template_cache(tmp_path):
+    path = str(tmp_path / "remediation.db")
+    first = {"action": "restart_service", "description": "Restart the service", "parameters": {}}
+    second = {"action": "scale_resources", "description": "Add capacity", "parameters": {}}
+    error = {"message": "Disk full on data volume", "level": "ERROR"}
+    other = {"message": "Queue backlog growing", "level": "ERROR"}
+    backend = SQLiteService(path)
+    # A second worker on the same file, with its own template cache
+    worker = SQLiteService(path)
+    try:
+        backend.store_error(error, first)
+        assert worker.get_remediation(error) == first
+        backend.evict_excess(0)
+        assert backend.remove_unused_templates() == 1
+        assert backend.remove_unused_templates() == 0
+
+        # Template ids are never reused, so a cached id can only mean its own template
+        backend.store_error(other, second)
+        backend.store_error(error, first)
+        for reader in (backend, worker):
+            assert reader.get_remediation(other) == second
+            assert reader.get_remediation(error) == first
+        ids = [row[0] for row in backend._get_connection().execute("SELECT id FROM remediation_templates ORDER BY id")]
+        assert ids == [2, 3]
+        assert worker._load_template.cache_info().hits == 0
+        assert worker.get_remediation(error) == first
+        assert worker._load_template.cache_info().hits == 1
+    finally:
+        worker.close()
+        backend.close()